@@ -0,0 +1,109 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import List, Optional
+
+import polars as pl
+
+import cleaning
+import core
+import exporter
+import inventory
+import scheduler
+from checkpoint import CHECKPOINT_DIR
+from claims import OrderClaims
+from results_store import UNPLANNED, ResultsStore
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="วางแผนตัดม้วนกระดาษทุกคำแนะนำแบบไม่ใช้หน้าจอ (สำหรับรันตอนกลางคืน)",
+    )
+    parser.add_argument("--orders", nargs="+", required=True, help="ไฟล์ออเดอร์ (path หรือ glob ได้หลายไฟล์)")
+    parser.add_argument("--stock", required=True, help="ไฟล์สต็อก")
+    parser.add_argument("--output", default=os.path.join("cache", "nightly_plan.csv"), help="ไฟล์ผลลัพธ์ (.csv, .parquet หรือ .xlsx)")
+    parser.add_argument("--factory", default="รวม", help="โรงงาน 1-5 หรือ 'รวม' สำหรับทุกออเดอร์")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวนโปรเซส (ค่าเริ่มต้น: จำนวน CPU)")
+    parser.add_argument("--params", default=None,
+                        help="JSON ของ planning parameters ที่ต้องการเปลี่ยน เช่น '{\"max_trim\": 6}'")
+    parser.add_argument("--checkpoint-dir", default=CHECKPOINT_DIR,
+                        help="โฟลเดอร์ checkpoint: รันคำสั่งเดิมซ้ำหลังโปรแกรมหยุดกลางทางเพื่อทำต่อจากจุดเดิม")
+    parser.add_argument("--no-checkpoint", action="store_true", help="ไม่บันทึก checkpoint")
+    return parser.parse_args(argv)
+
+
+def write_plan(frame: pl.DataFrame, output_path: str) -> None:
+    """Writes the plan as CSV, Parquet or XLSX by the file extension (see exporter.write_frame)."""
+    exporter.write_frame(frame, output_path)
+
+
+def run_batch(args: argparse.Namespace) -> dict:
+    """
+    Loads the orders and stock, builds the suggestions as the UI does, plans them in a
+    process pool (scheduler.run_suggestions_parallel) and writes the best-trim plan.
+
+    Returns:
+        dict: {"orders", "suggestions", "rows", "cuts", "unplanned", "seconds", "output"}
+    """
+    started = time.perf_counter()
+    planning_params = json.loads(args.params) if args.params else None
+    core.resolve_planning_params(planning_params)  # ตรวจสอบชื่อพารามิเตอร์ก่อนเริ่มงาน
+
+    orders_df = cleaning.filter_orders_by_factory(cleaning.load_orders(args.orders), args.factory)
+    stock_df = cleaning.filter_stock_by_factory(cleaning.clean_stock(cleaning.load_data(args.stock)), args.factory)
+    roll_specs = inventory.build_roll_specs(stock_df)
+    suggestions = scheduler.runnable_suggestions(orders_df, roll_specs)
+    print(f"📁 Loaded {orders_df.height} orders, {stock_df.height} rolls; {len(suggestions)} suggestions to run.")
+
+    results = ResultsStore()
+
+    def on_result(idx: int, suggestion_results: list) -> None:
+        results.append(suggestion_results)
+        print(f"✅ Suggestion {idx + 1}/{len(suggestions)} finished with {len(suggestion_results)} results.")
+
+    with multiprocessing.get_context("spawn").Manager() as manager:
+        history = scheduler.load_timings()
+        scheduler.run_suggestions_parallel(
+            suggestions, orders_df, roll_specs,
+            max_workers=args.workers,
+            on_result=on_result,
+            claims=OrderClaims.shared(manager),
+            history=history,
+            planning_params=planning_params,
+            checkpoint_dir=None if args.no_checkpoint else args.checkpoint_dir,
+        )
+        scheduler.save_timings(history)
+
+    plan = results.best_plan()
+    write_plan(ResultsStore.export_frame(plan), args.output)
+    unplanned = int(plan[UNPLANNED].sum()) if UNPLANNED in plan.columns else 0
+    summary = {
+        "orders": orders_df.height,
+        "suggestions": len(suggestions),
+        "rows": len(results),
+        "cuts": plan.height - unplanned,
+        "unplanned": unplanned,
+        "seconds": round(time.perf_counter() - started, 1),
+        "output": args.output,
+    }
+    print(f"💾 Saved {summary['cuts']} cuts and {unplanned} unplanned orders to {args.output} "
+          f"({summary['rows']} rows before de-duplication, {summary['seconds']}s).")
+    return summary
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    try:
+        run_batch(args)
+    except Exception as e:
+        print(f"❌ Batch planning failed: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
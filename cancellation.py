@@ -0,0 +1,210 @@
+import contextlib
+import multiprocessing
+import subprocess
+import threading
+from typing import Iterator, Optional
+
+from pulp.apis import coin_api
+
+EVENT_POLL_SECONDS = 0.1  # ความถี่ในการตรวจคำขอยกเลิกข้ามโปรเซส
+
+
+class PlanningCancelled(Exception):
+    """Raised by CancellationToken.raise_if_cancelled() once a run has been cancelled."""
+
+
+class CancellationToken:
+    """
+    Cooperative cancellation for a planning run, shared by the thread that asks for the
+    stop and the threads doing the work.
+
+    cancel() sets the flag checked by the planning loop between solves and kills any
+    CBC process started for a solve under this token (see solving()), so a long solve
+    returns at once instead of running to completion. pulp is only patched to report
+    its CBC processes while a solving() scope is open.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """Requests the stop; safe to call from any thread, more than once."""
+        with self._lock:
+            self._event.set()
+            processes = list(self._processes)
+        for process in processes:
+            _kill(process)
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise PlanningCancelled("Calculation was cancelled.")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._event.wait(timeout)
+
+    def add_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._processes.add(process)
+                return
+        # ยกเลิกไปแล้วก่อนที่ CBC จะเริ่ม
+        _kill(process)
+
+    def discard_process(self, process: subprocess.Popen) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+    def solving(self) -> "_SolvingScope":
+        """Context manager for the thread running prob.solve: CBC processes it starts belong to this token."""
+        return _SolvingScope(self)
+
+
+@contextlib.contextmanager
+def shared_cancel_event(token: Optional[CancellationToken]) -> Iterator:
+    """
+    Mirrors `token` to a Manager Event that can be passed to process pool tasks, which
+    turn it back into a token with linked_token(). Yields None when there is no token.
+    """
+    if token is None:
+        yield None
+        return
+    with multiprocessing.get_context("spawn").Manager() as manager:
+        event = manager.Event()
+        if token.cancelled:
+            event.set()
+        done = threading.Event()
+
+        def forward():
+            while not done.is_set():
+                if token.wait(EVENT_POLL_SECONDS):
+                    event.set()
+                    return
+
+        thread = threading.Thread(target=forward, name="cancel-forward", daemon=True)
+        thread.start()
+        try:
+            yield event
+        finally:
+            done.set()
+            thread.join()
+
+
+@contextlib.contextmanager
+def linked_token(cancel_event=None) -> Iterator[CancellationToken]:
+    """
+    A token for work running in another process, cancelled once `cancel_event` (a Manager
+    Event, see shared_cancel_event) is set. Without an event the token is only local.
+    """
+    token = CancellationToken()
+    finished = threading.Event()
+
+    def watch():
+        while not finished.is_set():
+            try:
+                if cancel_event.wait(EVENT_POLL_SECONDS):
+                    token.cancel()
+                    return
+            except (EOFError, OSError):
+                return  # manager ถูกปิดแล้ว
+
+    if cancel_event is not None:
+        if cancel_event.is_set():
+            token.cancel()  # ยกเลิกก่อนงานนี้เริ่ม
+        else:
+            threading.Thread(target=watch, name="cancel-watch", daemon=True).start()
+    try:
+        yield token
+    finally:
+        finished.set()
+
+
+def _kill(process: subprocess.Popen) -> None:
+    try:
+        process.kill()
+    except OSError:
+        pass  # จบไปแล้ว
+
+
+class _SolvingScope:
+    def __init__(self, token: CancellationToken):
+        self.token = token
+
+    def __enter__(self) -> CancellationToken:
+        install()
+        _SolverSubprocess.local.token = self.token
+        return self.token
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        _SolverSubprocess.local.token = None
+        uninstall()
+
+
+class _SolverSubprocess:
+    """
+    Stands in for the subprocess module inside pulp's coin_api. Each CBC process started
+    on a thread inside CancellationToken.solving() is registered with that token, so
+    cancel() can kill it. Everything else is the real subprocess module.
+    """
+    local = threading.local()
+
+    def __getattr__(self, name):
+        return getattr(subprocess, name)
+
+    def Popen(self, *args, **kwargs):
+        process = subprocess.Popen(*args, **kwargs)
+        token = getattr(self.local, "token", None)
+        if token is not None:
+            token.add_process(process)
+            _watch_exit(token, process)
+        return process
+
+
+def _watch_exit(token: CancellationToken, process: subprocess.Popen) -> None:
+    """Drops the process from the token once pulp has waited on it."""
+    original_wait = process.wait
+
+    def wait(*args, **kwargs):
+        try:
+            return original_wait(*args, **kwargs)
+        finally:
+            token.discard_process(process)
+
+    process.wait = wait
+
+
+_install_lock = threading.Lock()
+_install_count = 0
+_replaced = None
+
+
+def install() -> None:
+    """
+    Puts _SolverSubprocess in place of the subprocess module inside pulp's coin_api.
+    Calls nest, also across threads: the module is restored by the matching last uninstall().
+    """
+    global _install_count, _replaced
+    with _install_lock:
+        if _install_count == 0:
+            _replaced = getattr(coin_api, "subprocess", None)
+            # pulp รุ่นอื่นอาจไม่เรียก CBC ผ่าน coin_api.subprocess จึงไม่แทนที่
+            if _replaced is subprocess:
+                coin_api.subprocess = _SolverSubprocess()
+        _install_count += 1
+
+
+def uninstall() -> None:
+    global _install_count, _replaced
+    with _install_lock:
+        if _install_count == 0:
+            return
+        _install_count -= 1
+        if _install_count == 0:
+            if _replaced is subprocess:
+                coin_api.subprocess = _replaced
+            _replaced = None
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import List, Optional, Tuple
+
+CHECKPOINT_INTERVAL = 20  # จำนวนรอบระหว่างการบันทึก snapshot ของสถานะ
+CHECKPOINT_DIR = os.path.join("cache", "checkpoints")  # โฟลเดอร์ checkpoint ของ UI และ batch
+
+
+def run_key(*parts) -> str:
+    """A short fingerprint of a run's inputs; a checkpoint is only resumed by a run with the same key."""
+    encoded = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()[:16]
+
+
+class RunCheckpoint:
+    """
+    Crash-safe progress of one stream_main_algorithm run, kept in `directory`:
+
+    - decisions.jsonl: append-only log with one line per decided iteration,
+      {"iteration", "result", "row"}: the solver result and the cut row it produced
+      (None when the order was skipped). Each line is flushed as it is written, so it
+      survives the process being killed.
+    - state.pickle: a snapshot of the loop state (remaining orders, roll length, roll
+      bookkeeping and this width's roll_specs) before planning starts and every
+      `interval` iterations, written under a temporary name and renamed.
+
+    A resumed run restores the snapshot, re-emits the rows logged up to it, and replays
+    the results logged after it without solving them again.
+    """
+
+    LOG_NAME = "decisions.jsonl"
+    STATE_NAME = "state.pickle"
+
+    def __init__(self, directory: str, interval: int = CHECKPOINT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self.log_path = os.path.join(directory, self.LOG_NAME)
+        self.state_path = os.path.join(directory, self.STATE_NAME)
+
+    def load(self) -> Tuple[Optional[dict], List[dict]]:
+        """
+        Returns (snapshot or None, logged decisions in order, one per iteration). A last
+        log line cut short by a crash is dropped and truncated away so new lines start cleanly.
+        """
+        state = None
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "rb") as f:
+                state = pickle.load(f)
+
+        decisions = []
+        seen = set()
+        if os.path.exists(self.log_path):
+            valid_bytes = 0
+            with open(self.log_path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        decision = json.loads(line)
+                    except json.JSONDecodeError:
+                        break
+                    valid_bytes += len(line)
+                    # แต่ละรอบมีได้ผลเดียว หากพบบรรทัดซ้ำของรอบเดิมใช้บรรทัดแรก
+                    if decision["iteration"] not in seen:
+                        seen.add(decision["iteration"])
+                        decisions.append(decision)
+            if valid_bytes != os.path.getsize(self.log_path):
+                with open(self.log_path, "r+b") as f:
+                    f.truncate(valid_bytes)
+        return state, decisions
+
+    def due(self, iteration: int) -> bool:
+        return iteration > 0 and iteration % self.interval == 0
+
+    def record(self, iteration: int, result: dict, row: Optional[dict]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        line = json.dumps({"iteration": iteration, "result": result, "row": row}, ensure_ascii=False)
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def snapshot(self, state: dict) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.log_path):
+            # ให้ log ถึงดิสก์ก่อน snapshot ที่อ้างถึงมัน
+            with open(self.log_path, "rb") as f:
+                os.fsync(f.fileno())
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def clear(self) -> None:
+        """Removes the checkpoint once the run has finished."""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,100 @@
+import math
+import threading
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+UNPLANNED_TRIM = math.inf
+
+
+class OrderClaims:
+    """
+    Registry of which planning run owns each order, shared by concurrent planners.
+
+    A claim records (owner, trim). Claims are optimistic: a run plans an order and
+    then claims it before consuming stock, and the claim succeeds when the order is
+    unclaimed or already owned by the same run. A claim for a cut is final, since the
+    run goes on to consume stock for it; only orders a run could not plan, claimed with
+    UNPLANNED_TRIM, are taken over by a later cut.
+
+    The default instance is shared between threads. Use OrderClaims.shared(manager)
+    to share one registry with worker processes.
+    """
+
+    def __init__(self, store: Optional[dict] = None, lock=None):
+        self._claims = store if store is not None else {}
+        self._lock = lock if lock is not None else threading.Lock()
+
+    @classmethod
+    def shared(cls, manager, initial: Optional[Dict[Hashable, Tuple[str, float]]] = None) -> "OrderClaims":
+        """Creates a registry backed by a multiprocessing.Manager, picklable into worker processes."""
+        return cls(manager.dict(initial or {}), manager.Lock())
+
+    def claim(self, order_number: Hashable, owner: str, trim: float = UNPLANNED_TRIM) -> bool:
+        """
+        Atomically claims an order. Returns False if another owner holds it with a cut,
+        or holds it unplanned and `trim` is not a cut either.
+        """
+        with self._lock:
+            current = self._claims.get(order_number)
+            if current is not None:
+                holder, held_trim = current
+                if holder == owner:
+                    # เจ้าของเดิม: เก็บค่า trim ที่ดีกว่าไว้
+                    if trim < held_trim:
+                        self._claims[order_number] = (owner, trim)
+                    return True
+                if held_trim != UNPLANNED_TRIM or not trim < held_trim:
+                    return False
+            self._claims[order_number] = (owner, trim)
+            return True
+
+    def release(self, order_number: Hashable, owner: str) -> bool:
+        """Releases an order held by owner. Returns False if owner does not hold it."""
+        with self._lock:
+            current = self._claims.get(order_number)
+            if current is None or current[0] != owner:
+                return False
+            del self._claims[order_number]
+            return True
+
+    def release_owner(self, owner: str) -> int:
+        """Releases every order held by owner, e.g. when a run is cancelled. Returns the count released."""
+        with self._lock:
+            owned = [order_number for order_number, (holder, _) in self._claims.items() if holder == owner]
+            for order_number in owned:
+                del self._claims[order_number]
+            return len(owned)
+
+    def owner_of(self, order_number: Hashable) -> Optional[str]:
+        current = self._claims.get(order_number)
+        return current[0] if current is not None else None
+
+    def claimed_orders(self, exclude_owner: Optional[str] = None) -> Set[Hashable]:
+        """Returns the claimed order numbers, optionally leaving out those held by exclude_owner."""
+        with self._lock:
+            return {
+                order_number for order_number, (holder, _) in self._claims.items()
+                if exclude_owner is None or holder != exclude_owner
+            }
+
+    def is_fully_claimed(self, order_numbers: Iterable[Hashable]) -> bool:
+        claimed = self.claimed_orders()
+        return all(order_number in claimed for order_number in order_numbers)
+
+    def snapshot(self) -> Dict[Hashable, Tuple[str, float]]:
+        with self._lock:
+            return dict(self._claims.items())
+
+    def merge(self, claims: Dict[Hashable, Tuple[str, float]]) -> None:
+        """Claims every entry of a snapshot (e.g. from a shared registry); entries already held by another run's cut are kept."""
+        for order_number, (owner, trim) in claims.items():
+            self.claim(order_number, owner, trim)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._claims.clear()
+
+    def __contains__(self, order_number: Hashable) -> bool:
+        return order_number in self._claims
+
+    def __len__(self) -> int:
+        return len(self._claims)
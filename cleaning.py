@@ -1,10 +1,211 @@
+import glob
+import os
 import sys
 import unicodedata
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
-from typing import Optional
+from typing import Callable, List, Optional, Sequence, Tuple, Union
 
 import polars as pl
 
+# คอลัมน์วัสดุของออเดอร์ (กระดาษหน้า ลอน C กระดาษกลาง ลอน B กระดาษหลัง)
+MATERIAL_COLS = ["front", "c", "middle", "b", "back"]
+
+# ชนิดข้อมูลแบบกะทัดรัดหลังทำความสะอาด: รหัสวัสดุเก็บเป็น dictionary (Categorical)
+# และตัวเลขใช้ชนิดที่เล็กที่สุดที่ครอบคลุมช่วงค่าได้
+# width/length ยังคงเป็น Float64 เพราะ LP คำนวณเศษเหลือละเอียดถึงทศนิยม 4 ตำแหน่ง
+ORDER_SCHEMA = {
+    "due_date": pl.Date,
+    "order_number": pl.Int64,  # เลขที่ใบสั่งขายยาวเกินช่วงของ Int32
+    "width": pl.Float64,
+    "length": pl.Float64,
+    "demand": pl.Int32,
+    "quantity": pl.Int32,
+    "type": pl.Categorical,
+    "component_type": pl.Categorical,
+    "front": pl.Categorical,
+    "c": pl.Categorical,
+    "middle": pl.Categorical,
+    "b": pl.Categorical,
+    "back": pl.Categorical,
+    "die_cut": pl.UInt16,
+}
+
+STOCK_SCHEMA = {
+    "roll_number": pl.Utf8,
+    "roll_type": pl.Categorical,
+    "roll_size": pl.UInt16,  # ขนาดม้วนถูกกรองไว้ที่ 75-97 นิ้ว
+    "length": pl.Int32,
+    "factory": pl.Categorical,  # ไม่บังคับ มีเฉพาะเมื่อไฟล์สต็อกมีคอลัมน์โรงงาน
+}
+
+FACTORIES = ("1", "2", "3", "4", "5")
+
+
+def compact_frame(df: pl.DataFrame, schema: dict) -> pl.DataFrame:
+    """
+    Casts the columns of a cleaned DataFrame to the compact schema.
+    String columns that become Categorical are stripped first and empty strings
+    are treated as missing, so that each material code maps to a single dictionary entry.
+
+    Args:
+        df (pl.DataFrame): The cleaned DataFrame.
+        schema (dict): Column name to target dtype, e.g. ORDER_SCHEMA or STOCK_SCHEMA.
+
+    Numeric casts are strict, so values that do not fit the target type must already
+    have been filtered out or quarantined (see validate_orders); otherwise the cast raises.
+
+    Returns:
+        pl.DataFrame: The DataFrame with compact dtypes. Columns not in the schema are left as is.
+    """
+    casts = []
+    for col, dtype in schema.items():
+        if col not in df.columns:
+            continue
+        if dtype == pl.Categorical:
+            stripped = pl.col(col).cast(pl.Utf8).str.strip_chars()
+            casts.append(
+                pl.when(stripped == "").then(None).otherwise(stripped).cast(pl.Categorical).alias(col)
+            )
+        else:
+            # แปลงแบบ strict: ค่าที่อยู่นอกช่วงต้องถูกแยกออกก่อนแล้ว (ดู validate_orders)
+            casts.append(pl.col(col).cast(dtype))
+    return df.with_columns(casts)
+
+
+def material_filter(df: pl.DataFrame, col: str, pattern: Optional[str]) -> pl.Expr:
+    """
+    Builds a filter expression for a material column.
+    The regex is evaluated once per distinct material code (the dictionary of the
+    Categorical column) instead of once per row, and rows are then matched by code.
+    A None pattern selects rows where the material is missing.
+    """
+    if pattern is None:
+        return pl.col(col).is_null()
+    codes = df.get_column(col).drop_nulls().unique().cast(pl.Utf8)
+    matched = codes.filter(codes.str.contains(pattern, literal=False)).to_list()
+    return pl.col(col).is_in(matched)
+
+
+def normalize_col_name(col: str) -> str:
+    """แปลงชื่อคอลัมน์ให้เป็นรูปแบบ Unicode มาตรฐานและตัดช่องว่าง"""
+    return unicodedata.normalize('NFC', col.strip())
+
+
+# mapping สำหรับคอลัมน์ไทยของไฟล์ออเดอร์พร้อมชื่อที่แปลงแล้ว
+thai_col_mapping = {
+    normalize_col_name("กำหนดส่ง       "): "due_date",
+    normalize_col_name(" เลขที่ใบสั่งขาย"): "order_number",
+    normalize_col_name("กว้าง"): "width",
+    normalize_col_name("ยาว"): "length",
+    normalize_col_name("จำนวนสั่งส่ง   "): "demand",
+    normalize_col_name("จำนวนสั่งผลิต"): "quantity",
+    normalize_col_name("กระดาษหน้า"): "front",
+    normalize_col_name("ลอนC"): "c",
+    normalize_col_name("กระดาษกลาง"): "middle",
+    normalize_col_name("ลอนB"): "b",
+    normalize_col_name("กระดาษหลัง"): "back",
+    normalize_col_name("ทับเส้น"): "type",
+    normalize_col_name("ประเภทกล่อง"): "component_type",
+    normalize_col_name("ผลิตได้"): "die_cut"
+}
+
+
+def normalize_order_columns(df: pl.DataFrame) -> pl.DataFrame:
+    """เปลี่ยนชื่อคอลัมน์ภาษาไทยของไฟล์ออเดอร์เป็นชื่อภาษาอังกฤษตาม thai_col_mapping"""
+    rename_dict = {}
+    for orig_col in df.columns:
+        normalized = normalize_col_name(orig_col)
+        if normalized in thai_col_mapping:
+            rename_dict[orig_col] = thai_col_mapping[normalized]
+    return df.rename(rename_dict)
+
+
+# คอลัมน์ที่ต้องมีค่าเสมอ แถวที่ขาดค่าเหล่านี้จะถูกแยกไปไว้ใน quarantine
+ORDER_REQUIRED_VALUES = ["due_date", "order_number", "width", "length", "demand", "quantity", "component_type"]
+
+
+def _order_parse_exprs() -> dict:
+    """Non-strict parse expressions for the order columns; unparseable values become null."""
+    def raw(col: str) -> pl.Expr:
+        return pl.col(col).cast(pl.Utf8).str.strip_chars()
+
+    def number(col: str) -> pl.Expr:
+        # ลบคอมม่าออกก่อน เช่น '1,000'
+        return raw(col).str.replace_all(",", "").cast(pl.Float64, strict=False)
+
+    return {
+        "due_date": raw("due_date").str.strptime(pl.Date, "%d/%m/%y", strict=False), # %y for 2-digit year
+        "order_number": raw("order_number").cast(pl.Int64, strict=False),
+        "width": raw("width").cast(pl.Float64, strict=False),
+        "length": raw("length").cast(pl.Float64, strict=False),
+        "demand": number("demand").cast(pl.Int64, strict=False),
+        "quantity": number("quantity").cast(pl.Int64, strict=False),
+        "type": raw("type"),
+        "component_type": raw("component_type"),
+        "die_cut": raw("die_cut").cast(pl.Int64, strict=False),
+    }
+
+
+def validate_orders(df: pl.DataFrame) -> Tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Parses the order columns in a single vectorized pass and separates malformed rows
+    instead of failing the whole load.
+
+    A row is rejected when a value is present but cannot be parsed (e.g. a bad
+    due_date or a non-numeric order_number), does not fit its integer type in
+    ORDER_SCHEMA (e.g. a negative die_cut), or when a required value is missing.
+    Rows that are entirely empty (e.g. trailing lines of an ERP export) are dropped silently.
+
+    Args:
+        df (pl.DataFrame): The order DataFrame with English column names.
+
+    Returns:
+        Tuple[pl.DataFrame, pl.DataFrame]: The parsed good rows, and the rejected rows with
+        their original values, a 1-based 'source_row' and a 'reason' per row.
+    """
+    parse_exprs = _order_parse_exprs()
+    present = {
+        col: pl.col(col).cast(pl.Utf8).str.strip_chars().fill_null("") != ""
+        for col in parse_exprs
+    }
+
+    reasons = []
+    for col, expr in parse_exprs.items():
+        reasons.append(pl.when(present[col] & expr.is_null()).then(pl.lit(f"{col}: invalid value")))
+        dtype = ORDER_SCHEMA[col]
+        if dtype.is_integer():
+            out_of_range = (expr < dtype.min()) | (expr > dtype.max())
+            reasons.append(pl.when(out_of_range).then(pl.lit(f"{col}: out of range")))
+    for col in ORDER_REQUIRED_VALUES:
+        reasons.append(pl.when(~present[col]).then(pl.lit(f"{col}: missing")))
+
+    is_blank = ~pl.any_horizontal([present[col] for col in ORDER_REQUIRED_VALUES])
+    checked = df.with_row_index("source_row", offset=1).with_columns(
+        pl.concat_str(reasons, separator="; ", ignore_nulls=True).fill_null("").alias("reason"),
+        is_blank.alias("_is_blank"),
+    ).filter(~pl.col("_is_blank")).drop("_is_blank")
+
+    is_valid = pl.col("reason") == ""
+    rejected = checked.filter(~is_valid)
+    good = checked.filter(is_valid).drop("source_row", "reason").with_columns(
+        **{col: expr for col, expr in parse_exprs.items()}
+    )
+    return good, rejected
+
+
+def write_quarantine(rejected: pl.DataFrame, file_path: str) -> None:
+    """
+    Writes rejected order rows to a CSV file (utf-8 with BOM for Excel).
+    The file is written to a temporary path and renamed so readers never see a partial file.
+    """
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    rejected.with_columns(pl.all().cast(pl.Utf8)).write_csv(tmp_path, include_bom=True)
+    os.replace(tmp_path, file_path)
+
 
 def load_data(file_path: str) -> pl.DataFrame:
     """
@@ -66,7 +267,8 @@ def clean_data(df: pl.DataFrame,
                middle: Optional[str] = None,
                b: Optional[str] = None,
                back: Optional[str] = None,
-               suggestion_mode: bool = False
+               suggestion_mode: bool = False,
+               on_quarantine: Optional[Callable[[pl.DataFrame], None]] = None,
                ) -> pl.DataFrame:
     """
     Placeholder function for data cleaning.
@@ -81,43 +283,15 @@ def clean_data(df: pl.DataFrame,
         middle (Optional[str]): Filter for 'middle' material.
         B (Optional[str]): Filter for 'B' material.
         back (Optional[str]): Filter for 'back' material.
+        on_quarantine (Optional[Callable[[pl.DataFrame], None]]): Called with the rows
+            rejected by validate_orders (with a 'reason' column), if there are any.
 
     Returns:
         pl.DataFrame: The cleaned DataFrame.
     """
     print("Starting data cleaning...")
     
-    # แปลงชื่อคอลัมน์ให้เป็นรูปแบบ Unicode มาตรฐานและตัดช่องว่าง
-    def normalize_col_name(col: str) -> str:
-        return unicodedata.normalize('NFC', col.strip())
-    
-    # สร้าง mapping สำหรับคอลัมน์ไทยพร้อมชื่อที่แปลงแล้ว
-    thai_col_mapping = {
-        normalize_col_name("กำหนดส่ง       "): "due_date",
-        normalize_col_name(" เลขที่ใบสั่งขาย"): "order_number",
-        normalize_col_name("กว้าง"): "width",
-        normalize_col_name("ยาว"): "length",
-        normalize_col_name("จำนวนสั่งส่ง   "): "demand",
-        normalize_col_name("จำนวนสั่งผลิต"): "quantity",
-        normalize_col_name("กระดาษหน้า"): "front",
-        normalize_col_name("ลอนC"): "c",
-        normalize_col_name("กระดาษกลาง"): "middle",
-        normalize_col_name("ลอนB"): "b",
-        normalize_col_name("กระดาษหลัง"): "back",
-        normalize_col_name("ทับเส้น"): "type",
-        normalize_col_name("ประเภทกล่อง"): "component_type",
-        normalize_col_name("ผลิตได้"): "die_cut"
-   }
-    
-    # สร้าง dictionary สำหรับเปลี่ยนชื่อคอลัมน์
-    rename_dict = {}
-    for orig_col in df.columns:
-        normalized = normalize_col_name(orig_col)
-        if normalized in thai_col_mapping:
-            rename_dict[orig_col] = thai_col_mapping[normalized]
-    
-    # เปลี่ยนชื่อคอลัมน์
-    df = df.rename(rename_dict)
+    df = normalize_order_columns(df)
     
     # ตรวจสอบว่ามีคอลัมน์จำเป็นครบ
     required_cols = ["due_date", "order_number", "width", "length", "demand", "quantity",  "front", "c", "middle", "b", "back", "type", "component_type"]
@@ -125,20 +299,12 @@ def clean_data(df: pl.DataFrame,
     if missing:
         raise ValueError(f"⚠️ คอลัมน์หาย: {missing} โปรดตรวจสอบชื่อคอลัมน์ในไฟล์ CSV")
     
-    df = df.with_columns(
-        pl.col("due_date").str.strip_chars().str.strptime(pl.Date, "%d/%m/%y", strict=True), # Changed %Y to %y for 2-digit year, kept strict=True for debugging
-        pl.col("order_number").str.strip_chars().cast(pl.Int64),
-        pl.col("width").str.strip_chars().cast(pl.Float64),
-        pl.col("length").str.strip_chars().cast(pl.Float64),
-        # ทำความสะอาดข้อมูล 'demand' และ 'quantity' โดยการลบคอมม่าและแปลงเป็น Int64
-        pl.col("demand").str.strip_chars().str.replace_all(",", "").cast(pl.Float64).cast(pl.Int64),
-        pl.col("quantity").str.strip_chars().str.replace_all(",", "").cast(pl.Float64).cast(pl.Int64),
-        pl.col("type").str.strip_chars(),
-        pl.col("component_type").str.strip_chars(),
-        pl.col("die_cut").str.strip_chars().cast(pl.Int64),
-   )
-
-    df = df.drop_nulls(subset=["due_date", "order_number", "width", "length", "demand", "quantity", "component_type"])
+    df, rejected = validate_orders(df)
+    if not rejected.is_empty():
+        print(f"⚠️ พบ {rejected.height} แถวที่ข้อมูลไม่ถูกต้อง แยกไปไว้ใน quarantine และประมวลผลแถวที่เหลือต่อ")
+        if on_quarantine:
+            on_quarantine(rejected)
+
     df = df.filter(pl.col("demand") > 0)
     df = df.filter(pl.col("width") > 0)
     df = df.filter(pl.col("length") > 0)
@@ -148,6 +314,7 @@ def clean_data(df: pl.DataFrame,
     ]).select([
         'due_date', 'order_number', 'width', 'length', 'demand', 'quantity', 'type', 'component_type', 'front', 'c', 'middle', 'b', 'back', 'die_cut' # เพิ่มคอลัมน์วัสดุ
     ])
+    df = compact_frame(df, ORDER_SCHEMA)
 
     if suggestion_mode:
         print("Running clean_data in suggestion mode.")
@@ -155,6 +322,60 @@ def clean_data(df: pl.DataFrame,
         # We can skip the rest of the strict cleaning and filtering.
         return df
 
+    return filter_orders(df, start_date, end_date, front=front, c=c, middle=middle, b=b, back=back)
+
+
+def filter_orders_by_factory(df: pl.DataFrame, factory: Optional[str]) -> pl.DataFrame:
+    """
+    Keeps the orders of one factory, by order number prefix:
+    factories 1 and 2 share the orders starting with '1218', factories 3-5 use their leading digit.
+    Any other value (e.g. "รวม") keeps all orders.
+    """
+    if "order_number" not in df.columns:
+        return df
+    # ตรวจสอบคำนำหน้าเป็นตัวเลข: แปลงเป็นข้อความ ตัดช่องว่าง แล้วเทียบค่าตัวเลขของคำนำหน้า
+    order_num_col = pl.col("order_number").cast(pl.Utf8).str.strip_chars()
+    if factory in ["1", "2"]:
+        return df.filter(order_num_col.str.slice(0, 4).str.to_integer(strict=False) == 1218)
+    if factory in ["3", "4", "5"]:
+        return df.filter(order_num_col.str.slice(0, 1).str.to_integer(strict=False) == int(factory))
+    return df
+
+
+def filter_stock_by_factory(stock_df: pl.DataFrame, factory: str) -> pl.DataFrame:
+    """
+    Keeps the rolls of one factory when the cleaned stock has a factory column.
+    Stock without factory information is returned unchanged (shared by all factories),
+    as is all stock for a value outside FACTORIES (e.g. "รวม").
+    """
+    if str(factory) not in FACTORIES or "factory" not in stock_df.columns \
+            or stock_df.get_column("factory").null_count() == stock_df.height:
+        return stock_df
+    return stock_df.filter(pl.col("factory").cast(pl.Utf8) == str(factory))
+
+
+def filter_orders(df: pl.DataFrame,
+                  start_date: Optional[str] = None,
+                  end_date: Optional[str] = None,
+                  front: Optional[str] = None,
+                  c: Optional[str] = None,
+                  middle: Optional[str] = None,
+                  b: Optional[str] = None,
+                  back: Optional[str] = None,
+                  ) -> pl.DataFrame:
+    """
+    Applies the due date range and material filters to already cleaned orders
+    (the output of clean_data in suggestion mode or of load_orders).
+
+    Args:
+        df (pl.DataFrame): The cleaned orders.
+        start_date (Optional[str]): Start date for filtering (YYYY-MM-DD).
+        end_date (Optional[str]): End date for filtering (YYYY-MM-DD).
+        front, c, middle, b, back (Optional[str]): Material filters; None selects rows without that material.
+
+    Returns:
+        pl.DataFrame: The filtered DataFrame.
+    """
     if df.height > 0:
         print(f"วันที่กำหนดส่งขั้นต่ำใน DataFrame (หลังการแยกวิเคราะห์และลบค่าว่าง): {df.select(pl.col('due_date').min()).item()}")
         print(f"วันที่กำหนดส่งสูงสุดใน DataFrame (หลังการแยกวิเคราะห์และลบค่าว่าง): {df.select(pl.col('due_date').max()).item()}")
@@ -190,27 +411,10 @@ def clean_data(df: pl.DataFrame,
     print("Filtering data based on material specifications...")
     print("Front:", front, "C:", c, "Middle:", middle, "B:", b, "Back:", back)
 
-    material_conditions = []
-    if front is not None:
-        material_conditions.append(pl.col("front").str.contains(front, literal=False))
-    else:
-        material_conditions.append(pl.col("front").is_null())
-    if c is not None:
-        material_conditions.append(pl.col("c").str.contains(c, literal=False))
-    else:
-        material_conditions.append(pl.col("c").is_null())
-    if middle is not None:
-        material_conditions.append(pl.col("middle").str.contains(middle, literal=False))
-    else:
-        material_conditions.append(pl.col("middle").is_null())
-    if b is not None:
-        material_conditions.append(pl.col("b").str.contains(b, literal=False))
-    else:
-        material_conditions.append(pl.col("b").is_null())
-    if back is not None:
-        material_conditions.append(pl.col("back").str.contains(back, literal=False))
-    else:
-        material_conditions.append(pl.col("back").is_null())
+    material_conditions = [
+        material_filter(df, col, pattern)
+        for col, pattern in zip(MATERIAL_COLS, [front, c, middle, b, back])
+    ]
 
     # ใช้ pl.all_horizontal เพื่อรวมเงื่อนไขทั้งหมดด้วย AND logic หากมีเงื่อนไข
     if material_conditions:
@@ -223,6 +427,102 @@ def clean_data(df: pl.DataFrame,
     print(df.head(5))
     return df
 
+def _has_glob(pattern: str) -> bool:
+    return any(ch in pattern for ch in "*?[")
+
+
+def resolve_paths(paths: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Expands a file path, a glob pattern (e.g. 'orders/order_2025-*.csv') or a list of
+    either into a sorted list of file paths without duplicates.
+    Plain paths are returned as given even if they do not exist yet.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    resolved = []
+    for path in paths:
+        if _has_glob(path):
+            resolved.extend(sorted(glob.glob(path)))
+        else:
+            resolved.append(path)
+    return list(dict.fromkeys(resolved))
+
+
+def load_orders(paths: Union[str, Sequence[str]],
+                max_workers: Optional[int] = None,
+                on_quarantine: Optional[Callable[[pl.DataFrame], None]] = None,
+                progress_callback: Optional[Callable[[str], None]] = None,
+                ) -> pl.DataFrame:
+    """
+    Loads and cleans one or more order files concurrently and returns them as one frame.
+    Each file is read and cleaned (in suggestion mode) in a thread pool; Polars releases
+    the GIL while parsing, so files are processed in parallel. Column names are normalized
+    through thai_col_mapping, so monthly and factory exports can be mixed.
+
+    Args:
+        paths (Union[str, Sequence[str]]): A path, a glob pattern, or a list of either.
+        max_workers (Optional[int]): Thread pool size; defaults to one thread per file up to the CPU count.
+        on_quarantine (Optional[Callable[[pl.DataFrame], None]]): Called once with the rejected
+            rows of all files, with a 'source_file' column added. Rows dropped as duplicates
+            of an earlier file are included with a 'reason' naming that file.
+        progress_callback (Optional[Callable[[str], None]]): Receives the number of orders loaded.
+
+    Returns:
+        pl.DataFrame: The cleaned orders of all files. A row identical to a row of an earlier
+        file (e.g. overlapping exports) is dropped; repeated rows within one file are kept.
+    """
+    file_paths = resolve_paths(paths)
+    if not file_paths:
+        raise FileNotFoundError(f"ไม่พบไฟล์ออเดอร์ที่ตรงกับ: {paths}")
+
+    def load_one(file_path: str) -> Tuple[pl.DataFrame, List[pl.DataFrame]]:
+        rejected = []
+        df = clean_data(load_data(file_path), suggestion_mode=True, on_quarantine=rejected.append)
+        rejected = [r.with_columns(pl.lit(file_path).alias("source_file")) for r in rejected]
+        return df, rejected
+
+    if len(file_paths) == 1:
+        results = [load_one(file_paths[0])]
+    else:
+        workers = max_workers or min(len(file_paths), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # executor.map คืนผลลัพธ์ตามลำดับไฟล์ ทำให้ลำดับแถวคงที่
+            results = list(executor.map(load_one, file_paths))
+
+    rejected = [r for _, file_rejected in results for r in file_rejected]
+    frames = [
+        df.with_columns(pl.lit(i, pl.UInt32).alias("_file"))
+        for i, (df, _) in enumerate(results) if not df.is_empty()
+    ]
+    if not frames:
+        combined = results[0][0]
+    elif len(frames) == 1:
+        combined = frames[0].drop("_file")
+    else:
+        # rechunk=False เพื่อไม่คัดลอกข้อมูลตอนรวม DataFrame มีการคัดลอกครั้งเดียวตอน filter
+        combined = pl.concat(frames, how="vertical_relaxed", rechunk=False)
+        order_cols = [col for col in combined.columns if col != "_file"]
+        # ไฟล์แรกที่มีแถวเดียวกันทุกคอลัมน์ แถวเดียวกันจากไฟล์ถัดไปคือข้อมูลซ้ำ
+        first_file = combined.select(pl.col("_file").min().over(order_cols)).to_series()
+        is_copy = combined["_file"] > first_file
+        if is_copy.any():
+            names = dict(enumerate(file_paths))
+            copies = combined.filter(is_copy).with_columns(
+                pl.all().cast(pl.Utf8),
+                pl.col("_file").replace_strict(names).alias("source_file"),
+                ("duplicate of a row in " + first_file.filter(is_copy).replace_strict(names)).alias("reason"),
+            ).drop("_file")
+            rejected.append(copies)
+            combined = combined.filter(~is_copy)
+        combined = combined.drop("_file")
+    if rejected and on_quarantine:
+        on_quarantine(pl.concat(rejected, how="diagonal_relaxed"))
+
+    if progress_callback:
+        progress_callback(f"📁 Loaded {combined.height} orders from {len(file_paths)} files")
+    return combined
+
+
 def clean_stock(df: pl.DataFrame) -> pl.DataFrame:
     """
     ทำความสะอาดข้อมูลสต็อก
@@ -285,8 +585,9 @@ def clean_stock(df: pl.DataFrame) -> pl.DataFrame:
     df = df.filter((pl.col("roll_size") >= 75) & (pl.col("roll_size") <= 97))
   
     print(f"Stock data cleaning complete. Shape after cleaning: {df.shape}")
-    # เลือกเฉพาะคอลัมน์ที่จำเป็นสำหรับแอปพลิเคชัน
-    return df.select(required_cols)
+    # เลือกเฉพาะคอลัมน์ที่จำเป็นสำหรับแอปพลิเคชัน และคอลัมน์โรงงานหากมี (ใช้แบ่งสต็อกตามโรงงาน)
+    optional_cols = [col for col in ["factory"] if col in df.columns]
+    return compact_frame(df.select(required_cols + optional_cols), STOCK_SCHEMA)
 
 #depracted
 if __name__ == "__main__":
@@ -1,10 +1,12 @@
 import asyncio
 import copy
 import os
-from typing import Callable, Optional
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, Sequence, Union
 
 import polars as pl
-from fastapi import FastAPI
 from pulp import (
     PULP_CBC_CMD,
     LpBinary,
@@ -18,6 +20,10 @@ from pulp import (
 )
 
 import cleaning
+from cancellation import CancellationToken
+from checkpoint import RunCheckpoint, run_key
+from claims import UNPLANNED_TRIM, OrderClaims
+from result_writer import ResultWriter, new_run_id, prune_run_files
 
 
 def _find_and_update_roll(roll_specs: dict, width: str, material: str, required_length: float, used_roll_ids: set, last_used_roll_ids: dict, order_number: Optional[str] = None) -> str:
@@ -201,7 +207,8 @@ def _find_and_update_roll(roll_specs: dict, width: str, material: str, required_
     return "-> (ไม่มีสต็อกที่พอ)"
 
 
-app = FastAPI()
+# จำนวนออเดอร์สูงสุดที่คำนวณต่อหนึ่งรอบ
+MAX_RECORDS = 2000
 
 CORRUGATE_MULTIPLIERS = {
     "C": 1.45,
@@ -209,17 +216,166 @@ CORRUGATE_MULTIPLIERS = {
     "E": 1.25,
 }
 
+# กฎการวางแผนของ solve_linear_program ส่งค่าอื่นผ่าน planning_params ได้ (เช่น การจำลองสถานการณ์ใน scenarios.py)
+DEFAULT_PLANNING_PARAMS = {
+    "min_trim": 1,  # เศษขอบต่ำสุด (นิ้ว)
+    "max_trim": 5,  # เศษขอบสูงสุด (นิ้ว)
+    "max_cuts": 6,  # จำนวนตัดสูงสุดตามหน้ากว้าง
+    "max_cuts_type_x": 5,  # จำนวนตัดสูงสุดของออเดอร์ประเภท 'X'
+    "min_remaining_length": 100,  # ความยาวม้วนคงเหลือต่ำสุด
+    "corrugate_multipliers": CORRUGATE_MULTIPLIERS,
+}
+
+
+def resolve_planning_params(overrides: Optional[dict] = None) -> dict:
+    """
+    Returns DEFAULT_PLANNING_PARAMS with overrides applied. 'corrugate_multipliers' may
+    override only some of the flute types. Unknown keys raise ValueError.
+    """
+    params = dict(DEFAULT_PLANNING_PARAMS)
+    for key, override in (overrides or {}).items():
+        if key not in params:
+            raise ValueError(f"Unknown planning parameter: {key}")
+        if key == "corrugate_multipliers":
+            override = {**CORRUGATE_MULTIPLIERS, **override}
+        params[key] = override
+    return params
+
+
+# ขั้นตอนของ ProgressEvent และช่วงเปอร์เซ็นต์ของแต่ละขั้น
+PROGRESS_STAGES = ("starting", "planning", "saving", "done", "cancelled")
+PROGRESS_INTERVAL = 0.25  # วินาที ระหว่าง ProgressEvent ที่ส่งต่อ (ไม่เกิน 4 ครั้งต่อวินาที)
+
+
+class ProgressEvent(NamedTuple):
+    """
+    Progress of one main_algorithm run. `total` is the number of orders to plan and
+    `remaining` those not yet cut; `elapsed` is in seconds since the run started.
+    """
+    stage: str
+    iteration: int = 0
+    total: int = 0
+    remaining: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def percent(self) -> int:
+        if self.stage in ("done", "cancelled"):
+            return 100
+        if self.stage == "saving":
+            return 95
+        if self.stage == "planning" and self.total:
+            return int(20 + 75 * (self.total - self.remaining) / self.total)
+        return 20 if self.stage == "planning" else 5
+
+    def describe(self) -> str:
+        if self.stage == "planning":
+            return f"รอบที่ {self.iteration} เหลือ {self.remaining}/{self.total} ออเดอร์"
+        return {
+            "starting": "⚙️ กำลังเริ่มการคำนวณ",
+            "saving": "💾 กำลังบันทึกผลลัพธ์",
+            "done": "✅ เสร็จสิ้น",
+            "cancelled": "⏹️ ถูกยกเลิก",
+        }.get(self.stage, self.stage)
+
+
+class ProgressThrottle:
+    """
+    Rate limiter for ProgressEvent callbacks: within `interval` seconds only the newest
+    event is kept, so a long run reports a few times per second however many iterations
+    it makes. A change of stage is always forwarded, and flush() forwards the held event.
+    """
+
+    def __init__(self, callback: Callable[[ProgressEvent], None], interval: float = PROGRESS_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.callback = callback
+        self.interval = interval
+        self.clock = clock
+        self._last_sent = None
+        self._last_stage = None
+        self._pending = None
+
+    def __call__(self, event: ProgressEvent) -> None:
+        now = self.clock()
+        if event.stage != self._last_stage or self._last_sent is None or now - self._last_sent >= self.interval:
+            self._send(event, now)
+        else:
+            self._pending = event
+
+    def flush(self) -> None:
+        if self._pending is not None:
+            self._send(self._pending, self.clock())
+
+    def _send(self, event: ProgressEvent, now: float) -> None:
+        self._pending = None
+        self._last_sent = now
+        self._last_stage = event.stage
+        self.callback(event)
+
+# จำนวน CBC ที่รันพร้อมกันได้สูงสุด ตั้งผ่าน environment SOLVER_CONCURRENCY หรือ set_solver_concurrency()
+SOLVER_CONCURRENCY = int(os.environ.get("SOLVER_CONCURRENCY", "0") or 0) or (os.cpu_count() or 1)
+_solver_executor = None
+_solver_executor_lock = threading.Lock()
+
+
+def set_solver_concurrency(limit: int) -> None:
+    """Sets how many CBC solves may run at the same time, across all event loops."""
+    global SOLVER_CONCURRENCY, _solver_executor
+    with _solver_executor_lock:
+        SOLVER_CONCURRENCY = max(1, int(limit))
+        old_executor, _solver_executor = _solver_executor, None
+    if old_executor is not None:
+        # solve ที่กำลังทำอยู่จะจบตามปกติ งานใหม่จะใช้ executor ตัวใหม่
+        old_executor.shutdown(wait=False)
+
+
+def _get_solver_executor() -> ThreadPoolExecutor:
+    global _solver_executor
+    with _solver_executor_lock:
+        if _solver_executor is None:
+            _solver_executor = ThreadPoolExecutor(max_workers=SOLVER_CONCURRENCY, thread_name_prefix="cbc")
+        return _solver_executor
+
+
+async def _solve_async(prob: LpProblem, cancel_token: Optional[CancellationToken] = None) -> None:
+    """
+    Runs CBC for prob in the shared solver executor and awaits it, so the event loop keeps
+    running other coroutines (other rolls, suggestions or requests) while CBC works.
+    The executor size is the solver concurrency limit.
+
+    With a cancel_token, the CBC process belongs to the token: cancel() kills it and the
+    solve raises. A solve still waiting for an executor slot does not start at all.
+    """
+    loop = asyncio.get_running_loop()
+    if cancel_token is None:
+        await loop.run_in_executor(_get_solver_executor(), prob.solve, PULP_CBC_CMD(msg=False))
+        return
+
+    def solve():
+        with cancel_token.solving():
+            cancel_token.raise_if_cancelled()
+            prob.solve(PULP_CBC_CMD(msg=False))
+
+    await loop.run_in_executor(_get_solver_executor(), solve)
+
+
 async def solve_linear_program(
     roll_width: int,
     roll_length: int,
     orders_df: pl.DataFrame,
     c_type: Optional[str] = None,  # New parameters for corrugate types
     b_type: Optional[str] = None,  # New parameters for corrugate types
+    params: Optional[dict] = None,
+    cancel_token: Optional[CancellationToken] = None,
 ) -> dict:
     """
     Solve a simple Linear Programming problem using PuLP for a given roll paper width
     and available orders DataFrame, considering different corrugate types.
+
+    `params` overrides the planning rules in DEFAULT_PLANNING_PARAMS (see resolve_planning_params).
+    Returns status "Cancelled" when `cancel_token` is cancelled before or during the solve.
     """
+    params = resolve_planning_params(params)
     # 1. Create the LP problem
     # The original objective seems to be related to minimizing trim waste
     # Therefore, change to LpMinimize
@@ -269,16 +425,16 @@ async def solve_linear_program(
         prob += z_width[j] <= M * y[j], f"Linearize_Z_2_{j}"
         prob += z_width[j] >= z - M * (1 - y[j]), f"Linearize_Z_3_{j}"
         prob += z_width[j] >= 0, f"Linearize_Z_4_{j}"
-        prob += z_width[j] <= 6, f"MaxCutsAcrossWidth_{j}" # TODO: This seems to be a hardcoded business rule.
+        prob += z_width[j] <= params["max_cuts"], f"MaxCutsAcrossWidth_{j}"
 
-        # If order type is 'X', limit z to 5 cuts
+        # If order type is 'X', limit z to max_cuts_type_x cuts (5 by default)
         if 'X' in (types[j], component_types[j]):
-            prob += z <= 5 + M * (1 - y[j]), f"MaxZ_TypeX_{j}"
+            prob += z <= params["max_cuts_type_x"] + M * (1 - y[j]), f"MaxZ_TypeX_{j}"
 
     total_cut_width = lpSum(widths[j] * z_width[j] for j in range(num_orders))
 
     # 4. Define objective function and related constraints
-    corr_multiplier = CORRUGATE_MULTIPLIERS.get(most_demand_type, 1.0)
+    corr_multiplier = params["corrugate_multipliers"].get(most_demand_type, 1.0)
     
     # Total length of material required for the selected order (using .get with a default value)
     # The sum will effectively pick the one order where y[j]=1
@@ -292,16 +448,18 @@ async def solve_linear_program(
     prob += trim_waste, "MinimizeTrim"
 
     # Constraints
-    prob += trim_waste >= 1, "TrimLowerBound"
-    prob += trim_waste <= 5, "TrimUpperBound"
+    prob += trim_waste >= params["min_trim"], "TrimLowerBound"
+    prob += trim_waste <= params["max_trim"], "TrimUpperBound"
     
-    # Remaining length on roll must be at least 100
-    prob += roll_length * z - total_order_len >= 100, "RemainingLengthLowerBound"
+    # Remaining length on roll must be at least min_remaining_length (100 by default)
+    prob += roll_length * z - total_order_len >= params["min_remaining_length"], "RemainingLengthLowerBound"
 
     # 5. Solve the problem
     try:
-        prob.solve(PULP_CBC_CMD(msg=False))
+        await _solve_async(prob, cancel_token)
     except Exception as e:
+        if cancel_token is not None and cancel_token.cancelled:
+            return {"status": "Cancelled", "message": "Solve was cancelled."}
         return {"status": "Solver Error", "message": f"Solver failed: {str(e)}"}
     
     # 6. Retrieve and format results
@@ -359,11 +517,11 @@ async def _format_lp_solution(
         "message": "PuLP problem solved successfully."
     }
 
-async def main_algorithm(
+async def stream_main_algorithm(
     roll_width: int,
     roll_length: int,
-    file_path: str = "order2024.csv",
-    max_records: Optional[int] = 2000,
+    file_path: Union[str, Sequence[str]] = "order2024.csv",
+    max_records: Optional[int] = MAX_RECORDS,
     progress_callback: Optional[Callable[[str], None]] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
@@ -376,15 +534,58 @@ async def main_algorithm(
     back: Optional[str] = None,
     roll_specs: Optional[dict] = None,
     processed_orders: Optional[set] = None,
+    orders_df: Optional[pl.DataFrame] = None,
+    claims: Optional[OrderClaims] = None,
+    claim_owner: Optional[str] = None,
+    planning_params: Optional[dict] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    checkpoint_dir: Optional[str] = None,
 ):
-    output_dir = "cache"
-    os.makedirs(output_dir, exist_ok=True)
+    """
+    Runs the iterative cutting plan for one roll width and material spec, yielding each
+    record as soon as it is known instead of collecting the plan in memory:
+
+    - {"event": "iteration", "roll_w", "iteration", "remaining", "total"} before each solve
+    - {"event": "allocation", "roll_w", "order_number", "layer", "info"} for each roll
+      layer allocated to a cut (the layer's *_roll_info)
+    - {"event": "cut", "iteration", "trim", "row"} for each cut row as it is decided
+    - {"event": "roll_end", "roll_w", "cuts", "remaining"} when the roll has no more cuts
+    - {"event": "unplanned", "row"} for each order left over
+    - {"event": "summary", "cuts", "unplanned", "total_trim", "cancelled"} last
+
+    Rows are the same dicts main_algorithm returns. No files are written.
+
+    When `cancel_token` is cancelled, the running CBC solve is killed and the plan stops with
+    the cuts decided so far; the remaining orders are not reported as unplanned (nor claimed).
+
+    Orders are read from `file_path` (a path, glob or list of paths), unless an
+    already cleaned `orders_df` (e.g. from OrderManager or cleaning.load_orders) is given.
+
+    When `claims` is given, orders claimed by other runs are skipped instead of
+    filtering on `processed_orders`, and every cut is claimed as `claim_owner` before
+    stock is consumed. A cut whose order another run has already cut is dropped.
+
+    `planning_params` overrides the planning rules (see resolve_planning_params).
+
+    With `checkpoint_dir`, the stock of this width is snapshotted before planning, every
+    decided iteration is logged and the loop state is snapshotted periodically (see
+    RunCheckpoint), in a subdirectory named after the run's inputs: width, spec, params
+    and the orders before claimed or processed ones are filtered out. Running again after
+    a crash or cancel resumes there, from the snapshotted stock rather than the stock
+    passed in: the logged cuts are yielded again first, then solving continues. The
+    checkpoint is removed when the run finishes without being cancelled.
+    """
+    planning_params = resolve_planning_params(planning_params)
+    multipliers = planning_params["corrugate_multipliers"]
 
     if progress_callback:
         progress_callback("⚙️ กำลังเริ่มการคำนวณ")
 
-    orders_df = cleaning.clean_data(
-        cleaning.load_data(file_path), 
+    # file_path อาจเป็นไฟล์เดียว, glob หรือรายการไฟล์ ซึ่งจะถูกโหลดพร้อมกันและรวมเป็น DataFrame เดียว
+    if orders_df is None:
+        orders_df = cleaning.load_orders(file_path, progress_callback=progress_callback)
+    orders_df = cleaning.filter_orders(
+        orders_df,
         start_date,
         end_date,
         front=front,
@@ -394,7 +595,24 @@ async def main_algorithm(
         back=back,
     )
 
-    if processed_orders:
+    # original_idx และ key ของ checkpoint มาจากออเดอร์ก่อนกรองออเดอร์ที่ถูกจอง/ประมวลผลแล้ว
+    # จึงตรงกันเมื่อรันซ้ำ แม้ชุดออเดอร์ที่ถูกจองจะเปลี่ยนไป
+    orders_df = orders_df.with_row_index("original_idx")
+    order_numbers = orders_df["order_number"].to_list()
+    checkpoint = None
+    if checkpoint_dir:
+        key = run_key(
+            roll_width, roll_length, front, c_type, c, middle, b_type, b, back, planning_params,
+            max_records, order_numbers,
+        )
+        checkpoint = RunCheckpoint(os.path.join(checkpoint_dir, key))
+
+    if claims is not None:
+        claim_owner = claim_owner or f"{roll_width}:{front}:{c}:{middle}:{b}:{back}"
+        claimed = claims.claimed_orders(exclude_owner=claim_owner)
+        if claimed:
+            orders_df = orders_df.filter(~pl.col("order_number").is_in(list(claimed)))
+    elif processed_orders:
         orders_df = orders_df.filter(
             ~pl.col("order_number").is_in(list(processed_orders))
         )
@@ -404,12 +622,12 @@ async def main_algorithm(
 
     if max_records:
         orders_df = orders_df.head(max_records)
-    orders_df = orders_df.with_row_index("original_idx")
     
     rolls = [{"width": roll_width, "length": roll_length}]
-    all_results = []
-
-    order_num_col_idx = orders_df.columns.index("order_number")
+    cut_count = 0
+    unplanned_count = 0
+    total_trim = 0.0
+    cancelled = False
 
     for roll in rolls:
         last_used_roll_ids = {}
@@ -418,27 +636,84 @@ async def main_algorithm(
             progress_callback(f"🔧 กำลังประมวลผลม้วน {roll['width']} นิ้ว")
         
         rem_orders_df = orders_df.clone()
-        roll_cuts = []
+        roll_cut_count = 0
         iteration = 0
+        replay = {}  # รอบ -> ผลของ solver ที่บันทึกไว้ ใช้แทนการแก้ปัญหาใหม่
+        snapshot_at = 0
+
+        def loop_state() -> dict:
+            return {
+                "iteration": iteration,
+                "roll_length": roll['length'],
+                "remaining": rem_orders_df["original_idx"].to_list(),
+                "last_used_roll_ids": last_used_roll_ids,
+                "used_roll_ids_for_cut": used_roll_ids_for_cut,
+                "width_specs": (roll_specs or {}).get(str(roll['width'])),
+            }
+
+        if checkpoint is not None:
+            state, decisions = checkpoint.load()
+            if state is None:
+                # สต็อกก่อนเริ่มวางแผน: การรันซ้ำเริ่มจากสต็อกนี้ แม้สต็อกในหน่วยความจำถูกตัดไปแล้ว
+                checkpoint.snapshot(loop_state())
+            else:
+                iteration = snapshot_at = state["iteration"]
+                roll['length'] = state["roll_length"]
+                last_used_roll_ids = state["last_used_roll_ids"]
+                used_roll_ids_for_cut = state["used_roll_ids_for_cut"]
+                if roll_specs is not None and state["width_specs"] is not None:
+                    roll_specs[str(roll['width'])] = state["width_specs"]
+                rem_orders_df = orders_df.filter(pl.col("original_idx").is_in(state["remaining"]))
+            for decision in decisions:
+                if decision["iteration"] > snapshot_at:
+                    replay[decision["iteration"]] = decision["result"]
+                elif decision["row"] is not None:
+                    row = decision["row"]
+                    if claims is not None:
+                        claims.claim(row["order_number"], claim_owner, row["trim"])
+                    cut_count += 1
+                    roll_cut_count += 1
+                    total_trim += row["trim"] or 0
+                    yield {"event": "cut", "iteration": decision["iteration"], "trim": row["trim"], "row": row}
+            if decisions and progress_callback:
+                progress_callback(f"↩️ ทำต่อจาก checkpoint: {snapshot_at} รอบจาก snapshot, {len(replay)} รอบจาก log")
+
         while not rem_orders_df.is_empty():
+            if checkpoint is not None and iteration > snapshot_at and checkpoint.due(iteration):
+                snapshot_at = iteration
+                checkpoint.snapshot(loop_state())
+            if cancel_token is not None and cancel_token.cancelled:
+                cancelled = True
+                break
             iteration += 1
             if progress_callback:
                 progress_callback(f"  Iteration {iteration}: Remaining orders: {rem_orders_df.shape[0]} items")
+            yield {"event": "iteration", "roll_w": roll['width'], "iteration": iteration,
+                   "remaining": rem_orders_df.height, "total": orders_df.height}
 
             if c is None : 
                 c_type = None
             if b is None : 
                 b_type = None         
 
-            result = await solve_linear_program(
-                roll['width'],
-                roll['length'],
-                rem_orders_df,
-                c_type=c_type,
-                b_type=b_type,
-            )
+            # รอบที่มาจาก log ถูกบันทึกไว้แล้ว ไม่บันทึกซ้ำ
+            replayed = iteration in replay
+            result = replay.pop(iteration, None)
+            if result is None:
+                result = await solve_linear_program(
+                    roll['width'],
+                    roll['length'],
+                    rem_orders_df,
+                    c_type=c_type,
+                    b_type=b_type,
+                    params=planning_params,
+                    cancel_token=cancel_token,
+                )
 
             status = result.get("status")
+            if status == "Cancelled":
+                cancelled = True
+                break
             if status != "Optimal":
                 if progress_callback:
                     progress_callback(f"    ❌ {result.get('message', 'Non-optimal status')}")
@@ -451,8 +726,17 @@ async def main_algorithm(
                 progress_callback(f"    Optimal solution found. Trim: {variables.get('trim', 0):.4f}")
                 progress_callback(f"    Selected order width: {variables.get('order_w')} (Index: {order_idx}), Cuts: {variables.get('cuts')}")
 
-            order_number = orders_df.row(int(order_idx))[order_num_col_idx] if order_idx is not None else None
-            
+            order_number = order_numbers[int(order_idx)] if order_idx is not None else None
+
+            if claims is not None and order_number is not None and not claims.claim(order_number, claim_owner, variables.get("trim", UNPLANNED_TRIM)):
+                # อีกรอบการคำนวณตัดออเดอร์นี้ไปแล้ว ข้ามโดยไม่ตัดสต็อก
+                if progress_callback:
+                    progress_callback(f"    ⏭️ Order {order_number} already claimed by {claims.owner_of(order_number)}")
+                rem_orders_df = rem_orders_df.filter(pl.col("original_idx") != order_idx)
+                if checkpoint is not None and not replayed:
+                    checkpoint.record(iteration, result, None)
+                continue
+
             material_specs = result.get("material_specs", {})
             variables = result.get("variables", {})
             roll_info = {}
@@ -464,11 +748,11 @@ async def main_algorithm(
 
                 type_demand_divisor = 1.0
                 if c_type_spec == 'C':
-                    type_demand_divisor = CORRUGATE_MULTIPLIERS['C']
+                    type_demand_divisor = multipliers['C']
                 elif b_type_spec == 'B':
-                    type_demand_divisor = CORRUGATE_MULTIPLIERS['B']
+                    type_demand_divisor = multipliers['B']
                 elif c_type_spec == 'E' or b_type_spec == 'E':
-                    type_demand_divisor = CORRUGATE_MULTIPLIERS['E']
+                    type_demand_divisor = multipliers['E']
 
                 if material_specs.get('front'):
                     material = str(material_specs.get('front')).strip()
@@ -483,7 +767,7 @@ async def main_algorithm(
                     material = str(material_specs.get('c')).strip()
                     value = demand_per_cut
                     if b_type_spec == 'B':
-                        value = value / CORRUGATE_MULTIPLIERS['B'] * CORRUGATE_MULTIPLIERS['E']
+                        value = value / multipliers['B'] * multipliers['E']
                     roll_info['c_roll_info'] = _find_and_update_roll(roll_specs, roll_w_str, material, value, used_roll_ids_for_cut, last_used_roll_ids, order_number)
 
                 if material_specs.get('middle'):
@@ -495,13 +779,13 @@ async def main_algorithm(
                     material = str(material_specs.get('b')).strip()
                     value = demand_per_cut
                     if c_type_spec == 'C':
-                        value = (value / CORRUGATE_MULTIPLIERS['C']) * CORRUGATE_MULTIPLIERS['B']
+                        value = (value / multipliers['C']) * multipliers['B']
                     roll_info['b_roll_info'] = _find_and_update_roll(roll_specs, roll_w_str, material, value, used_roll_ids_for_cut, last_used_roll_ids, order_number)
                 elif material_specs.get('b') and b_type_spec == 'E':
                     material = str(material_specs.get('b')).strip()
                     value = demand_per_cut
                     if c_type_spec == 'C':
-                        value = (value / CORRUGATE_MULTIPLIERS['C']) * CORRUGATE_MULTIPLIERS['E']
+                        value = (value / multipliers['C']) * multipliers['E']
                     roll_info['b_roll_info'] = _find_and_update_roll(roll_specs, roll_w_str, material, value, used_roll_ids_for_cut, last_used_roll_ids, order_number)
 
                 if material_specs.get('back'):
@@ -525,8 +809,15 @@ async def main_algorithm(
             }
             cut_info.update(material_specs)  # Add all material specs
             cut_info.update(roll_info)
-            all_results.append(cut_info)
-            roll_cuts.append(cut_info)
+            if checkpoint is not None and not replayed:
+                checkpoint.record(iteration, result, cut_info)
+            for key, info in roll_info.items():
+                yield {"event": "allocation", "roll_w": cut_info["roll_w"], "order_number": order_number,
+                       "layer": key[:-len("_roll_info")], "info": info}
+            cut_count += 1
+            roll_cut_count += 1
+            total_trim += cut_info["trim"] or 0
+            yield {"event": "cut", "iteration": iteration, "trim": cut_info["trim"], "row": cut_info}
 
             roll['length'] = variables.get("rem_roll_l")
 
@@ -537,15 +828,12 @@ async def main_algorithm(
                     progress_callback("    Warning: order_idx is None, cannot remove order. Stopping.")
                 break
 
-        # Save results for the current roll to a CSV file
-        if roll_cuts:
-            output_df = pl.DataFrame(roll_cuts)
-            output_filename = os.path.join(output_dir, f"roll_cut_results_{roll['width']}.csv")
-            output_df.write_csv(output_filename)
+        yield {"event": "roll_end", "roll_w": roll['width'], "cuts": roll_cut_count, "remaining": rem_orders_df.height}
+
+        if cancelled:
             if progress_callback:
-                progress_callback(f"--- Saved {len(roll_cuts)} cuts for roll {roll['width']} to {output_filename} ---")
-        elif progress_callback:
-            progress_callback(f"--- No cuts made for roll {roll['width']} ---")
+                progress_callback(f"⏹️ การคำนวณถูกยกเลิก เหลือ {rem_orders_df.height} ออเดอร์ที่ยังไม่ได้คำนวณ")
+            break
 
         if not rem_orders_df.is_empty():
             if progress_callback:
@@ -553,6 +841,8 @@ async def main_algorithm(
             
             unprocessed_orders = rem_orders_df.to_dicts()
             for order in unprocessed_orders:
+                if claims is not None:
+                    claims.claim(order.get("order_number"), claim_owner, UNPLANNED_TRIM)
                 unprocessed_result = {
                     "roll_w": "Failed/Infeasible",
                     "rem_roll_l": 0,
@@ -578,13 +868,123 @@ async def main_algorithm(
                     "b_roll_info": "-> (ประมวลผลไม่สำเร็จ)",
                     "back_roll_info": "-> (ประมวลผลไม่สำเร็จ)",
                 }
-                all_results.append(unprocessed_result)
+                unplanned_count += 1
+                yield {"event": "unplanned", "row": unprocessed_result}
 
-    # Save all cutting results to a single summary CSV file
-    if all_results:
-        final_output_df = pl.DataFrame(all_results)
-        final_output_df.write_csv(os.path.join(output_dir, "all_cutting_plan_summary.csv"))
-        if progress_callback:
-            progress_callback("💾 บันทึกผลลัพธ์ลงไฟล์ CSV เรียบร้อย")
-    
+    if checkpoint is not None and not cancelled:
+        checkpoint.clear()
+    yield {"event": "summary", "cuts": cut_count, "unplanned": unplanned_count, "total_trim": round(total_trim, 4),
+           "cancelled": cancelled}
+
+
+async def main_algorithm(
+    roll_width: int,
+    roll_length: int,
+    file_path: Union[str, Sequence[str]] = "order2024.csv",
+    max_records: Optional[int] = MAX_RECORDS,
+    progress_callback: Optional[Callable[[str], None]] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    front: Optional[str] = None,
+    c_type: Optional[str] = None,
+    c: Optional[str] = None,
+    middle: Optional[str] = None,
+    b_type: Optional[str] = None,
+    b: Optional[str] = None,
+    back: Optional[str] = None,
+    roll_specs: Optional[dict] = None,
+    processed_orders: Optional[set] = None,
+    orders_df: Optional[pl.DataFrame] = None,
+    claims: Optional[OrderClaims] = None,
+    claim_owner: Optional[str] = None,
+    output_dir: str = "cache",
+    planning_params: Optional[dict] = None,
+    event_callback: Optional[Callable[[dict], None]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    progress_event_callback: Optional[Callable[[ProgressEvent], None]] = None,
+    result_writer: Optional[ResultWriter] = None,
+    output_format: str = "csv",
+    checkpoint_dir: Optional[str] = None,
+):
+    """
+    Runs the iterative cutting plan for one roll width and material spec
+    (see stream_main_algorithm) and returns all cut and unplanned rows.
+
+    Per-roll and summary files (roll_cut_results_<width>_<run id>, all_cutting_plan_summary_<run id>)
+    are written to `output_dir` by a background ResultWriter, so every run gets its own files.
+    Pass `result_writer` to share one writer between runs and flush/close it yourself;
+    otherwise one is opened in `output_format` and closed (all files written) before returning,
+    and the files of all but the last RESULT_RUN_HISTORY runs in `output_dir` are deleted
+    (see result_writer.prune_run_files). A shared writer's owner prunes once it has closed it.
+
+    `event_callback`, if given, receives every record of stream_main_algorithm as it is yielded.
+
+    `progress_event_callback`, if given, receives ProgressEvents, at most a few per second
+    (see ProgressThrottle); the first and last stage are always delivered.
+
+    If `cancel_token` is cancelled, the rows decided so far are saved and returned.
+
+    `checkpoint_dir` enables checkpoints and resuming (see stream_main_algorithm).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    writer = result_writer or ResultWriter(output_format)
+    run_id = new_run_id()
+    all_results = []
+    roll_cuts = []
+    cancelled = False
+    started = time.monotonic()
+    progress = ProgressThrottle(progress_event_callback) if progress_event_callback else None
+    iteration = total = remaining = 0
+
+    def report(stage: str) -> None:
+        if progress:
+            progress(ProgressEvent(stage, iteration, total, remaining, round(time.monotonic() - started, 3)))
+
+    report("starting")
+
+    try:
+        async for record in stream_main_algorithm(
+            roll_width, roll_length, file_path, max_records, progress_callback,
+            start_date, end_date, front, c_type, c, middle, b_type, b, back,
+            roll_specs, processed_orders, orders_df, claims, claim_owner, planning_params,
+            cancel_token=cancel_token, checkpoint_dir=checkpoint_dir,
+        ):
+            if event_callback:
+                event_callback(record)
+            if record["event"] == "iteration":
+                iteration, total, remaining = record["iteration"], record["total"], record["remaining"]
+                report("planning")
+            elif record["event"] == "summary":
+                cancelled = record["cancelled"]
+            if record["event"] in ("cut", "unplanned"):
+                all_results.append(record["row"])
+            if record["event"] == "cut":
+                roll_cuts.append(record["row"])
+            elif record["event"] == "roll_end":
+                # ส่งผลลัพธ์ของม้วนนี้ให้ writer เขียนเบื้องหลัง
+                if roll_cuts:
+                    output_filename = writer.submit(
+                        os.path.join(output_dir, f"roll_cut_results_{record['roll_w']}_{run_id}"), roll_cuts
+                    )
+                    if progress_callback:
+                        progress_callback(f"--- Saving {len(roll_cuts)} cuts for roll {record['roll_w']} to {output_filename} ---")
+                elif progress_callback:
+                    progress_callback(f"--- No cuts made for roll {record['roll_w']} ---")
+                roll_cuts = []
+
+        # Save all cutting results to a single summary file
+        report("saving")
+        if all_results:
+            summary_filename = writer.submit(
+                os.path.join(output_dir, f"all_cutting_plan_summary_{run_id}"), list(all_results)
+            )
+            if progress_callback:
+                progress_callback(f"💾 บันทึกผลลัพธ์ลงไฟล์ {summary_filename}")
+    finally:
+        if result_writer is None:
+            writer.close()
+    if result_writer is None:
+        prune_run_files(output_dir)
+
+    report("cancelled" if cancelled else "done")
     return all_results
@@ -0,0 +1,216 @@
+import codecs
+import os
+from typing import Dict, List, Optional
+
+import polars as pl
+
+import core
+from results_store import ResultsStore
+
+EXPORT_CHUNK_ROWS = 50_000  # จำนวนแถวต่อชุดที่เขียนลงไฟล์
+EXPORT_FORMATS = ("csv", "parquet", "xlsx")
+
+PLY_LABELS = {"front": "แผ่นหน้า", "c": "ลอน C", "middle": "แผ่นกลาง", "b": "ลอน B", "back": "แผ่นหลัง"}
+DETAIL_HEADERS = [
+    "แผ่นหน้า (วัสดุ)", "แผ่นหน้า (ใช้)", "แผ่นหน้า (ID ม้วน)",
+    "ลอน C (วัสดุ)", "ลอน C (ใช้)", "ลอน C (ID ม้วน)",
+    "แผ่นกลาง (วัสดุ)", "แผ่นกลาง (ใช้)", "แผ่นกลาง (ID ม้วน)",
+    "ลอน B (วัสดุ)", "ลอน B (ใช้)", "ลอน B (ID ม้วน)",
+    "แผ่นหลัง (วัสดุ)", "แผ่นหลัง (ใช้)", "แผ่นหลัง (ID ม้วน)",
+    "ประเภททับเส้น", "ชนิดส่วนประกอบ",
+]
+
+RESULT_COLUMNS = [
+    "roll_w", "order_number", "order_w", "cuts", "trim", "order_l", "order_dmd", "die_cut", "order_qty",
+    "demand_per_cut", "c_type", "b_type", "front", "c", "middle", "b", "back",
+    "front_roll_info", "c_roll_info", "middle_roll_info", "b_roll_info", "back_roll_info", "type", "component_type",
+]
+
+# "ID (ยาว 500 ม., เหลือ 120 ม.)" หรือ "ID (ยาว 500 ม., ใช้หมด)" (ดู core._find_and_update_roll)
+ROLL_PATTERN = r'^(.+?)\s*\(ยาว\s*(\d+)\s*ม\.,\s*(?:เหลือ\s*(\d+)\s*ม\.|(ใช้หมด))\)'
+
+
+def _text(name: str) -> pl.Expr:
+    return pl.col(name).cast(pl.String, strict=False).fill_null("")
+
+
+def _fixed(expr: pl.Expr, decimals: int) -> pl.Expr:
+    """Formats a number with a fixed number of decimals, like f"{x:.Nf}" (ties may round differently); null gives ""."""
+    return expr.cast(pl.Float64, strict=False).cast(pl.Decimal(38, decimals)).cast(pl.String).fill_null("")
+
+
+def _present(name: str) -> pl.Expr:
+    return pl.col(name).is_not_null() & (pl.col(name).cast(pl.String) != "")
+
+
+def _demand_per_cut_text() -> pl.Expr:
+    cuts = pl.col("cuts").cast(pl.Float64, strict=False)
+    quantity = pl.col("order_qty").cast(pl.Float64, strict=False)
+    return (
+        pl.when((cuts > 0) & quantity.is_not_null())
+        .then(_fixed(quantity / cuts, 2))
+        .otherwise(pl.lit("N/A"))
+    )
+
+
+# หัวตารางของ UI -> นิพจน์ข้อความในคอลัมน์ (ตรงกับ results_model.RESULT_COLUMNS)
+DISPLAY_COLUMNS: Dict[str, pl.Expr] = {
+    "ความกว้างม้วน": _text("roll_w"),
+    "หมายเลขออเดอร์": _text("order_number"),
+    "ความกว้างออเดอร์": _fixed(pl.col("order_w"), 4),
+    "จำนวนออก": _text("cuts"),
+    "เศษเหลือ": _fixed(pl.col("trim"), 2),
+    "ความยาวออเดอร์": _fixed(pl.col("order_l"), 4),
+    "จำนวนสั่งส่ง": _text("order_dmd"),
+    "ผลิตได้": _text("die_cut"),
+    "จำนวนสั่งผลิต": _text("order_qty"),
+    "ปริมาณตัด": _demand_per_cut_text(),
+}
+
+
+def format_roll_usage(name: str) -> pl.Expr:
+    """
+    Vectorized form of the roll usage text for export: "-> status: ID (ยาว N ม., เหลือ M ม.) + ..."
+    becomes "status:" followed by one "  ID: .., ยาวเดิม: .., ใช้ไป: .., คงเหลือ: .." line per roll.
+    """
+    info = pl.col(name).cast(pl.String).fill_null("")
+    parts = info.str.splitn(": ", 2)
+    status = parts.struct.field("field_0").str.replace_all("-> ", "", literal=True).str.strip_chars()
+
+    roll = pl.element().str.strip_chars()
+    groups = roll.str.extract_groups(ROLL_PATTERN)
+    original = groups.struct.field("2").cast(pl.Int64)
+    remaining = (
+        pl.when(groups.struct.field("4").is_not_null()).then(pl.lit(0, dtype=pl.Int64))
+        .otherwise(groups.struct.field("3").cast(pl.Int64).fill_null(0))
+    )
+    line = (
+        pl.when(original.is_not_null()).then(pl.concat_str([
+            pl.lit("  ID: "), groups.struct.field("1").str.strip_chars(),
+            pl.lit(", ยาวเดิม: "), original.cast(pl.String),
+            pl.lit(", ใช้ไป: "), (original - remaining).cast(pl.String),
+            pl.lit(", คงเหลือ: "), remaining.cast(pl.String),
+        ]))
+        .otherwise(pl.concat_str([pl.lit("  (ข้อมูลไม่สมบูรณ์: "), roll, pl.lit(")")]))
+    )
+    lines = parts.struct.field("field_1").str.split(" + ").list.eval(line).list.join("\n")
+
+    return (
+        pl.when(~info.str.contains("->", literal=True) | info.str.contains("(ไม่มี", literal=True))
+        .then(info.str.replace_all("-> ", "", literal=True).str.strip_chars())
+        .when(parts.struct.field("field_1").is_null()).then(info)
+        .otherwise(pl.concat_str([status, pl.lit(":\n"), lines]))
+    )
+
+
+def build_export_frame(frame: pl.DataFrame, headers: List[str], multipliers: Optional[dict] = None) -> pl.DataFrame:
+    """
+    Builds the export table for results in one vectorized pass: the UI columns `headers`
+    followed by DETAIL_HEADERS (material, meters used and roll usage per ply, then types).
+
+    `frame` is a ResultsStore frame (or a DataFrame of result dicts). Meters per ply use
+    `multipliers` (default core.CORRUGATE_MULTIPLIERS), the same factors as main_algorithm.
+    """
+    multipliers = {**core.CORRUGATE_MULTIPLIERS, **(multipliers or {})}
+    frame = ResultsStore.export_frame(frame)
+    frame = frame.with_columns([pl.lit(None).alias(column) for column in RESULT_COLUMNS if column not in frame.columns])
+
+    c_type = pl.col("c_type").cast(pl.String)
+    b_type = pl.col("b_type").cast(pl.String)
+    demand = pl.col("demand_per_cut").cast(pl.Float64, strict=False).fill_null(0)
+    type_demand = (
+        pl.when(c_type == "C").then(pl.lit(multipliers["C"]))
+        .when(b_type == "B").then(pl.lit(multipliers["B"]))
+        .when((c_type == "E") | (b_type == "E")).then(pl.lit(multipliers["E"]))
+        .otherwise(pl.lit(1.0))
+    )
+    per_sheet = demand / type_demand
+    c_value = (
+        pl.when(c_type == "C").then(demand)
+        .when((c_type == "E") & (b_type == "B")).then(demand / multipliers["B"] * multipliers["E"])
+        .when(c_type == "E").then(demand)
+    )
+    b_value = (
+        pl.when((b_type == "B") & (c_type == "C")).then(demand / multipliers["C"] * multipliers["B"])
+        .when(b_type == "B").then(demand)
+        .when((b_type == "E") & (c_type == "C")).then(demand / multipliers["C"] * multipliers["E"])
+        .when(b_type == "E").then(demand)
+    )
+    values = {"front": per_sheet, "c": c_value, "middle": per_sheet, "b": b_value, "back": per_sheet}
+
+    detail = []
+    for ply, label in PLY_LABELS.items():
+        present = _present(ply)
+        detail += [
+            pl.when(present).then(_text(ply)).otherwise(pl.lit("")).alias(f"{label} (วัสดุ)"),
+            pl.when(present).then(_fixed(values[ply], 2)).otherwise(pl.lit("")).alias(f"{label} (ใช้)"),
+            pl.when(present).then(format_roll_usage(f"{ply}_roll_info")).otherwise(pl.lit("")).alias(f"{label} (ID ม้วน)"),
+        ]
+    detail += [_text("type").alias("ประเภททับเส้น"), _text("component_type").alias("ชนิดส่วนประกอบ")]
+
+    return frame.select([DISPLAY_COLUMNS[header].alias(header) for header in headers] + detail)
+
+
+def export_format(path: str, fmt: Optional[str] = None) -> str:
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".") or "csv").lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt} (use one of {', '.join(EXPORT_FORMATS)})")
+    return fmt
+
+
+def write_frame(frame: pl.DataFrame, path: str, fmt: Optional[str] = None, chunk_rows: int = EXPORT_CHUNK_ROWS) -> None:
+    """
+    Writes frame to path as CSV (utf-8-sig for Excel), Parquet or XLSX, chosen by `fmt`
+    or the file extension, `chunk_rows` rows at a time. The file is written under a
+    temporary name and renamed, so a reader never sees half an export.
+    """
+    fmt = export_format(path, fmt)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    try:
+        if fmt == "csv":
+            _write_csv(frame, tmp_path, chunk_rows)
+        elif fmt == "parquet":
+            frame.write_parquet(tmp_path, row_group_size=chunk_rows)
+        else:
+            _write_xlsx(frame, tmp_path, chunk_rows)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _write_csv(frame: pl.DataFrame, path: str, chunk_rows: int) -> None:
+    with open(path, "wb") as f:
+        f.write(codecs.BOM_UTF8)
+        if frame.is_empty():
+            frame.write_csv(f)
+        for i, chunk in enumerate(frame.iter_slices(chunk_rows)):
+            chunk.write_csv(f, include_header=i == 0)
+
+
+def _write_xlsx(frame: pl.DataFrame, path: str, chunk_rows: int) -> None:
+    try:
+        import xlsxwriter
+    except ImportError as e:
+        raise ImportError("XLSX export needs the xlsxwriter package (pip install xlsxwriter)") from e
+    # constant_memory เขียนทีละแถวลงไฟล์ ไม่เก็บทั้งชีตไว้ในหน่วยความจำ
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "nan_inf_to_errors": True})
+    try:
+        worksheet = workbook.add_worksheet("results")
+        worksheet.write_row(0, 0, frame.columns)
+        row_idx = 1
+        for chunk in frame.iter_slices(chunk_rows):
+            for row in chunk.iter_rows():
+                worksheet.write_row(row_idx, 0, row)
+                row_idx += 1
+    finally:
+        workbook.close()
+
+
+def export_results(store: ResultsStore, path: str, headers: List[str], fmt: Optional[str] = None,
+                   multipliers: Optional[dict] = None) -> int:
+    """Exports the results of a store with the UI columns `headers` and the per-ply details. Returns the row count."""
+    frame = build_export_frame(store.frame, headers, multipliers)
+    write_frame(frame, path, fmt)
+    return frame.height
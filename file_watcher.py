@@ -0,0 +1,158 @@
+import hashlib
+import os
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+from cleaning import resolve_paths
+
+# ระยะเวลารอให้ไฟล์เขียนเสร็จก่อนอ่าน (มิลลิวินาที)
+DEBOUNCE_MS = 500
+# ตรวจสอบสำรองเป็นระยะ สำหรับไดรฟ์เครือข่ายที่ไม่ส่งการแจ้งเตือนการเปลี่ยนแปลง
+FALLBACK_INTERVAL_MS = 60000
+
+
+def _file_signature(file_paths):
+    """คืนค่า (ชื่อไฟล์, ขนาด, เวลาแก้ไข) ของทุกไฟล์ที่มีอยู่ หรือ None หากไม่พบไฟล์ใดเลย"""
+    signature = []
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            continue
+        signature.append((file_path, st.st_size, st.st_mtime_ns))
+    return tuple(signature) or None
+
+
+def _file_digest(file_paths) -> str:
+    """คำนวณแฮชของเนื้อหาไฟล์ทั้งหมดเพื่อตรวจว่าเนื้อหาเปลี่ยนจริงหรือไม่"""
+    digest = hashlib.blake2b(digest_size=16)
+    for file_path in file_paths:
+        digest.update(file_path.encode('utf-8'))
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileWatcher(QObject):
+    """
+    เฝ้าดูไฟล์ด้วยการแจ้งเตือนจากระบบไฟล์ (QFileSystemWatcher) แทนการวนตรวจสอบ
+    รองรับไฟล์เดียว, glob หรือรายการไฟล์ (ดู cleaning.resolve_paths)
+    - รวบการแจ้งเตือนที่เกิดติดกันด้วยช่วง debounce เพื่อไม่อ่านไฟล์ที่ยังเขียนไม่เสร็จ
+    - ส่ง file_changed เฉพาะเมื่อแฮชของเนื้อหาเปลี่ยนไปจากครั้งก่อน
+    ต้องสร้างและใช้งานในเธรดที่มี event loop (เช่นภายใน QThread)
+    """
+    file_changed = pyqtSignal(object)  # ส่งค่า file_path ที่เฝ้าดู (str หรือ list)
+    file_missing = pyqtSignal(str)
+
+    def __init__(self, file_path, debounce_ms=DEBOUNCE_MS,
+                 fallback_interval_ms=FALLBACK_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self._file_path = file_path
+        self._last_digest = None
+        self._last_signature = None
+        self._pending_signature = None
+        self._file_exists = True  # สมมติว่าไฟล์มีอยู่ตอนเริ่มต้น
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._schedule_check)
+        self._watcher.directoryChanged.connect(self._schedule_check)
+
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(debounce_ms)
+        self._debounce_timer.timeout.connect(self._check)
+
+        self._fallback_timer = QTimer(self)
+        self._fallback_timer.setInterval(fallback_interval_ms)
+        self._fallback_timer.timeout.connect(self._poll)
+
+    def start(self):
+        """เริ่มเฝ้าดูไฟล์และตรวจสอบไฟล์ทันทีหนึ่งครั้ง"""
+        self._update_watch_paths()
+        self._fallback_timer.start()
+        self._check()
+
+    def stop(self):
+        """หยุดการเฝ้าดูไฟล์"""
+        self._debounce_timer.stop()
+        self._fallback_timer.stop()
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+
+    def set_file_path(self, file_path):
+        """เปลี่ยนไฟล์ที่เฝ้าดูและบังคับให้โหลดใหม่"""
+        self._file_path = file_path
+        self._last_digest = None
+        self._last_signature = None
+        self._file_exists = True
+        self._update_watch_paths()
+        self._schedule_check()
+
+    def _update_watch_paths(self):
+        """
+        เฝ้าดูทั้งตัวไฟล์และโฟลเดอร์ที่อยู่ เพื่อรองรับกรณีไฟล์ถูกสร้างใหม่
+        หรือถูกแทนที่ (เช่นการเขียนไฟล์ชั่วคราวแล้วเปลี่ยนชื่อ) ซึ่งทำให้ไฟล์หลุดจากรายการเฝ้าดู
+        """
+        watched = self._watcher.files() + self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+        patterns = [self._file_path] if isinstance(self._file_path, str) else list(self._file_path)
+        directories = {os.path.dirname(os.path.abspath(pattern)) for pattern in patterns}
+        directories = [d for d in directories if os.path.isdir(d)]
+        if directories:
+            self._watcher.addPaths(directories)
+        existing = self._existing_paths()
+        if existing:
+            self._watcher.addPaths(existing)
+
+    def _existing_paths(self):
+        return [p for p in resolve_paths(self._file_path) if os.path.isfile(p)]
+
+    def _schedule_check(self, *_args):
+        """เริ่มนับ debounce ใหม่ทุกครั้งที่มีการเปลี่ยนแปลง"""
+        self._pending_signature = _file_signature(self._existing_paths())
+        self._debounce_timer.start()
+
+    def _poll(self):
+        """การตรวจสอบสำรอง: อ่านเฉพาะข้อมูล stat และข้ามหากไม่มีอะไรเปลี่ยน"""
+        signature = _file_signature(self._existing_paths())
+        if signature is not None and signature == self._last_signature:
+            return
+        self._schedule_check()
+
+    def _check(self):
+        file_paths = self._existing_paths()
+        signature = _file_signature(file_paths)
+        if signature is None:
+            # ส่งสัญญาณเฉพาะเมื่อตรวจพบว่าไฟล์หายไปครั้งแรก
+            if self._file_exists:
+                self._file_exists = False
+                self.file_missing.emit(str(self._file_path))
+            return
+
+        if self._pending_signature is not None and signature != self._pending_signature:
+            # ไฟล์ยังถูกเขียนอยู่ รอให้นิ่งก่อน
+            self._schedule_check()
+            return
+        self._pending_signature = None
+
+        # หากพบไฟล์ ให้รีเซ็ตแฟล็ก และเฝ้าดูไฟล์อีกครั้งหากหลุดจากรายการ (รวมถึงไฟล์ใหม่ที่ตรงกับ glob)
+        self._file_exists = True
+        unwatched = [p for p in file_paths if p not in self._watcher.files()]
+        if unwatched:
+            self._watcher.addPaths(unwatched)
+
+        try:
+            digest = _file_digest(file_paths)
+        except OSError:
+            # ไฟล์อาจถูกล็อกหรือกำลังถูกแทนที่ ลองใหม่ในรอบถัดไป
+            self._schedule_check()
+            return
+
+        self._last_signature = signature
+        if digest == self._last_digest:
+            return
+        self._last_digest = digest
+        self.file_changed.emit(self._file_path)
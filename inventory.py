@@ -0,0 +1,155 @@
+from typing import Optional, Tuple
+
+import polars as pl
+
+STOCK_KEY_COLS = ["roll_number", "roll_size", "roll_type", "length"]
+
+
+def _valid_rolls(stock_df: Optional[pl.DataFrame]) -> Tuple[pl.DataFrame, int, int]:
+    """
+    Returns (the roll rows that can be keyed by roll_number with one row per roll, the
+    number of rows without a roll_number, the number of rows dropped because a later row
+    has the same roll_number).
+    """
+    if stock_df is None or stock_df.is_empty() or not all(col in stock_df.columns for col in STOCK_KEY_COLS):
+        empty = pl.DataFrame(schema={"roll_number": pl.Utf8, "roll_size": pl.Int64, "roll_type": pl.Utf8, "length": pl.Int64})
+        return empty, (stock_df.height if stock_df is not None else 0), 0
+    keyed = (
+        stock_df.select(STOCK_KEY_COLS)
+        .with_columns(pl.col("roll_number").cast(pl.Utf8).str.strip_chars())
+        .filter(pl.col("roll_number").is_not_null() & (pl.col("roll_number") != ""))
+    )
+    # ม้วนเดียวกันปรากฏหลายแถว ใช้แถวล่าสุดเหมือน ROLL_SPECS
+    rolls = keyed.unique(subset="roll_number", keep="last", maintain_order=True)
+    return rolls, stock_df.height - keyed.height, keyed.height - rolls.height
+
+
+def diff_stock(previous_df: Optional[pl.DataFrame], current_df: Optional[pl.DataFrame]) -> dict:
+    """
+    Computes the changes between two cleaned stock snapshots, keyed by roll_number.
+
+    A roll whose width or paper type changed is reported as removed and re-added,
+    since it moves to another bucket of the inventory.
+
+    Args:
+        previous_df (Optional[pl.DataFrame]): The previous cleaned stock, or None for a first load.
+        current_df (Optional[pl.DataFrame]): The newly cleaned stock.
+
+    Returns:
+        dict: {"snapshot", "added", "removed", "changed", "skipped", "duplicates"} where
+        "snapshot" is True when there was no previous stock and "added" then holds the whole
+        inventory. "skipped" counts current rows without a roll_number and "duplicates" the
+        rows replaced by a later row of the same roll_number.
+    """
+    current, skipped, duplicates = _valid_rolls(current_df)
+
+    if previous_df is None:
+        return {
+            "snapshot": True,
+            "added": current,
+            "removed": current.clear(),
+            "changed": current.clear(),
+            "skipped": skipped,
+            "duplicates": duplicates,
+        }
+
+    previous, _, _ = _valid_rolls(previous_df)
+    joined = current.join(previous, on="roll_number", how="inner", suffix="_prev")
+    moved = joined.filter(
+        (pl.col("roll_size") != pl.col("roll_size_prev"))
+        | (pl.col("roll_type").cast(pl.Utf8) != pl.col("roll_type_prev").cast(pl.Utf8))
+    )
+    changed = joined.filter(
+        (pl.col("roll_size") == pl.col("roll_size_prev"))
+        & (pl.col("roll_type").cast(pl.Utf8) == pl.col("roll_type_prev").cast(pl.Utf8))
+        & (pl.col("length") != pl.col("length_prev"))
+    ).select(STOCK_KEY_COLS)
+
+    moved_ids = moved.select("roll_number")
+    added = pl.concat([
+        current.join(previous, on="roll_number", how="anti"),
+        current.join(moved_ids, on="roll_number", how="semi"),
+    ])
+    removed = pl.concat([
+        previous.join(current, on="roll_number", how="anti"),
+        previous.join(moved_ids, on="roll_number", how="semi"),
+    ])
+
+    return {
+        "snapshot": False,
+        "added": added,
+        "removed": removed,
+        "changed": changed,
+        "skipped": skipped,
+        "duplicates": duplicates,
+    }
+
+
+def delta_size(delta: dict) -> int:
+    """Returns the number of roll changes carried by a stock delta."""
+    return delta["added"].height + delta["removed"].height + delta["changed"].height
+
+
+def apply_stock_delta(roll_specs: dict, delta: dict) -> int:
+    """
+    Applies a stock delta to the nested ROLL_SPECS dict in place.
+    ROLL_SPECS is keyed as {width: {material: {roll_number: {'id', 'length'}}}}.
+    A snapshot delta replaces the whole inventory.
+
+    Returns:
+        int: The number of rolls added, removed or updated.
+    """
+    if delta["snapshot"]:
+        roll_specs.clear()
+
+    removed = delta["removed"]
+    for width, material, roll_number in zip(
+        removed.get_column("roll_size").cast(pl.Utf8).str.strip_chars(),
+        removed.get_column("roll_type").cast(pl.Utf8).str.strip_chars(),
+        removed.get_column("roll_number"),
+    ):
+        material_rolls = roll_specs.get(width, {}).get(material)
+        if material_rolls is None:
+            continue
+        material_rolls.pop(roll_number, None)
+        # ลบกลุ่มที่ว่างออกเพื่อให้การตรวจสอบวัสดุที่มีในสต็อกยังถูกต้อง
+        if not material_rolls:
+            del roll_specs[width][material]
+            if not roll_specs[width]:
+                del roll_specs[width]
+
+    for frame in (delta["added"], delta["changed"]):
+        for width, material, roll_number, length in zip(
+            frame.get_column("roll_size").cast(pl.Utf8).str.strip_chars(),
+            frame.get_column("roll_type").cast(pl.Utf8).str.strip_chars(),
+            frame.get_column("roll_number"),
+            frame.get_column("length"),
+        ):
+            roll = roll_specs.setdefault(width, {}).setdefault(material, {}).setdefault(roll_number, {'id': roll_number})
+            roll['length'] = length
+
+    return delta_size(delta)
+
+
+def build_roll_specs(stock_df: Optional[pl.DataFrame]) -> dict:
+    """Builds a fresh ROLL_SPECS dict from a cleaned stock DataFrame."""
+    roll_specs = {}
+    apply_stock_delta(roll_specs, diff_stock(None, stock_df))
+    return roll_specs
+
+
+def roll_specs_frame(roll_specs: dict) -> pl.DataFrame:
+    """Flattens ROLL_SPECS back into a cleaned stock DataFrame; build_roll_specs() reverses it."""
+    rows = [
+        (roll_number, width, material, roll['length'])
+        for width, materials in roll_specs.items()
+        for material, rolls in materials.items()
+        for roll_number, roll in rolls.items()
+    ]
+    # ความยาวที่ถูกตัดไปแล้วอาจเป็นทศนิยม
+    length_type = pl.Int64 if all(isinstance(row[3], int) for row in rows) else pl.Float64
+    return pl.DataFrame(
+        rows,
+        schema={"roll_number": pl.Utf8, "roll_size": pl.Utf8, "roll_type": pl.Utf8, "length": length_type},
+        orient="row",
+    )
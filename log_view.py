@@ -0,0 +1,125 @@
+import collections
+from typing import List, Optional, Tuple
+
+from PyQt5.QtCore import QTimer
+from PyQt5.QtWidgets import QComboBox, QHBoxLayout, QLabel, QPlainTextEdit, QVBoxLayout, QWidget
+
+LOG_LEVELS = ("debug", "info", "warning", "error")
+LEVEL_LABELS = {"debug": "ทั้งหมด", "info": "ข้อมูล", "warning": "คำเตือน", "error": "ข้อผิดพลาด"}
+LOG_CAPACITY = 5000  # จำนวนบรรทัดล่าสุดที่เก็บไว้ บรรทัดเก่ากว่านั้นถูกทิ้ง
+FLUSH_INTERVAL_MS = 200  # เขียนบรรทัดที่ค้างลงหน้าจอทีละชุด ไม่เกิน 5 ครั้งต่อวินาที
+
+
+def classify_level(message: str) -> str:
+    """
+    Guesses the level of a log line from its wording: errors and warnings by their
+    markers, the indented per-iteration detail of main_algorithm as debug.
+    """
+    if "❌" in message or "Error" in message or "ผิดพลาด" in message:
+        return "error"
+    if "⚠️" in message or "Warning" in message:
+        return "warning"
+    if message.startswith("  "):
+        return "debug"
+    return "info"
+
+
+class LogBuffer:
+    """
+    Ring buffer of (level, message) lines. Lines not yet shown are kept as pending
+    until take_pending(); both are bounded by `capacity`, so memory stays flat.
+    """
+
+    def __init__(self, capacity: int = LOG_CAPACITY):
+        self.lines = collections.deque(maxlen=capacity)
+        self._pending = collections.deque(maxlen=capacity)
+
+    def append(self, message: str, level: Optional[str] = None) -> None:
+        line = (level or classify_level(message), message)
+        self.lines.append(line)
+        self._pending.append(line)
+
+    def take_pending(self) -> List[Tuple[str, str]]:
+        pending = list(self._pending)
+        self._pending.clear()
+        return pending
+
+    def clear(self) -> None:
+        self.lines.clear()
+        self._pending.clear()
+
+    @staticmethod
+    def filter(lines, min_level: str) -> List[str]:
+        threshold = LOG_LEVELS.index(min_level)
+        return [message for level, message in lines if LOG_LEVELS.index(level) >= threshold]
+
+
+class LogPanel(QWidget):
+    """
+    Log display for the main window: log() only records the line; a timer writes the
+    lines received since the last flush to the widget in one go. The widget keeps at
+    most `capacity` lines and can be filtered by level.
+    """
+
+    def __init__(self, capacity: int = LOG_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.buffer = LogBuffer(capacity)
+        self.min_level = "debug"
+        self._stale = False  # มีบรรทัดใหม่ขณะซ่อนอยู่ ต้องวาดใหม่เมื่อแสดง
+
+        self.level_combo = QComboBox()
+        for level in LOG_LEVELS:
+            self.level_combo.addItem(LEVEL_LABELS[level], level)
+        self.level_combo.currentIndexChanged.connect(lambda _: self.set_min_level(self.level_combo.currentData()))
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setMaximumBlockCount(capacity)
+
+        level_layout = QHBoxLayout()
+        level_layout.addWidget(QLabel("ระดับ log:"))
+        level_layout.addWidget(self.level_combo)
+        level_layout.addStretch()
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(level_layout)
+        layout.addWidget(self.text)
+
+        self._timer = QTimer(self)
+        self._timer.setInterval(FLUSH_INTERVAL_MS)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def log(self, message: str, level: Optional[str] = None) -> None:
+        self.buffer.append(message, level)
+
+    def flush(self) -> None:
+        pending = self.buffer.take_pending()
+        if not pending:
+            return
+        if not self.isVisible():
+            self._stale = True
+            return
+        lines = LogBuffer.filter(pending, self.min_level)
+        if lines:
+            self.text.appendPlainText("\n".join(lines))
+            self.text.verticalScrollBar().setValue(self.text.verticalScrollBar().maximum())
+
+    def set_min_level(self, level: str) -> None:
+        self.min_level = level
+        self._redraw()
+
+    def clear(self) -> None:
+        self.buffer.clear()
+        self.text.clear()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self._stale:
+            self._redraw()
+
+    def _redraw(self) -> None:
+        self.buffer.take_pending()
+        self._stale = False
+        self.text.setPlainText("\n".join(LogBuffer.filter(self.buffer.lines, self.min_level)))
+        self.text.verticalScrollBar().setValue(self.text.verticalScrollBar().maximum())
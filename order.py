@@ -1,82 +1,84 @@
 import os
-import time
 
 import polars as pl
-from PyQt5.QtCore import QMutex, QMutexLocker, QObject, pyqtSignal
+from PyQt5.QtCore import QCoreApplication, QObject, Qt, pyqtSignal
 
 # สมมติว่า cleaning.py อยู่ในไดเรกทอรีเดียวกันและมีฟังก์ชันเหล่านี้
-from cleaning import clean_data, load_data
+from cleaning import load_orders, write_quarantine
+from file_watcher import FileWatcher
+
+# แถวออเดอร์ที่ข้อมูลไม่ถูกต้องจะถูกบันทึกไว้ที่นี่ พร้อมเหตุผลของแต่ละแถว
+QUARANTINE_PATH = os.path.join("cache", "order_quarantine.csv")
 
 
 class OrderManager(QObject):
     """
-    จัดการการโหลดและรีเฟรชข้อมูลออเดอร์เป็นระยะในเธรดแยก
+    จัดการการโหลดและรีเฟรชข้อมูลออเดอร์ในเธรดแยก
+    โหลดใหม่เมื่อระบบไฟล์แจ้งว่าไฟล์เปลี่ยนและเนื้อหาเปลี่ยนจริงเท่านั้น
     ส่งสัญญาณเพื่อสื่อสารกับเธรด UI หลัก
     """
     order_updated = pyqtSignal(object)  # ใช้ object สำหรับ DataFrame
     error_signal = pyqtSignal(str)
     file_not_found_signal = pyqtSignal(str)
+    rows_quarantined = pyqtSignal(int, str)  # จำนวนแถวที่ถูกแยกออก, ไฟล์ quarantine
+    _file_path_changed = pyqtSignal(object)
 
     def __init__(self, file_path, parent=None):
         super().__init__(parent)
         self._file_path = file_path
         self._is_running = False
-        self._mutex = QMutex()
-        self._file_exists = True  # สมมติว่าไฟล์มีอยู่ตอนเริ่มต้น
+        self._watcher = None
 
     def set_file_path(self, file_path):
         """เมธอดที่ปลอดภัยต่อเธรดเพื่ออัปเดตเส้นทางไฟล์"""
-        with QMutexLocker(self._mutex):
-            self._file_path = file_path
-            # รีเซ็ตสถานะเพื่อบังคับให้ตรวจสอบใหม่
-            self._file_exists = True
+        self._file_path = file_path
+        # ส่งผ่านสัญญาณเพื่อให้ watcher ถูกเรียกในเธรดของตัวเอง
+        self._file_path_changed.emit(file_path)
 
     def run(self):
         """
-        ลูปหลักสำหรับเธรดจัดการออเดอร์
-        ตรวจสอบไฟล์ออเดอร์ ประมวลผล แล้วรอ 60 วินาที
+        เริ่มเฝ้าดูไฟล์ออเดอร์ในเธรดนี้
+        การโหลดทั้งหมดเกิดขึ้นผ่าน event loop ของเธรดเมื่อไฟล์เปลี่ยน
         """
         self._is_running = True
-        while self._is_running:
-            try:
-                with QMutexLocker(self._mutex):
-                    current_path = self._file_path
-
-                if not os.path.exists(current_path):
-                    # ส่งสัญญาณเฉพาะเมื่อตรวจพบว่าไฟล์หายไปครั้งแรก
-                    if self._file_exists:
-                        self.file_not_found_signal.emit(current_path)
-                        self._file_exists = False
-                    # รอก่อนที่จะพยายามอีกครั้งเพื่อหลีกเลี่ยง busy-waiting
-                    time.sleep(5)
-                    continue
-
-                # หากพบไฟล์ ให้รีเซ็ตแฟล็ก
-                self._file_exists = True
-
-                # โหลดและทำความสะอาดข้อมูล
-                raw_order_df = load_data(current_path)
-                if raw_order_df is not None and not raw_order_df.is_empty():
-                    cleaned_order_df = clean_data(raw_order_df, suggestion_mode=True)
-                    self.order_updated.emit(cleaned_order_df)
-                else:
-                    # หากไฟล์ว่างหรือโหลดไม่สำเร็จ ให้ส่ง DataFrame ที่ว่างเปล่า
-                    self.order_updated.emit(pl.DataFrame())
+        self._watcher = FileWatcher(self._file_path, parent=self)
+        self._watcher.file_changed.connect(self._reload)
+        self._watcher.file_missing.connect(self.file_not_found_signal)
+        self._file_path_changed.connect(self._watcher.set_file_path)
+        # หยุด timer ของ watcher ภายในเธรดของตัวเองก่อนที่เธรดจะจบ
+        self.thread().finished.connect(self._watcher.stop, Qt.DirectConnection)
+        self._watcher.start()
 
-            except Exception as e:
-                self.error_signal.emit(
-                    f"เกิดข้อผิดพลาดในการประมวลผลไฟล์ออเดอร์ '{self._file_path}':\n{e}"
-                )
-                # หลีกเลี่ยงข้อความแสดงข้อผิดพลาดที่รวดเร็วสำหรับปัญหาเดียวกัน
-                time.sleep(10)
+    def _reload(self, current_path):
+        """โหลดและทำความสะอาดข้อมูลเมื่อเนื้อหาไฟล์เปลี่ยน"""
+        if not self._is_running:
+            return
+        try:
+            # current_path อาจเป็น glob หรือรายการไฟล์ (เช่นไฟล์รายเดือนของแต่ละโรงงาน)
+            cleaned_order_df = load_orders(current_path, on_quarantine=self._quarantine)
+            if cleaned_order_df is not None and not cleaned_order_df.is_empty():
+                self.order_updated.emit(cleaned_order_df)
+            else:
+                # หากไฟล์ว่างหรือโหลดไม่สำเร็จ ให้ส่ง DataFrame ที่ว่างเปล่า
+                self.order_updated.emit(pl.DataFrame())
+        except Exception as e:
+            # เนื้อหาเดิมจะไม่ถูกประมวลผลซ้ำจนกว่าไฟล์จะเปลี่ยน
+            self.error_signal.emit(
+                f"เกิดข้อผิดพลาดในการประมวลผลไฟล์ออเดอร์ '{current_path}':\n{e}"
+            )
 
-            # รอ 60 วินาทีก่อนรอบถัดไป
-            # ลูปนี้ช่วยให้ออกจากโปรแกรมได้เร็วขึ้นหากเรียกใช้ stop()
-            for _ in range(60):
-                if not self._is_running:
-                    break
-                time.sleep(1)
+    def _quarantine(self, rejected):
+        """บันทึกแถวที่ไม่ผ่านการตรวจสอบลงไฟล์ แล้วแจ้ง UI โดยไม่หยุดการโหลดแถวที่ถูกต้อง"""
+        try:
+            write_quarantine(rejected, QUARANTINE_PATH)
+        except OSError as e:
+            self.error_signal.emit(f"ไม่สามารถบันทึกไฟล์ quarantine '{QUARANTINE_PATH}':\n{e}")
+        self.rows_quarantined.emit(rejected.height, QUARANTINE_PATH)
 
     def stop(self):
-        """หยุดการทำงานของลูป"""
+        """หยุดการเฝ้าดูไฟล์และออกจาก event loop ของเธรด"""
         self._is_running = False
+        thread = self.thread()
+        app = QCoreApplication.instance()
+        if thread is not None and (app is None or thread is not app.thread()):
+            thread.quit()
@@ -0,0 +1,114 @@
+import os
+import queue
+import re
+import threading
+import time
+import uuid
+from typing import List
+
+import polars as pl
+
+import exporter
+
+RESULT_QUEUE_SIZE = 64  # จำนวนชุดผลลัพธ์ที่รอเขียนได้สูงสุด ก่อน submit() ต้องรอ
+RESULT_RUN_HISTORY = 50  # จำนวนรอบการคำนวณล่าสุดที่เก็บไฟล์ผลลัพธ์ไว้ในแต่ละโฟลเดอร์
+
+# ชื่อไฟล์ที่ลงท้ายด้วย run id ของ new_run_id() เช่น roll_cut_results_75_20250801-101500-4242-a1b2c3.csv
+RUN_FILE_PATTERN = re.compile(r"_(\d{8}-\d{6}-\d+-[0-9a-f]{6})\.(csv|parquet|xlsx)$")
+
+
+def new_run_id() -> str:
+    """A file name tag unique to one run: start time, process id and a random suffix."""
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def prune_run_files(directory: str, keep: int = RESULT_RUN_HISTORY) -> List[str]:
+    """
+    Deletes the result files of all but the `keep` most recent runs in `directory`, so
+    per-run files do not pile up. Only names ending in a run id (see new_run_id) are
+    touched. Returns the removed paths.
+    """
+    if not os.path.isdir(directory):
+        return []
+    runs = {}
+    for name in os.listdir(directory):
+        match = RUN_FILE_PATTERN.search(name)
+        if match:
+            runs.setdefault(match.group(1), []).append(os.path.join(directory, name))
+    removed = []
+    # run id ขึ้นต้นด้วยเวลาเริ่ม จึงเรียงตามเวลาได้ด้วยการเรียงข้อความ
+    for run_id in sorted(runs)[:max(0, len(runs) - keep)]:
+        for path in runs[run_id]:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError:
+                pass  # ถูกลบไปแล้ว หรือยังเปิดใช้อยู่
+    return removed
+
+
+class ResultWriter:
+    """
+    Writes batches of result rows to files on a background thread, so the planning
+    loop does not wait for the disk.
+
+    submit() queues a batch and returns at once unless `max_pending` batches are already
+    waiting, in which case it blocks until the thread catches up. Each file is written
+    by exporter.write_frame in `fmt` (csv, parquet or xlsx) under a temporary name and
+    renamed into place.
+
+    flush() waits until every queued batch is written and raises the first write error
+    since the last flush; close() also stops the thread. Use it as a context manager
+    to close it on exit.
+    """
+
+    def __init__(self, fmt: str = "csv", max_pending: int = RESULT_QUEUE_SIZE):
+        self.fmt = exporter.export_format("", fmt)
+        self.written: List[str] = []
+        self._errors = []
+        self._closed = False
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, path: str, rows: List[dict]) -> str:
+        """Queues rows to be written to `path` plus the format's extension. Returns the full path."""
+        if self._closed:
+            raise RuntimeError("ResultWriter is closed")
+        path = f"{path}.{self.fmt}"
+        self._queue.put((path, rows))
+        return path
+
+    def flush(self) -> None:
+        self._queue.join()
+        if self._errors:
+            errors, self._errors = self._errors, []
+            raise errors[0]
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                path, rows = item
+                exporter.write_frame(pl.DataFrame(rows), path, self.fmt)
+                self.written.append(path)
+            except Exception as e:
+                print(f"❌ Error writing results to {item[0]}: {e}")
+                self._errors.append(e)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,177 @@
+import bisect
+from typing import Callable, Dict, List, Optional
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, pyqtSignal
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QAbstractItemView, QTableView
+
+from results_store import UNPLANNED_ROLL, ResultsStore
+
+ROLL_INFO_KEYS = ['front_roll_info', 'c_roll_info', 'middle_roll_info', 'b_roll_info', 'back_roll_info']
+INVALID_COLOR = QColor(255, 224, 224)  # แดง: ไม่มีม้วนที่เหมาะสม หรือประมวลผลไม่สำเร็จ
+DUPLICATE_COLOR = QColor(255, 255, 224)  # เหลือง: ออเดอร์นี้มีผลลัพธ์อื่นที่เศษน้อยกว่า
+ROW_CACHE_SIZE = 1000  # จำนวนแถวที่เก็บเป็น dict ไว้สำหรับวาดตาราง
+
+
+def demand_per_cut_text(result: dict) -> str:
+    cuts = result.get('cuts')
+    order_qty = result.get('order_qty')
+    if cuts is not None and cuts > 0 and order_qty is not None:
+        return f"{order_qty / cuts:.2f}"
+    return "N/A"
+
+
+# หัวตาราง -> ฟังก์ชันแปลงผลลัพธ์หนึ่งแถวเป็นข้อความในคอลัมน์
+RESULT_COLUMNS: Dict[str, Callable[[dict], str]] = {
+    "ความกว้างม้วน": lambda r: str(r.get('roll_w', '')),
+    "หมายเลขออเดอร์": lambda r: str(r.get('order_number', '')),
+    "ความกว้างออเดอร์": lambda r: f"{r.get('order_w', ''):.4f}",
+    "จำนวนออก": lambda r: str(r.get('cuts', '')),
+    "เศษเหลือ": lambda r: f"{r.get('trim', ''):.2f}",
+    "ความยาวออเดอร์": lambda r: f"{r.get('order_l', ''):.4f}",
+    "จำนวนสั่งส่ง": lambda r: f"{r.get('order_dmd', '')}",
+    "ผลิตได้": lambda r: str(r.get('die_cut', '')),
+    "จำนวนสั่งผลิต": lambda r: f"{r.get('order_qty', '')}",
+    "ปริมาณตัด": demand_per_cut_text,
+}
+
+
+class ResultsTableModel(QAbstractTableModel):
+    """
+    Model of the cutting results table over a ResultsStore. Cell text and colours are
+    computed only when the view asks for them, i.e. for the rows on screen.
+
+    The store keeps the best (lowest trim) result of each order as rows arrive, so
+    append() costs O(len(results appended)) however many rows the table already holds.
+    Other results of the same order are highlighted as duplicates.
+    """
+
+    def __init__(self, headers: List[str], parent=None):
+        super().__init__(parent)
+        self.headers = list(headers)
+        self._formatters = [RESULT_COLUMNS[header] for header in self.headers]
+        self.store = ResultsStore()
+        self._visible: Optional[List[int]] = None  # None = แสดงทุกแถว, มิฉะนั้นตำแหน่งใน store ที่แสดง
+        self._row_cache = {}  # ตำแหน่ง -> dict ของแถวที่ view ขอล่าสุด
+        self.show_unprocessed = True
+
+    # --- QAbstractTableModel ---
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.store) if self._visible is None else len(self._visible)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(self.headers):
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.BackgroundRole):
+            return None
+        position = self._position(index.row())
+        result = self._row(position)
+        if role == Qt.DisplayRole:
+            return self._formatters[index.column()](result)
+        if result.get('roll_w') == UNPLANNED_ROLL or any("ไม่มี" in (result.get(key) or '') for key in ROLL_INFO_KEYS):
+            return INVALID_COLOR
+        if not self.store.is_best(position):
+            return DUPLICATE_COLOR
+        return None
+
+    # --- ข้อมูล ---
+
+    def row_at(self, row: int) -> dict:
+        """Returns the result dict shown at view row `row`."""
+        return self._row(self._position(row))
+
+    def append(self, results: List[dict]) -> None:
+        """Adds results at the end; rows no longer best of their order are repainted."""
+        if not results:
+            return
+        new_rows = sum(1 for result in results if self.show_unprocessed or result.get('roll_w') != UNPLANNED_ROLL)
+        first_row = self.rowCount()
+        if new_rows:
+            self.beginInsertRows(QModelIndex(), first_row, first_row + new_rows - 1)
+        start = len(self.store)
+        demoted = self.store.append(results)
+        self._row_cache.clear()  # คอลัมน์เดิมอาจถูกขยายชนิดข้อมูลเมื่อรวมชุดใหม่
+        if self._visible is not None:
+            self._visible.extend(
+                start + i for i, result in enumerate(results) if result.get('roll_w') != UNPLANNED_ROLL
+            )
+        if new_rows:
+            self.endInsertRows()
+
+        demoted_rows = [row for row in (self._row_of(p) for p in demoted) if row is not None]
+        if demoted_rows:
+            self.dataChanged.emit(self.index(min(demoted_rows), 0),
+                                  self.index(max(demoted_rows), len(self.headers) - 1), [Qt.BackgroundRole])
+
+    def set_show_unprocessed(self, show: bool) -> None:
+        self.beginResetModel()
+        self.show_unprocessed = show
+        self._rebuild_visible()
+        self.endResetModel()
+
+    def sort_by(self, column: str = "roll_w") -> None:
+        """Sorts the results by a result column (see ResultsStore.sort)."""
+        self.beginResetModel()
+        self.store.sort(column)
+        self._rebuild_visible()
+        self.endResetModel()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self.store.clear()
+        self._rebuild_visible()
+        self.endResetModel()
+
+    # --- ดัชนีภายใน ---
+
+    def _row(self, position: int) -> dict:
+        row = self._row_cache.get(position)
+        if row is None:
+            if len(self._row_cache) >= ROW_CACHE_SIZE:
+                self._row_cache.clear()
+            row = self._row_cache[position] = self.store.row(position)
+        return row
+
+    def _position(self, row: int) -> int:
+        return row if self._visible is None else self._visible[row]
+
+    def _row_of(self, position: int) -> Optional[int]:
+        if self._visible is None:
+            return position
+        row = bisect.bisect_left(self._visible, position)
+        return row if row < len(self._visible) and self._visible[row] == position else None
+
+    def _rebuild_visible(self) -> None:
+        self._row_cache.clear()
+        self._visible = None if self.show_unprocessed else self.store.positions(planned_only=True)
+
+
+class ResultsTableView(QTableView):
+    """Read-only, single-row-selection view of a ResultsTableModel that signals when Enter is pressed."""
+    enterPressed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Return, Qt.Key_Enter):
+            if self.selectionModel() is not None and self.selectionModel().hasSelection():
+                self.enterPressed.emit()
+                return
+        super().keyPressEvent(event)
+
+    def selected_row(self) -> Optional[int]:
+        indexes = self.selectedIndexes()
+        return indexes[0].row() if indexes else None
@@ -0,0 +1,165 @@
+from typing import Iterable, Iterator, List, Optional
+
+import polars as pl
+
+UNPLANNED_ROLL = "Failed/Infeasible"
+POSITION = "_position"  # ลำดับของแถวใน store (ใช้อ้างอิงแถวจาก view และดัชนี)
+UNPLANNED = "_unplanned"  # True สำหรับออเดอร์ที่ประมวลผลไม่สำเร็จ (roll_w เก็บเป็น null)
+INTERNAL_COLUMNS = (POSITION, UNPLANNED)
+
+
+def _trim_expr() -> pl.Expr:
+    return pl.col("trim").cast(pl.Float64, strict=False).fill_null(float("inf")).alias("trim")
+
+
+class ResultsStore:
+    """
+    Cutting results (the row dicts of main_algorithm) held as one Polars frame instead
+    of a list of dicts.
+
+    roll_w is stored as a number: 'Failed/Infeasible' rows keep a null roll_w and are
+    flagged in the _unplanned column, and row()/rows() give them back as they came in.
+    Columns missing from a batch are null; row() leaves them out.
+
+    The best (lowest trim, earliest on ties) row of each order_number is kept in an
+    index updated per appended batch, so looking it up never scans the whole store.
+    """
+
+    def __init__(self, rows: Optional[Iterable[dict]] = None):
+        self.frame = pl.DataFrame()
+        self._best = {}  # order_number -> (trim, _position) ของแถวที่ดีที่สุด
+        self.best_positions = set()
+        if rows:
+            self.append(list(rows))
+
+    def __len__(self) -> int:
+        return self.frame.height
+
+    # --- เพิ่มและเรียง ---
+
+    @staticmethod
+    def to_frame(rows: List[dict]) -> pl.DataFrame:
+        """Converts result dicts to the store's columns (without _position)."""
+        unplanned = [row.get('roll_w') == UNPLANNED_ROLL for row in rows]
+        frame = pl.DataFrame(
+            [{**row, 'roll_w': None} if flag else row for row, flag in zip(rows, unplanned)],
+            infer_schema_length=None,
+        )
+        return frame.with_columns(pl.Series(UNPLANNED, unplanned, dtype=pl.Boolean))
+
+    def append(self, rows: List[dict]) -> List[int]:
+        """
+        Appends a batch of result dicts and updates the best-per-order index.
+
+        Returns:
+            List[int]: positions of earlier rows that are no longer the best of their order.
+        """
+        if not rows:
+            return []
+        batch = self.to_frame(rows).with_row_index(POSITION, offset=len(self))
+        self.frame = batch if self.frame.is_empty() else pl.concat([self.frame, batch], how="diagonal_relaxed")
+        return self._index(batch)
+
+    def sort(self, by: str = "roll_w") -> None:
+        """Sorts the rows by a column (nulls, e.g. the roll_w of unplanned orders, last) and renumbers them."""
+        self.frame = (
+            self.frame.sort(by, nulls_last=True, maintain_order=True)
+            .drop(POSITION)
+            .with_row_index(POSITION)
+        )
+        self._best = {}
+        self.best_positions = set()
+        self._index(self.frame)
+
+    def clear(self) -> None:
+        self.frame = pl.DataFrame()
+        self._best = {}
+        self.best_positions = set()
+
+    # --- ดัชนีออเดอร์ ---
+
+    def _index(self, batch: pl.DataFrame) -> List[int]:
+        """Updates the best row of the batch's orders only, so the cost follows the batch size."""
+        if "order_number" not in batch.columns:
+            return []
+        candidates = (
+            batch.select("order_number", _trim_expr(), POSITION)
+            .filter(pl.col("order_number").is_not_null() & (pl.col("trim") < float("inf")))
+            .sort(["trim", POSITION])
+            .unique("order_number", keep="first")
+        )
+        demoted = []
+        for order_number, trim, position in candidates.iter_rows():
+            current = self._best.get(order_number)
+            # เศษเท่ากันให้แถวที่มาก่อนชนะ (ตำแหน่งใน batch มากกว่าแถวเดิมเสมอ)
+            if current is not None and current <= (trim, position):
+                continue
+            if current is not None:
+                demoted.append(current[1])
+                self.best_positions.discard(current[1])
+            self._best[order_number] = (trim, position)
+            self.best_positions.add(position)
+        return sorted(demoted)
+
+    def is_best(self, position: int) -> bool:
+        return position in self.best_positions
+
+    # --- การอ่าน ---
+
+    def positions(self, planned_only: bool = False, roll_w=None) -> List[int]:
+        """Positions of the rows kept by the filters, in store order."""
+        if self.frame.is_empty():
+            return []
+        predicate = pl.lit(True)
+        if planned_only:
+            predicate &= ~pl.col(UNPLANNED)
+        if roll_w is not None:
+            predicate &= pl.col("roll_w") == roll_w
+        return self.frame.filter(predicate)[POSITION].to_list()
+
+    def row(self, position: int) -> dict:
+        return self._restore(self.frame.row(position, named=True))
+
+    def rows(self, frame: Optional[pl.DataFrame] = None) -> Iterator[dict]:
+        for row in (self.frame if frame is None else frame).iter_rows(named=True):
+            yield self._restore(row)
+
+    @staticmethod
+    def _restore(row: dict) -> dict:
+        unplanned = row.get(UNPLANNED)
+        restored = {key: value for key, value in row.items() if value is not None and key not in INTERNAL_COLUMNS}
+        if unplanned:
+            restored['roll_w'] = UNPLANNED_ROLL
+        return restored
+
+    def best_plan(self) -> pl.DataFrame:
+        """
+        One row per order: the cut with the lowest trim, or the first 'Failed/Infeasible'
+        row of an order no suggestion could cut. Cuts are sorted by roll width and trim,
+        unplanned orders come last in the order they arrived.
+        """
+        if self.frame.is_empty() or "order_number" not in self.frame.columns:
+            return self.frame
+        rows = self.frame.filter(pl.col("order_number").is_not_null()).with_columns(_trim_expr().alias("_trim"))
+        cuts = (
+            rows.filter(~pl.col(UNPLANNED))
+            .sort(["_trim", POSITION])
+            .unique("order_number", keep="first")
+            .sort([pl.col("roll_w").fill_null(0), "_trim", POSITION])
+        )
+        unplanned = (
+            rows.filter(pl.col(UNPLANNED))
+            .join(cuts.select("order_number"), on="order_number", how="anti")
+            .unique("order_number", keep="first", maintain_order=True)
+        )
+        return pl.concat([cuts, unplanned]).drop("_trim")
+
+    @staticmethod
+    def export_frame(frame: pl.DataFrame) -> pl.DataFrame:
+        """A frame of the store as plain result columns: roll_w as text with 'Failed/Infeasible' restored."""
+        if frame.is_empty() or UNPLANNED not in frame.columns:
+            return frame.drop([c for c in INTERNAL_COLUMNS if c in frame.columns])
+        return frame.with_columns(
+            pl.when(pl.col(UNPLANNED)).then(pl.lit(UNPLANNED_ROLL))
+            .otherwise(pl.col("roll_w").cast(pl.String)).alias("roll_w")
+        ).drop(list(INTERNAL_COLUMNS))
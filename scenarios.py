@@ -0,0 +1,136 @@
+import copy
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import polars as pl
+
+import core
+import scheduler
+from shared_data import SharedFrames, attach, attach_roll_specs
+
+SCENARIO_DIR = os.path.join("cache", "scenarios")
+FAILED_ROLL = "Failed/Infeasible"
+
+
+def scenario_grid(**axes) -> List[dict]:
+    """
+    Builds every combination of the given planning parameters, e.g.
+    scenario_grid(max_trim=[4, 5, 6], max_cuts=[5, 6]) gives 6 scenarios.
+    Keys are those of core.DEFAULT_PLANNING_PARAMS.
+    """
+    unknown = [key for key in axes if key not in core.DEFAULT_PLANNING_PARAMS]
+    if unknown:
+        raise ValueError(f"Unknown planning parameters: {unknown}")
+    keys = list(axes)
+    return [dict(zip(keys, values)) for values in itertools.product(*(axes[key] for key in keys))]
+
+
+def scenario_name(overrides: dict) -> str:
+    if not overrides:
+        return "default"
+    return ", ".join(f"{key}={value}" for key, value in overrides.items())
+
+
+def summarize_results(results: List[dict], initial_lengths: dict, roll_specs: dict) -> dict:
+    """Compares a plan: trim, rolls opened and planned/unplanned orders."""
+    cuts = [r for r in results if r.get("roll_w") != FAILED_ROLL]
+    planned = {r.get("order_number") for r in cuts}
+    unplanned = {r.get("order_number") for r in results if r.get("roll_w") == FAILED_ROLL} - planned
+    remaining = scheduler.roll_lengths(roll_specs)
+    total_trim = sum(r.get("trim") or 0 for r in cuts)
+    return {
+        "planned_orders": len(planned),
+        "unplanned_orders": len(unplanned),
+        "cuts": len(cuts),
+        "total_trim": round(total_trim, 4),
+        "avg_trim": round(total_trim / len(cuts), 4) if cuts else None,
+        "rolls_opened": sum(1 for key, length in initial_lengths.items() if remaining.get(key, length) != length),
+    }
+
+
+def run_scenario(
+    overrides: dict,
+    suggestions: List[dict],
+    orders_df: pl.DataFrame,
+    roll_specs: dict,
+    output_dir: str = SCENARIO_DIR,
+) -> dict:
+    """
+    Plans every suggestion in order, as the UI does, under one set of planning parameters.
+    roll_specs is consumed in place, so pass a private copy.
+
+    This is a top-level function so it can run in a worker process.
+
+    Returns:
+        dict: scenario name, the resolved parameters, summarize_results() and 'seconds'.
+    """
+    started = time.perf_counter()
+    initial_lengths = scheduler.roll_lengths(roll_specs)
+    output = scheduler.run_suggestion_group(
+        suggestions, orders_df, roll_specs, output_dir=output_dir, planning_params=overrides
+    )
+    results = [result for _, suggestion_results in output["results"] for result in suggestion_results]
+
+    params = core.resolve_planning_params(overrides)
+    row = {"scenario": scenario_name(overrides)}
+    row.update({key: value for key, value in params.items() if key != "corrugate_multipliers"})
+    row["corrugate_multipliers"] = " ".join(f"{k}={v}" for k, v in params["corrugate_multipliers"].items())
+    row.update(summarize_results(results, initial_lengths, roll_specs))
+    row["seconds"] = round(time.perf_counter() - started, 3)
+    return row
+
+
+def _run_published_scenario(overrides: dict, suggestions: List[dict], handle: Dict[str, str], output_dir: str) -> dict:
+    """run_scenario for a worker process, with its own ROLL_SPECS built from the published stock."""
+    return run_scenario(overrides, suggestions, attach(handle, "orders"), attach_roll_specs(handle, "stock"), output_dir)
+
+
+def run_scenarios(
+    scenarios: List[dict],
+    orders_df: pl.DataFrame,
+    roll_specs: dict,
+    suggestions: Optional[List[dict]] = None,
+    max_workers: Optional[int] = None,
+) -> pl.DataFrame:
+    """
+    Runs the same orders and stock under each scenario (planning parameter overrides,
+    see scenario_grid) in parallel, one worker process per scenario.
+
+    Args:
+        scenarios (List[dict]): Planning parameter overrides; {} is the current rules.
+        orders_df (pl.DataFrame): Cleaned orders (suggestion mode).
+        roll_specs (dict): ROLL_SPECS; not modified, each scenario plans against its own copy.
+        suggestions (Optional[List[dict]]): Suggestions to plan; defaults to every suggestion
+            the stock can run (see scheduler.runnable_suggestions).
+        max_workers (Optional[int]): Process pool size; defaults to the CPU count.
+
+    Returns:
+        pl.DataFrame: One row per scenario, in the given order, with the parameters used,
+        planned_orders, unplanned_orders, cuts, total_trim, avg_trim, rolls_opened and seconds.
+    """
+    if suggestions is None:
+        suggestions = scheduler.runnable_suggestions(orders_df, roll_specs)
+    output_dirs = [os.path.join(SCENARIO_DIR, f"scenario_{i}") for i in range(len(scenarios))]
+    rows = [None] * len(scenarios)
+
+    workers = min(len(scenarios), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for i, overrides in enumerate(scenarios):
+            rows[i] = run_scenario(overrides, suggestions, orders_df, copy.deepcopy(roll_specs), output_dirs[i])
+    else:
+        with SharedFrames() as shared, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            shared.publish("orders", orders_df)
+            handle = shared.publish_roll_specs(roll_specs, "stock")
+            futures = {
+                executor.submit(_run_published_scenario, overrides, suggestions, handle, output_dirs[i]): i
+                for i, overrides in enumerate(scenarios)
+            }
+            for future in as_completed(futures):
+                rows[futures[future]] = future.result()
+
+    return pl.DataFrame(rows)
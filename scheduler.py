@@ -0,0 +1,680 @@
+import asyncio
+import collections
+import functools
+import json
+import multiprocessing
+import os
+import re
+import time
+from math import floor
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional
+
+import polars as pl
+
+import cleaning
+import core
+import inventory
+from cancellation import CancellationToken, linked_token, shared_cancel_event
+from claims import OrderClaims
+from result_writer import ResultWriter, prune_run_files
+from results_store import ResultsStore
+from shared_data import SharedFrames, attach, attach_roll_specs
+
+TIMINGS_PATH = os.path.join("cache", "suggestion_timings.json")
+# จำนวนประวัติเวลาที่เก็บไว้ และจำนวนล่าสุดที่ใช้ปรับค่าประมาณ
+HISTORY_LIMIT = 500
+HISTORY_WINDOW = 50
+# ค่าประมาณเริ่มต้น (วินาที): ค่าคงที่ + ต่อออเดอร์ (หนึ่งรอบ CBC) + กำลังสอง (แต่ละรอบแก้โจทย์กับออเดอร์ที่เหลือ)
+DEFAULT_COST = (0.05, 0.03, 1e-5)
+
+
+def build_suggestions(orders_df: pl.DataFrame, roll_specs: dict) -> List[dict]:
+    """
+    Generates every calculation setting ({'width', 'spec'}) from the material specs in the orders,
+    most frequent spec first, for each roll width whose stock has all of the spec's materials.
+    """
+    existing_cols = [col for col in cleaning.MATERIAL_COLS if col in orders_df.columns]
+    if not existing_cols or orders_df.is_empty():
+        return []
+
+    # จัดกลุ่มบนรหัส dictionary ของคอลัมน์วัสดุ (Categorical) แล้วแปลงเป็นข้อความเฉพาะผลลัพธ์ที่จัดกลุ่มแล้ว
+    all_specs_df = (
+        orders_df.group_by(existing_cols)
+        .len(name="count")
+        .with_columns([pl.col(c).cast(pl.Utf8).fill_null("").str.strip_chars() for c in existing_cols])
+        .sort("count", descending=True)
+    )
+
+    suggestions = []
+    for spec_row in all_specs_df.iter_rows(named=True):
+        spec_materials = {m for k, m in spec_row.items() if k != 'count' and m}
+        if not spec_materials:
+            continue
+
+        available_widths = [
+            width for width, materials_in_stock in (roll_specs or {}).items()
+            if spec_materials.issubset(materials_in_stock.keys())
+        ]
+        for width in sorted(available_widths, key=lambda x: int(re.sub(r'\D', '', x) or 0)):
+            full_spec = {k: v for k, v in spec_row.items() if k != 'count'}
+            suggestions.append({'width': width, 'spec': full_spec})
+    return suggestions
+
+
+def suggestion_length(roll_specs: dict, width: str, spec: dict) -> int:
+    """
+    Effective roll length for a suggestion; 0 when a required material is not in stock for the width.
+    """
+    selected_materials = [spec.get(col, '') for col in cleaning.MATERIAL_COLS]
+    material_counts = collections.Counter(m for m in selected_materials if m)
+    if not material_counts or not width or width not in roll_specs:
+        return 0
+
+    effective_lengths = []
+    stock_data_for_width = roll_specs[width]
+    for material, usage_count in material_counts.items():
+        material_rolls = stock_data_for_width.get(material)
+        if not material_rolls:
+            # If any required material is not in stock for this width, this suggestion is invalid for calculation.
+            return 0
+        min_length = min(roll['length'] for roll in material_rolls.values())
+        effective_lengths.append(min_length * floor(len(material_rolls) / usage_count))
+
+    # ความยาวจริงคือ min(effective_lengths) แต่ปัจจุบันปล่อยให้ main_algorithm ตัดจนกว่าสต็อกจะหมด
+    return 1000000000 if effective_lengths else 0
+
+
+def runnable_suggestions(orders_df: pl.DataFrame, roll_specs: dict) -> List[dict]:
+    """build_suggestions() with their 'length', keeping only those the stock can run."""
+    suggestions = []
+    for suggestion in build_suggestions(orders_df, roll_specs):
+        length = suggestion_length(roll_specs, suggestion['width'], suggestion['spec'])
+        if length > 0:
+            suggestions.append({**suggestion, 'length': length})
+    return suggestions
+
+
+def best_trim_plan(results: List[dict]) -> List[dict]:
+    """
+    Consolidates the rows of several suggestions into one row per order: the cut with the
+    lowest trim, or one 'Failed/Infeasible' row for an order no suggestion could cut.
+    Cut rows are sorted by roll width and trim, unplanned orders come last.
+    (See ResultsStore.best_plan, which works on the stored frame.)
+    """
+    store = ResultsStore(results)
+    return list(store.rows(store.best_plan()))
+
+
+def suggestion_kwargs(suggestion: dict) -> dict:
+    """
+    Maps a suggestion ({'width', 'spec', 'length'}) to the material arguments of main_algorithm,
+    the same way the UI does for a single run.
+    """
+    spec = suggestion['spec']
+    c_material = spec.get('c') or None
+    b_material = spec.get('b') or None
+    return {
+        "front": spec.get('front') or None,
+        "c_type": 'C' if c_material else None,
+        "c": c_material,
+        "middle": spec.get('middle') or None,
+        "b_type": 'B' if b_material else None,
+        "b": b_material,
+        "back": spec.get('back') or None,
+    }
+
+
+def suggestion_orders(orders_df: pl.DataFrame, suggestion: dict) -> pl.DataFrame:
+    """Returns the orders a suggestion would plan, using the same filters as main_algorithm."""
+    kwargs = suggestion_kwargs(suggestion)
+    return cleaning.filter_orders(
+        orders_df,
+        front=kwargs["front"],
+        c=kwargs["c"],
+        middle=kwargs["middle"],
+        b=kwargs["b"],
+        back=kwargs["back"],
+    )
+
+
+def group_independent_suggestions(
+    suggestions: List[dict],
+    orders_df: pl.DataFrame,
+    processed_orders: Optional[set] = None,
+) -> List[List[int]]:
+    """
+    Partitions suggestions into groups that can be planned independently.
+
+    Two suggestions conflict, and end up in the same group, when they could select the
+    same order or draw from the same stock bucket (roll width and paper material).
+    Suggestions in different groups touch disjoint orders and disjoint rolls.
+
+    Returns:
+        List[List[int]]: Groups of suggestion indexes, each sorted, ordered by their first index.
+    """
+    parent = list(range(len(suggestions)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i: int, j: int) -> None:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    if processed_orders:
+        orders_df = orders_df.filter(~pl.col("order_number").is_in(list(processed_orders)))
+
+    owner_of_key = {}
+    for idx, suggestion in enumerate(suggestions):
+        matched = suggestion_orders(orders_df, suggestion)
+        keys = [("order", order_number) for order_number in matched.get_column("order_number").unique().to_list()]
+        # วัสดุจริงของออเดอร์อาจยาวกว่าชื่อใน spec (กรองแบบ contains) จึงใช้ค่าจากออเดอร์ที่ตรงกัน
+        width = str(suggestion['width'])
+        for col in cleaning.MATERIAL_COLS:
+            for material in matched.get_column(col).drop_nulls().unique().cast(pl.Utf8).to_list():
+                keys.append(("stock", width, material.strip()))
+        for key in keys:
+            if key in owner_of_key:
+                union(idx, owner_of_key[key])
+            else:
+                owner_of_key[key] = idx
+
+    groups: Dict[int, List[int]] = {}
+    for idx in range(len(suggestions)):
+        groups.setdefault(find(idx), []).append(idx)
+    return sorted(groups.values(), key=lambda group: group[0])
+
+
+def _stock_subset(roll_specs: dict, suggestions: List[dict]) -> dict:
+    """Copies only the roll widths used by the given suggestions."""
+    widths = {str(s['width']) for s in suggestions}
+    return {
+        width: {material: {key: dict(roll) for key, roll in rolls.items()} for material, rolls in materials.items()}
+        for width, materials in roll_specs.items() if width in widths
+    }
+
+
+def roll_lengths(roll_specs: dict) -> dict:
+    """Flattens roll lengths to {(width, material, key): length}."""
+    return {
+        (width, material, key): roll['length']
+        for width, materials in roll_specs.items()
+        for material, rolls in materials.items()
+        for key, roll in rolls.items()
+    }
+
+
+def _merge_stock(roll_specs: dict, sent_lengths: dict, updated: dict) -> None:
+    """
+    Writes the roll lengths consumed by a finished group back into roll_specs in place.
+    Only rolls the group actually cut are written, since groups may share a width
+    but never a roll.
+    """
+    for (width, material, key), length in roll_lengths(updated).items():
+        if length != sent_lengths.get((width, material, key)):
+            target = roll_specs.get(width, {}).get(material, {})
+            if key in target:
+                target[key]['length'] = length
+
+
+def load_timings(file_path: str = TIMINGS_PATH) -> List[dict]:
+    """Loads recorded suggestion runtimes; a missing or unreadable file gives an empty history."""
+    try:
+        with open(file_path, encoding="utf-8") as f:
+            history = json.load(f)
+    except (OSError, ValueError):
+        return []
+    return history if isinstance(history, list) else []
+
+
+def save_timings(history: List[dict], file_path: str = TIMINGS_PATH) -> None:
+    """Writes the most recent HISTORY_LIMIT runtimes through a temporary file and a rename."""
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(history[-HISTORY_LIMIT:], f)
+    os.replace(tmp_path, file_path)
+
+
+def _default_runtime(order_count: int) -> float:
+    base, per_order, per_order_sq = DEFAULT_COST
+    return base + per_order * order_count + per_order_sq * order_count * order_count
+
+
+def predict_runtime(order_count: int, roll_width, history: Optional[List[dict]] = None) -> float:
+    """
+    Predicts the runtime of one main_algorithm call in seconds.
+
+    The default model is scaled by the median ratio of actual to predicted time over
+    recent history, preferring samples with the same roll width.
+    """
+    if order_count <= 0:
+        return 0.0
+    order_count = min(order_count, core.MAX_RECORDS)
+    estimate = _default_runtime(order_count)
+    samples = [s for s in history or () if s.get("order_count", 0) > 0]
+    same_width = [s for s in samples if str(s.get("roll_width")) == str(roll_width)]
+    samples = (same_width or samples)[-HISTORY_WINDOW:]
+    if samples:
+        ratios = sorted(s["seconds"] / _default_runtime(s["order_count"]) for s in samples)
+        estimate *= ratios[len(ratios) // 2]
+    return estimate
+
+
+def suggestion_order_counts(
+    suggestions: List[dict],
+    orders_df: pl.DataFrame,
+    excluded_orders: Optional[set] = None,
+) -> List[int]:
+    """Counts the orders each suggestion would plan, leaving out excluded (already claimed) orders."""
+    if excluded_orders:
+        orders_df = orders_df.filter(~pl.col("order_number").is_in(list(excluded_orders)))
+    return [suggestion_orders(orders_df, suggestion).height for suggestion in suggestions]
+
+
+def run_suggestion_group(
+    suggestions: List[dict],
+    orders_df: pl.DataFrame,
+    roll_specs: dict,
+    processed_orders: Optional[set] = None,
+    indexes: Optional[List[int]] = None,
+    claims: Optional[OrderClaims] = None,
+    output_dir: str = "cache",
+    planning_params: Optional[dict] = None,
+    event_callback: Optional[Callable[[dict], None]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    checkpoint_dir: Optional[str] = None,
+) -> dict:
+    """
+    Runs a group of conflicting suggestions one after another, with the same semantics as the UI:
+    orders planned (or found infeasible) by a suggestion are skipped by the following ones,
+    and roll_specs is consumed in place.
+
+    Each suggestion claims its orders in `claims` as "suggestion-<index>". Without a shared
+    registry a local one is seeded from processed_orders.
+
+    This is a top-level function so it can run in a worker process.
+
+    Suggestions whose orders are all claimed by the time they start are skipped with
+    empty results, and the runtime of each executed one is recorded.
+
+    `event_callback` receives main_algorithm's events tagged with "suggestion" (the index),
+    plus {"event": "suggestion", "suggestion", "width", "spec", "status", "results"} as
+    each suggestion starts ("started"), is skipped ("skipped") or ends ("finished").
+
+    When `cancel_token` is cancelled, the running suggestion stops with its partial rows
+    and the following suggestions are not started (they are missing from "results").
+
+    With `checkpoint_dir`, each suggestion checkpoints its progress there and a rerun of
+    the same group resumes where it stopped (see core.stream_main_algorithm).
+
+    Returns:
+        dict: {"results": [(index, results), ...], "roll_specs": roll_specs,
+        "timings": [{"order_count", "roll_width", "seconds"}, ...]}
+    """
+    if claims is None:
+        claims = OrderClaims()
+        for order_number in processed_orders or ():
+            claims.claim(order_number, "processed")
+    indexes = indexes if indexes is not None else list(range(len(suggestions)))
+    group_results, timings = asyncio.run(
+        _run_group_async(
+            suggestions, indexes, orders_df, roll_specs, claims,
+            output_dir=output_dir, planning_params=planning_params, event_callback=event_callback,
+            cancel_token=cancel_token, checkpoint_dir=checkpoint_dir,
+        )
+    )
+    return {"results": group_results, "roll_specs": roll_specs, "timings": timings}
+
+
+def _tag_event(event_callback: Callable[[dict], None], idx: int, event: dict) -> None:
+    event_callback({**event, "suggestion": idx})
+
+
+def _suggestion_event(suggestion: dict, status: str, results: Optional[int] = None) -> dict:
+    return {"event": "suggestion", "width": suggestion['width'], "spec": suggestion['spec'], "status": status, "results": results}
+
+
+async def _run_group_async(
+    suggestions: List[dict],
+    indexes: List[int],
+    orders_df: pl.DataFrame,
+    roll_specs: dict,
+    claims: OrderClaims,
+    on_result: Optional[Callable[[int, list], None]] = None,
+    output_dir: str = "cache",
+    planning_params: Optional[dict] = None,
+    event_callback: Optional[Callable[[dict], None]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    checkpoint_dir: Optional[str] = None,
+) -> tuple:
+    """
+    Runs a group of suggestions in order on the current event loop. Returns (results, timings).
+
+    The suggestions share one ResultWriter, so a suggestion starts while the files of
+    the previous one are still being written; all are written before this returns, and
+    the files of older runs in `output_dir` are then pruned (see result_writer.prune_run_files).
+    """
+    group_results = []
+    timings = []
+    with ResultWriter() as writer:
+        for idx, suggestion in zip(indexes, suggestions):
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            emit = functools.partial(_tag_event, event_callback, idx) if event_callback else None
+
+            order_count = suggestion_order_counts([suggestion], orders_df, claims.claimed_orders())[0]
+            if order_count == 0:
+                # ออเดอร์ทั้งหมดของคำแนะนำนี้ถูกจองแล้ว ไม่ต้องเริ่มคำนวณ
+                results = []
+                if emit:
+                    emit(_suggestion_event(suggestion, "skipped", 0))
+            else:
+                if emit:
+                    emit(_suggestion_event(suggestion, "started"))
+                started = time.perf_counter()
+                results = await core.main_algorithm(
+                    roll_width=int(suggestion['width']),
+                    roll_length=suggestion['length'],
+                    orders_df=orders_df,
+                    roll_specs=roll_specs,
+                    claims=claims,
+                    claim_owner=f"suggestion-{idx}",
+                    output_dir=output_dir,
+                    planning_params=planning_params,
+                    event_callback=emit,
+                    cancel_token=cancel_token,
+                    result_writer=writer,
+                    checkpoint_dir=checkpoint_dir,
+                    **suggestion_kwargs(suggestion),
+                )
+                if emit:
+                    emit(_suggestion_event(suggestion, "finished", len(results)))
+                timings.append({
+                    "order_count": order_count,
+                    "roll_width": str(suggestion['width']),
+                    "seconds": time.perf_counter() - started,
+                })
+            group_results.append((idx, results))
+            if on_result:
+                on_result(idx, results)
+    prune_run_files(output_dir)
+    return group_results, timings
+
+
+async def run_suggestions_async(
+    suggestions: List[dict],
+    orders_df: pl.DataFrame,
+    roll_specs: dict,
+    processed_orders: Optional[set] = None,
+    on_result: Optional[Callable[[int, list], None]] = None,
+    claims: Optional[OrderClaims] = None,
+) -> List[tuple]:
+    """
+    Runs groups of conflicting suggestions as concurrent coroutines on the running event loop,
+    e.g. in the GUI worker's loop or a FastAPI handler. Groups overlap while CBC runs in the
+    solver executor (see core.set_solver_concurrency); roll_specs is consumed in place directly
+    since groups touch disjoint rolls.
+
+    Returns:
+        List[tuple]: (index, results) for every suggestion, in suggestion order.
+    """
+    if claims is None:
+        claims = OrderClaims()
+    for order_number in processed_orders or ():
+        claims.claim(order_number, "processed")
+    groups = group_independent_suggestions(suggestions, orders_df, claims.claimed_orders())
+    group_outputs = await asyncio.gather(*(
+        _run_group_async([suggestions[i] for i in group], group, orders_df, roll_specs, claims, on_result)
+        for group in groups
+    ))
+    return sorted(
+        (item for group_results, _ in group_outputs for item in group_results),
+        key=lambda item: item[0],
+    )
+
+
+def _run_published_group(suggestions: List[dict], handle: Dict[str, str], *args, cancel_event=None, **kwargs) -> dict:
+    """
+    run_suggestion_group for a worker process: orders and stock are attached from shared memory,
+    and the group gets its own ROLL_SPECS built from the rolls its suggestions can use.
+    Setting `cancel_event` (see cancellation.shared_cancel_event) cancels the group.
+    """
+    roll_specs = _stock_subset(attach_roll_specs(handle, "stock"), suggestions)
+    with linked_token(cancel_event) as token:
+        return run_suggestion_group(suggestions, attach(handle, "orders"), roll_specs, *args, cancel_token=token, **kwargs)
+
+
+def run_suggestions_parallel(
+    suggestions: List[dict],
+    orders_df: pl.DataFrame,
+    roll_specs: dict,
+    processed_orders: Optional[set] = None,
+    max_workers: Optional[int] = None,
+    on_result: Optional[Callable[[int, list], None]] = None,
+    claims: Optional[OrderClaims] = None,
+    history: Optional[List[dict]] = None,
+    planning_params: Optional[dict] = None,
+    checkpoint_dir: Optional[str] = None,
+    cancel_token: Optional[CancellationToken] = None,
+) -> List[tuple]:
+    """
+    Runs suggestions in a process pool, one task per group of conflicting suggestions
+    (see group_independent_suggestions). Within a group suggestions keep the sequential
+    processed-orders semantics; groups touch disjoint orders and rolls, so the outcome
+    is the same as running everything in suggestion order.
+
+    Groups are dispatched longest-first by their predicted runtime (see predict_runtime),
+    which keeps the slowest group from starting last. Suggestions with no unclaimed
+    orders are not dispatched at all.
+
+    Args:
+        suggestions (List[dict]): Suggestions with 'width', 'spec' and 'length'.
+        orders_df (pl.DataFrame): Cleaned orders (suggestion mode).
+        roll_specs (dict): ROLL_SPECS; remaining roll lengths are written back in place.
+        processed_orders (Optional[set]): Orders already planned before this run.
+        max_workers (Optional[int]): Process pool size; defaults to the CPU count.
+        on_result (Optional[Callable[[int, list], None]]): Called with (index, results)
+            for each suggestion in index order: a finished suggestion is held back until all
+            suggestions before it have been reported, so merges are deterministic.
+        claims (Optional[OrderClaims]): Registry shared by all groups; must come from
+            OrderClaims.shared() when more than one worker runs.
+        history (Optional[List[dict]]): Runtime history (see load_timings) used for the
+            predictions; the new timings are appended in place.
+        planning_params (Optional[dict]): Planning rule overrides (see core.resolve_planning_params).
+        checkpoint_dir (Optional[str]): Where suggestions checkpoint their progress, so an
+            interrupted run started again with the same inputs resumes (see run_suggestion_group).
+        cancel_token (Optional[CancellationToken]): Cancelling it stops the running groups with
+            their partial results (their CBC solves are killed) and drops the groups not yet started.
+
+    Returns:
+        List[tuple]: (index, results) for every suggestion that ran, in suggestion order.
+    """
+    if claims is not None:
+        for order_number in processed_orders or ():
+            claims.claim(order_number, "processed")
+        processed_orders = claims.claimed_orders()
+
+    all_results = []
+    # ผลที่เสร็จก่อนลำดับของตัวเองถูกพักไว้ แล้วส่งให้ on_result ตามลำดับคำแนะนำ
+    held = {}
+    next_index = 0
+
+    def release(idx: int, results: list) -> None:
+        nonlocal next_index
+        all_results.append((idx, results))
+        held[idx] = results
+        while next_index in held:
+            if on_result:
+                on_result(next_index, held.pop(next_index))
+            else:
+                held.pop(next_index)
+            next_index += 1
+
+    order_counts = suggestion_order_counts(suggestions, orders_df, processed_orders)
+    runnable = [idx for idx, count in enumerate(order_counts) if count > 0]
+    for idx, count in enumerate(order_counts):
+        if count == 0:
+            release(idx, [])
+
+    groups = [
+        [runnable[i] for i in group]
+        for group in group_independent_suggestions([suggestions[i] for i in runnable], orders_df, processed_orders)
+    ]
+    costs = [
+        sum(predict_runtime(order_counts[i], suggestions[i]['width'], history) for i in group)
+        for group in groups
+    ]
+    groups = [group for _, group in sorted(zip(costs, groups), key=lambda item: -item[0])]
+    group_stock = [_stock_subset(roll_specs, [suggestions[i] for i in group]) for group in groups]
+    # เก็บความยาวม้วนก่อนส่งให้แต่ละกลุ่ม เพื่อเขียนกลับเฉพาะม้วนที่ถูกตัดจริง
+    sent_lengths = [roll_lengths(stock) for stock in group_stock]
+
+    def collect(group_no: int, group_output: dict) -> None:
+        _merge_stock(roll_specs, sent_lengths[group_no], group_output["roll_specs"])
+        if history is not None:
+            history.extend(group_output["timings"])
+        for idx, results in group_output["results"]:
+            release(idx, results)
+
+    workers = min(len(groups), max_workers or os.cpu_count() or 1)
+    # ProcessPoolExecutor เริ่มงานตามลำดับที่ส่ง จึงส่งกลุ่มที่คาดว่าใช้เวลานานที่สุดก่อน
+    if workers <= 1:
+        for group_no, group in enumerate(groups):
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            collect(group_no, run_suggestion_group(
+                [suggestions[i] for i in group], orders_df, group_stock[group_no], processed_orders, group, claims,
+                planning_params=planning_params, cancel_token=cancel_token, checkpoint_dir=checkpoint_dir,
+            ))
+    else:
+        # ใช้ spawn เสมอ (ค่าเริ่มต้นบน Windows) เพราะการ fork โปรเซสที่มีเธรดของ polars อาจค้างได้
+        # ส่งออเดอร์และสต็อกผ่าน shared memory ครั้งเดียว แทนการ pickle ให้ทุกงาน
+        with shared_cancel_event(cancel_token) as cancel_event, SharedFrames() as shared, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            shared.publish("orders", orders_df)
+            handle = shared.publish_roll_specs(roll_specs, "stock")
+            futures = {
+                executor.submit(
+                    _run_published_group,
+                    [suggestions[i] for i in group],
+                    handle,
+                    processed_orders,
+                    group,
+                    claims,
+                    planning_params=planning_params,
+                    checkpoint_dir=checkpoint_dir,
+                    cancel_event=cancel_event,
+                ): group_no
+                for group_no, group in enumerate(groups)
+            }
+            for future in _completed(futures, cancel_token):
+                collect(futures[future], future.result())
+
+    # คำแนะนำที่ไม่ได้รันเพราะถูกยกเลิกทำให้ผลถัดไปค้างอยู่ ส่งที่เหลือตามลำดับ
+    for idx in sorted(held):
+        if on_result:
+            on_result(idx, held[idx])
+    return sorted(all_results, key=lambda item: item[0])
+
+
+def _completed(futures, cancel_token: Optional[CancellationToken]) -> Iterator:
+    """
+    as_completed over pool futures; once `cancel_token` is cancelled the tasks not yet
+    started are cancelled and skipped, and the running ones are still waited for.
+    """
+    for future in as_completed(futures):
+        if future.cancelled():
+            continue
+        if cancel_token is not None and cancel_token.cancelled:
+            for pending in futures:
+                pending.cancel()
+        yield future
+
+
+def plan_factory(factory: str, orders_df: pl.DataFrame, stock_df: pl.DataFrame,
+                 cancel_token: Optional[CancellationToken] = None) -> dict:
+    """
+    Plans one factory the way the UI does for a single factory selection: its orders
+    (see cleaning.filter_orders_by_factory), its own stock snapshot, every suggestion in order.
+    A cancelled `cancel_token` stops it with the results planned so far.
+
+    This is a top-level function so it can run in a worker process.
+
+    Returns:
+        dict: {"factory", "orders", "suggestions", "results", "roll_specs", "seconds"}
+    """
+    started = time.perf_counter()
+    orders = cleaning.filter_orders_by_factory(orders_df, factory)
+    roll_specs = inventory.build_roll_specs(cleaning.filter_stock_by_factory(stock_df, factory))
+    suggestions = runnable_suggestions(orders, roll_specs)
+
+    output = run_suggestion_group(
+        suggestions, orders, roll_specs, output_dir=os.path.join("cache", f"factory_{factory}"),
+        cancel_token=cancel_token,
+    )
+    results = [result for _, suggestion_results in output["results"] for result in suggestion_results]
+    return {
+        "factory": factory,
+        "orders": orders.height,
+        "suggestions": len(suggestions),
+        "results": results,
+        "roll_specs": roll_specs,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _plan_published_factory(factory: str, handle: Dict[str, str], cancel_event=None) -> dict:
+    """plan_factory for a worker process, with orders and stock attached from shared memory."""
+    with linked_token(cancel_event) as token:
+        return plan_factory(factory, attach(handle, "orders"), attach(handle, "stock"), cancel_token=token)
+
+
+def run_factories_parallel(
+    orders_df: pl.DataFrame,
+    stock_df: pl.DataFrame,
+    factories=cleaning.FACTORIES,
+    max_workers: Optional[int] = None,
+    on_factory: Optional[Callable[[dict], None]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+) -> Dict[str, dict]:
+    """
+    Plans several factories at once, one worker process per factory, each with its own copy
+    of the cleaned orders and its own stock snapshot. Factories 1 and 2 plan the same
+    '1218' orders, as with the factory selection in the UI.
+
+    Cancelling `cancel_token` stops the running factories with their partial plans and
+    skips the ones not yet started.
+
+    Returns:
+        Dict[str, dict]: plan_factory output per factory that ran, in the order of `factories`.
+    """
+    factories = [str(factory) for factory in factories]
+    plans = {}
+    workers = min(len(factories), max_workers or os.cpu_count() or 1)
+    if workers <= 1:
+        for factory in factories:
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            plans[factory] = plan_factory(factory, orders_df, stock_df, cancel_token)
+            if on_factory:
+                on_factory(plans[factory])
+    else:
+        with shared_cancel_event(cancel_token) as cancel_event, SharedFrames() as shared, \
+                ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            shared.publish("orders", orders_df)
+            handle = shared.publish("stock", stock_df)
+            futures = [executor.submit(_plan_published_factory, factory, handle, cancel_event) for factory in factories]
+            for future in _completed(futures, cancel_token):
+                plan = future.result()
+                plans[plan["factory"]] = plan
+                if on_factory:
+                    on_factory(plan)
+    return {factory: plans[factory] for factory in factories if factory in plans}
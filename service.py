@@ -0,0 +1,429 @@
+import asyncio
+import collections
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Union
+
+import polars as pl
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+import cleaning
+import core
+import inventory
+import scheduler
+from cancellation import linked_token
+
+# จำนวนโปรเซสที่คำนวณพร้อมกัน และจำนวนงานสูงสุดที่รับไว้ (รอ + กำลังทำ) ก่อนตอบ 429
+PLANNING_WORKERS = int(os.environ.get("PLANNING_WORKERS", "0") or 0) or (os.cpu_count() or 1)
+PLANNING_MAX_JOBS = int(os.environ.get("PLANNING_MAX_JOBS", "0") or 0) or PLANNING_WORKERS * 4
+JOB_HISTORY = 200  # จำนวนงานที่เสร็จแล้วที่เก็บผลไว้
+JOB_EVENT_BUFFER = 2000  # จำนวนเหตุการณ์ล่าสุดที่เก็บไว้ต่องาน
+JOB_EVENT_HISTORY = 20  # จำนวนงานที่เสร็จแล้วล่าสุดที่ยังเก็บเหตุการณ์ไว้
+RETRY_AFTER_SECONDS = 5
+JOBS_DIR = os.path.join("cache", "jobs")
+EVENT_POLL_SECONDS = 0.1
+KEEPALIVE_SECONDS = 15
+
+ACTIVE_STATUSES = ("queued", "running", "cancelling")
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue already holds PLANNING_MAX_JOBS unfinished jobs."""
+
+
+class PlanRequest(BaseModel):
+    """
+    A planning job. Orders and stock are given either inline (rows with the same column
+    names as the CSV exports, Thai or English) or as paths readable by the service.
+    Without suggestions, every suggestion the stock can run is planned, as in the UI.
+    """
+    orders: Optional[List[Dict[str, Any]]] = None
+    orders_path: Optional[Union[str, List[str]]] = None
+    stock: Optional[List[Dict[str, Any]]] = None
+    stock_path: Optional[str] = None
+    factory: Optional[str] = None
+    suggestions: Optional[List[Dict[str, Any]]] = None
+    planning_params: Optional[Dict[str, Any]] = None
+
+
+def _rows_frame(rows: List[Dict[str, Any]]) -> pl.DataFrame:
+    # อ่านทุกคอลัมน์เป็นข้อความเหมือนไฟล์ CSV แล้วให้ขั้นตอน cleaning แปลงชนิดข้อมูล
+    return pl.DataFrame(rows).with_columns(pl.all().cast(pl.Utf8))
+
+
+def load_request_orders(request: dict) -> pl.DataFrame:
+    if request.get("orders") is not None:
+        return cleaning.clean_data(_rows_frame(request["orders"]), suggestion_mode=True)
+    return cleaning.load_orders(request["orders_path"])
+
+
+def load_request_stock(request: dict) -> pl.DataFrame:
+    if request.get("stock") is not None:
+        return cleaning.clean_stock(_rows_frame(request["stock"]))
+    return cleaning.clean_stock(cleaning.load_data(request["stock_path"]))
+
+
+def run_planning_job(request: dict, output_dir: str, events=None, cancel_event=None) -> dict:
+    """
+    Runs one planning job in a worker process: loads and cleans the orders and stock,
+    applies the factory filter and plans the suggestions in order.
+
+    `events` (a multiprocessing queue) receives {"event": "loaded", "orders", "suggestions"}
+    and then the planning events of scheduler.run_suggestion_group, as they happen.
+    Setting `cancel_event` (a Manager Event) stops the run, killing the CBC solve in
+    progress; the results planned so far are returned with "cancelled": True.
+
+    Returns:
+        dict: {"orders", "suggestions", "results", "seconds", "cancelled"}
+    """
+    started = time.perf_counter()
+    orders_df = load_request_orders(request)
+    stock_df = load_request_stock(request)
+    factory = request.get("factory")
+    if factory:
+        orders_df = cleaning.filter_orders_by_factory(orders_df, factory)
+        stock_df = cleaning.filter_stock_by_factory(stock_df, factory)
+    roll_specs = inventory.build_roll_specs(stock_df)
+
+    suggestions = request.get("suggestions")
+    if suggestions is None:
+        suggestions = scheduler.runnable_suggestions(orders_df, roll_specs)
+    else:
+        suggestions = [
+            {**s, 'length': s.get('length') or scheduler.suggestion_length(roll_specs, str(s['width']), s['spec'])}
+            for s in suggestions
+        ]
+
+    emit = events.put if events is not None else None
+    if emit:
+        emit({"event": "loaded", "orders": orders_df.height, "suggestions": len(suggestions)})
+    with linked_token(cancel_event) as token:
+        output = scheduler.run_suggestion_group(
+            suggestions, orders_df, roll_specs, output_dir=output_dir,
+            planning_params=request.get("planning_params"), event_callback=emit, cancel_token=token,
+        )
+    return {
+        "orders": orders_df.height,
+        "suggestions": len(suggestions),
+        "results": [result for _, suggestion_results in output["results"] for result in suggestion_results],
+        "seconds": round(time.perf_counter() - started, 3),
+        "cancelled": token.cancelled,
+    }
+
+
+class PlanningJobs:
+    """
+    Job queue in front of a bounded process pool. At most max_jobs jobs are held
+    unfinished (queued or running); submit() raises QueueFullError beyond that so the
+    caller can apply backpressure instead of the queue growing without bound.
+
+    A queued job is cancelled outright. A running job is marked 'cancelling' and
+    signalled through a Manager Event; its worker kills the CBC solve in progress and
+    returns what it planned so far, kept as a partial result of the 'cancelled' job.
+
+    Planning events of each job are forwarded from its worker through a Manager queue
+    and kept in order, so any number of clients can stream them (see events()). Only the
+    last JOB_EVENT_BUFFER events of a job are kept, and only the JOB_EVENT_HISTORY most
+    recently finished jobs keep theirs; event ids keep counting from the job's first event.
+    """
+
+    def __init__(self, max_workers: int = PLANNING_WORKERS, max_jobs: int = PLANNING_MAX_JOBS):
+        self.max_workers = max(1, max_workers)
+        self.max_jobs = max(1, max_jobs)
+        self._executor = None
+        self._manager = None
+        self._event_queues = {}
+        self._cancel_events = {}
+        self._jobs: Dict[str, dict] = {}
+        self._futures = {}
+        self._ids = itertools.count(1)
+        # RLock เพราะ future.cancel() เรียก _on_done ทันทีในเธรดเดียวกัน
+        self._lock = threading.RLock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # ใช้ spawn เพราะการ fork โปรเซสที่มีเธรดของ polars อาจค้างได้
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def _get_manager(self):
+        if self._manager is None:
+            self._manager = multiprocessing.get_context("spawn").Manager()
+        return self._manager
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job["status"] in ACTIVE_STATUSES)
+
+    def submit(self, request: dict) -> dict:
+        with self._lock:
+            if sum(1 for job in self._jobs.values() if job["status"] in ACTIVE_STATUSES) >= self.max_jobs:
+                raise QueueFullError(f"Planning queue is full ({self.max_jobs} jobs)")
+            job_id = f"{int(time.time())}-{next(self._ids)}"
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "finished_at": None,
+                "error": None,
+                "result": None,
+                "events": collections.deque(maxlen=JOB_EVENT_BUFFER),
+                "events_base": 0,  # id ของเหตุการณ์แรกที่ยังเก็บไว้
+                "events_closed": False,
+            }
+            self._jobs[job_id] = job
+            events = self._get_manager().Queue()
+            self._event_queues[job_id] = events
+            cancel_event = self._cancel_events[job_id] = self._get_manager().Event()
+            threading.Thread(target=self._pump_events, args=(job_id, events), name=f"job-events-{job_id}", daemon=True).start()
+            future = self._get_executor().submit(
+                run_planning_job, request, os.path.join(JOBS_DIR, job_id), events, cancel_event
+            )
+            self._futures[job_id] = future
+        future.add_done_callback(lambda f: self._on_done(job_id, f))
+        return self.status(job_id)
+
+    def _on_done(self, job_id: str, future) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            self._futures.pop(job_id, None)
+            self._cancel_events.pop(job_id, None)
+            if job is None:
+                return
+            job["finished_at"] = time.time()
+            if future.cancelled():
+                job["status"] = "cancelled"
+            else:
+                try:
+                    job["result"] = future.result()
+                    # งานที่ถูกยกเลิกระหว่างคำนวณยังเก็บผลบางส่วนไว้
+                    job["status"] = "cancelled" if job["status"] == "cancelling" or job["result"]["cancelled"] else "done"
+                except CancelledError:
+                    job["status"] = "cancelled"
+                except Exception as e:
+                    job["status"] = "failed"
+                    job["error"] = f"{type(e).__name__}: {e}"
+            self._prune()
+            events = self._event_queues.pop(job_id, None)
+        if events is not None:
+            # worker ส่งเหตุการณ์ทั้งหมดเสร็จก่อนคืนผลเสมอ จึงปิดสตรีมต่อท้ายได้
+            events.put(None)
+
+    def _pump_events(self, job_id: str, events) -> None:
+        while True:
+            try:
+                event = events.get()
+            except (EOFError, OSError):
+                break  # manager ถูกปิดแล้ว
+            if event is None:
+                break
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    if len(job["events"]) == job["events"].maxlen:
+                        job["events_base"] += 1
+                    job["events"].append(event)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["events_closed"] = True
+
+    def events(self, job_id: str, start: int = 0) -> tuple:
+        """
+        Returns (id of the first returned event, events from id start, whether the stream
+        has ended). Events no longer kept are skipped, so the first id may be past start.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return start, [], True
+            base = job["events_base"]
+            first = max(start, base)
+            events = list(itertools.islice(job["events"], first - base, None))
+            return first, events, job["events_closed"] and job["status"] not in ACTIVE_STATUSES
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+        # งานเก่ายังเก็บผลไว้ แต่ทิ้งเหตุการณ์ (ผลตัดอยู่ใน result แล้ว)
+        for job_id in finished[max(0, len(finished) - JOB_HISTORY):max(0, len(finished) - JOB_EVENT_HISTORY)]:
+            job = self._jobs[job_id]
+            job["events_base"] += len(job["events"])
+            job["events"].clear()
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            future = self._futures.get(job_id)
+            if job["status"] == "queued" and future is not None and future.running():
+                job["status"] = "running"
+            summary = {key: value for key, value in job.items() if key not in ("result", "events", "events_base", "events_closed")}
+            summary["event_count"] = job["events_base"] + len(job["events"])
+            if job["result"] is not None:
+                summary.update(
+                    orders=job["result"]["orders"],
+                    suggestions=job["result"]["suggestions"],
+                    result_count=len(job["result"]["results"]),
+                    seconds=job["result"]["seconds"],
+                )
+            return summary
+
+    def result(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job and job["result"]
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            future = self._futures.get(job_id)
+            if job["status"] in ("queued", "running") and future is not None:
+                # งานที่ยังไม่เริ่มจะถูกยกเลิกทันที งานที่กำลังทำจะหยุด CBC และคืนผลบางส่วน
+                job["status"] = "cancelling"
+                cancel_event = self._cancel_events.get(job_id)
+                if not future.cancel() and cancel_event is not None:
+                    cancel_event.set()
+        return self.status(job_id)
+
+    def list(self) -> List[dict]:
+        with self._lock:
+            return [self.status(job_id) for job_id in list(self._jobs)]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            for future in list(self._futures.values()):
+                future.cancel()
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            manager, self._manager = self._manager, None
+        if manager is not None:
+            manager.shutdown()
+
+
+jobs = PlanningJobs()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    jobs.shutdown()
+
+
+app = FastAPI(title="Cutting Optimizer", lifespan=lifespan)
+
+
+@app.post("/jobs", status_code=202)
+def submit_job(request: PlanRequest):
+    """Queues a planning job. Answers 429 with Retry-After when the queue is full."""
+    if (request.orders is None) == (request.orders_path is None):
+        raise HTTPException(status_code=422, detail="Give exactly one of 'orders' or 'orders_path'.")
+    if (request.stock is None) == (request.stock_path is None):
+        raise HTTPException(status_code=422, detail="Give exactly one of 'stock' or 'stock_path'.")
+    try:
+        core.resolve_planning_params(request.planning_params)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    try:
+        return jobs.submit(request.model_dump())
+    except QueueFullError as e:
+        return JSONResponse(status_code=429, content={"detail": str(e)},
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+
+
+@app.get("/jobs")
+def list_jobs():
+    return {"active": jobs.active_count(), "max_jobs": jobs.max_jobs, "jobs": jobs.list()}
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    status = jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    """
+    Returns the cutting results of a finished job; 409 while it is not done. A job
+    cancelled while running returns what it planned before the stop, with "cancelled": true.
+    """
+    status = jobs.status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    result = jobs.result(job_id)
+    if status["status"] != "done" and not (status["status"] == "cancelled" and result is not None):
+        raise HTTPException(status_code=409, detail=f"Job is {status['status']}")
+    return {"job_id": job_id, **result}
+
+
+def _sse(event_id: int, event: dict) -> str:
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"id: {event_id}\nevent: {event.get('event', 'message')}\ndata: {data}\n\n"
+
+
+async def _event_stream(job_id: str, start: int, request: Request):
+    next_id = start
+    last_sent = time.monotonic()
+    while True:
+        next_id, events, finished = jobs.events(job_id, next_id)
+        for event in events:
+            yield _sse(next_id, event)
+            next_id += 1
+        if events:
+            last_sent = time.monotonic()
+        if finished:
+            yield _sse(next_id, {"event": "end", **(jobs.status(job_id) or {"job_id": job_id, "status": "unknown"})})
+            return
+        if await request.is_disconnected():
+            return
+        if time.monotonic() - last_sent > KEEPALIVE_SECONDS:
+            # ข้อความ comment ให้ proxy และ client รู้ว่างานยังทำอยู่
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(EVENT_POLL_SECONDS)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Streams the job's planning events as Server-Sent Events: "loaded", "suggestion" and
+    the records of core.stream_main_algorithm ("iteration", "allocation", "cut" with each
+    cut row as it is decided, "roll_end", "unplanned", "summary"), then a final "end" event
+    with the job status. Reconnecting clients resume after Last-Event-ID.
+    """
+    if jobs.status(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    last_event_id = request.headers.get("last-event-id", "")
+    start = int(last_event_id) + 1 if last_event_id.isdigit() else 0
+    return StreamingResponse(
+        _event_stream(job_id, start, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    status = jobs.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
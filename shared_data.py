@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+from typing import Dict, Optional
+
+import polars as pl
+
+import inventory
+
+SHM_DIR = "/dev/shm"
+
+
+def _default_base_dir() -> Optional[str]:
+    """Uses /dev/shm (RAM-backed) where it exists, otherwise the system temp directory."""
+    if os.path.isdir(SHM_DIR) and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR
+    return None
+
+
+class SharedFrames:
+    """
+    Publishes DataFrames once, as uncompressed Arrow IPC files in shared memory, for worker processes.
+
+    A handle is a plain {name: path} dict, cheap to pickle. Workers call attach(handle, name):
+    pl.read_ipc memory-maps the file, so every worker maps the same pages instead of
+    unpickling its own copy of the orders and stock.
+
+    Use as a context manager; close() removes the published files.
+    """
+
+    def __init__(self, base_dir: Optional[str] = None):
+        self.directory = tempfile.mkdtemp(prefix="cutting-", dir=base_dir or _default_base_dir())
+        self.handle: Dict[str, str] = {}
+
+    def publish(self, name: str, df: pl.DataFrame) -> Dict[str, str]:
+        """Writes df under name and returns the updated handle."""
+        path = os.path.join(self.directory, f"{name}.arrow")
+        tmp_path = path + ".tmp"
+        # ต้องไม่บีบอัด เพื่อให้ฝั่ง worker อ่านแบบ memory-map ได้โดยไม่ต้องคัดลอก
+        df.write_ipc(tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+        self.handle[name] = path
+        return dict(self.handle)
+
+    def publish_roll_specs(self, roll_specs: dict, name: str = "stock") -> Dict[str, str]:
+        """Publishes ROLL_SPECS as a stock table (see inventory.roll_specs_frame)."""
+        return self.publish(name, inventory.roll_specs_frame(roll_specs))
+
+    def close(self) -> None:
+        self.handle.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __enter__(self) -> "SharedFrames":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def attach(handle: Dict[str, str], name: str) -> pl.DataFrame:
+    """Opens a published DataFrame without copying its buffers."""
+    return pl.read_ipc(handle[name])
+
+
+def attach_roll_specs(handle: Dict[str, str], name: str = "stock") -> dict:
+    """Rebuilds a private ROLL_SPECS dict from a published stock table."""
+    return inventory.build_roll_specs(attach(handle, name))
@@ -1,82 +1,82 @@
-import os
-import time
-
 import polars as pl
-from PyQt5.QtCore import QMutex, QMutexLocker, QObject, pyqtSignal
+from PyQt5.QtCore import QCoreApplication, QObject, Qt, pyqtSignal
 
 # สมมติว่า cleaning.py อยู่ในไดเรกทอรีเดียวกันและมีฟังก์ชันเหล่านี้
 from cleaning import clean_stock, load_data
+from file_watcher import FileWatcher
+from inventory import delta_size, diff_stock
 
 
 class StockManager(QObject):
     """
-    จัดการการโหลดและรีเฟรชข้อมูลสต็อกเป็นระยะในเธรดแยก
-    ส่งสัญญาณเพื่อสื่อสารกับเธรด UI หลัก
+    จัดการการโหลดและรีเฟรชข้อมูลสต็อกในเธรดแยก
+    โหลดใหม่เมื่อระบบไฟล์แจ้งว่าไฟล์เปลี่ยนและเนื้อหาเปลี่ยนจริงเท่านั้น
+    ส่งเฉพาะส่วนที่เปลี่ยน (delta จาก inventory.diff_stock) ไปยังเธรด UI หลัก
     """
-    stock_updated = pyqtSignal(object)  # ใช้ object สำหรับ DataFrame
+    stock_updated = pyqtSignal(object)  # ใช้ object สำหรับ dict ของ delta
     error_signal = pyqtSignal(str)
     file_not_found_signal = pyqtSignal(str)
+    _file_path_changed = pyqtSignal(object)
 
     def __init__(self, file_path, parent=None):
         super().__init__(parent)
         self._file_path = file_path
         self._is_running = False
-        self._mutex = QMutex()
-        self._file_exists = True  # สมมติว่าไฟล์มีอยู่ตอนเริ่มต้น
+        self._watcher = None
+        self._last_stock_df = None  # สต็อกล่าสุดที่ส่งไปแล้ว ใช้คำนวณ delta
 
     def set_file_path(self, file_path):
         """เมธอดที่ปลอดภัยต่อเธรดเพื่ออัปเดตเส้นทางไฟล์"""
-        with QMutexLocker(self._mutex):
-            self._file_path = file_path
-            # รีเซ็ตสถานะเพื่อบังคับให้ตรวจสอบใหม่
-            self._file_exists = True
+        self._file_path = file_path
+        # ส่งผ่านสัญญาณเพื่อให้ watcher ถูกเรียกในเธรดของตัวเอง
+        self._file_path_changed.emit(file_path)
 
     def run(self):
         """
-        ลูปหลักสำหรับเธรดจัดการสต็อก
-        ตรวจสอบไฟล์สต็อก ประมวลผล แล้วรอ 60 วินาที
+        เริ่มเฝ้าดูไฟล์สต็อกในเธรดนี้
+        การโหลดทั้งหมดเกิดขึ้นผ่าน event loop ของเธรดเมื่อไฟล์เปลี่ยน
         """
         self._is_running = True
-        while self._is_running:
-            try:
-                with QMutexLocker(self._mutex):
-                    current_path = self._file_path
-
-                if not os.path.exists(current_path):
-                    # ส่งสัญญาณเฉพาะเมื่อตรวจพบว่าไฟล์หายไปครั้งแรก
-                    if self._file_exists:
-                        self.file_not_found_signal.emit(current_path)
-                        self._file_exists = False
-                    # รอก่อนที่จะพยายามอีกครั้งเพื่อหลีกเลี่ยง busy-waiting
-                    time.sleep(5)
-                    continue
-
-                # หากพบไฟล์ ให้รีเซ็ตแฟล็ก
-                self._file_exists = True
+        self._watcher = FileWatcher(self._file_path, parent=self)
+        self._watcher.file_changed.connect(self._reload)
+        self._watcher.file_missing.connect(self.file_not_found_signal)
+        self._file_path_changed.connect(self._watcher.set_file_path)
+        self._file_path_changed.connect(self._reset_baseline)
+        # หยุด timer ของ watcher ภายในเธรดของตัวเองก่อนที่เธรดจะจบ
+        self.thread().finished.connect(self._watcher.stop, Qt.DirectConnection)
+        self._watcher.start()
 
-                # โหลดและทำความสะอาดข้อมูล
-                raw_stock_df = load_data(current_path)
-                if raw_stock_df is not None and not raw_stock_df.is_empty():
-                    cleaned_stock_df = clean_stock(raw_stock_df)
-                    self.stock_updated.emit(cleaned_stock_df)
-                else:
-                    # หากไฟล์ว่างหรือโหลดไม่สำเร็จ ให้ส่ง DataFrame ที่ว่างเปล่า
-                    self.stock_updated.emit(pl.DataFrame())
+    def _reload(self, current_path):
+        """โหลดและทำความสะอาดข้อมูลเมื่อเนื้อหาไฟล์เปลี่ยน"""
+        if not self._is_running:
+            return
+        try:
+            raw_stock_df = load_data(current_path)
+            if raw_stock_df is not None and not raw_stock_df.is_empty():
+                cleaned_stock_df = clean_stock(raw_stock_df)
+            else:
+                # หากไฟล์ว่างหรือโหลดไม่สำเร็จ ให้ถือว่าสต็อกว่างเปล่า
+                cleaned_stock_df = pl.DataFrame()
 
-            except Exception as e:
-                self.error_signal.emit(
-                    f"เกิดข้อผิดพลาดในการประมวลผลไฟล์สต็อก '{self._file_path}':\n{e}"
-                )
-                # หลีกเลี่ยงข้อความแสดงข้อผิดพลาดที่รวดเร็วสำหรับปัญหาเดียวกัน
-                time.sleep(10)
+            delta = diff_stock(self._last_stock_df, cleaned_stock_df)
+            self._last_stock_df = cleaned_stock_df
+            # ส่งสัญญาณเฉพาะเมื่อมีม้วนที่เปลี่ยนจริง (หรือเป็นการโหลดครั้งแรก)
+            if delta["snapshot"] or delta_size(delta) > 0:
+                self.stock_updated.emit(delta)
+        except Exception as e:
+            # เนื้อหาเดิมจะไม่ถูกประมวลผลซ้ำจนกว่าไฟล์จะเปลี่ยน
+            self.error_signal.emit(
+                f"เกิดข้อผิดพลาดในการประมวลผลไฟล์สต็อก '{current_path}':\n{e}"
+            )
 
-            # รอ 60 วินาทีก่อนรอบถัดไป
-            # ลูปนี้ช่วยให้ออกจากโปรแกรมได้เร็วขึ้นหากเรียกใช้ stop()
-            for _ in range(60):
-                if not self._is_running:
-                    break
-                time.sleep(1)
+    def _reset_baseline(self, _file_path):
+        """บังคับให้การโหลดครั้งถัดไปส่งสต็อกทั้งหมดแทน delta"""
+        self._last_stock_df = None
 
     def stop(self):
-        """หยุดการทำงานของลูป"""
+        """หยุดการเฝ้าดูไฟล์และออกจาก event loop ของเธรด"""
         self._is_running = False
+        thread = self.thread()
+        app = QCoreApplication.instance()
+        if thread is not None and (app is None or thread is not app.thread()):
+            thread.quit()
@@ -0,0 +1,45 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import polars as pl
+
+import batch
+from test_cleaning import order_row, write_order_csv
+
+
+def test_batch_writes_deduplicated_plan(tmp_path, monkeypatch):
+    """
+    Tests the headless run end to end: one row per order in the plan, readable as UTF-8 with BOM.
+    """
+    monkeypatch.chdir(tmp_path)
+    rows = [order_row(order_number=str(12180000 + i), width=str(10 + i % 4), quantity="500") for i in range(6)]
+    rows += [order_row(order_number=str(12181000 + i), width=str(12 + i % 3), quantity="500",
+                       front="KB150", c="CA105", back="KB150") for i in range(4)]
+    orders_path = write_order_csv(tmp_path / "order.csv", rows)
+    stock_path = tmp_path / "stock.csv"
+    stock_path.write_text(
+        "roll_number,roll_type,roll_size,length\n"
+        "R1,KA125,80,50000\nR2,KA125,80,40000\nR3,CM100,80,90000\n"
+        "R4,KB150,90,50000\nR5,KB150,90,40000\nR6,CA105,90,90000\n",
+        encoding="utf-8",
+    )
+    output = tmp_path / "plan" / "nightly.csv"
+
+    code = batch.main(["--orders", orders_path, "--stock", str(stock_path), "--output", str(output), "--workers", "2"])
+
+    assert code == 0
+    assert output.read_bytes().startswith(b"\xef\xbb\xbf")
+    plan = pl.read_csv(output, encoding="utf8-lossy")
+    order_numbers = plan["order_number"].to_list()
+    assert sorted(order_numbers) == sorted(12180000 + i for i in range(6)) + sorted(12181000 + i for i in range(4))
+    assert not os.path.exists(str(output) + ".tmp")
+
+
+def test_batch_rejects_unknown_planning_params(tmp_path):
+    code = batch.main(["--orders", str(tmp_path / "none.csv"), "--stock", str(tmp_path / "none.csv"),
+                       "--params", '{"max_cut": 4}'])
+
+    assert code == 1
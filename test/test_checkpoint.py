@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from checkpoint import RunCheckpoint, run_key
+
+
+def test_load_drops_torn_log_line_and_keeps_snapshot(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path / run_key(80, ["A", "B"])), interval=2)
+    assert checkpoint.load() == (None, [])
+
+    checkpoint.record(1, {"status": "Optimal"}, {"order_number": "A", "trim": 1.5})
+    checkpoint.record(2, {"status": "Optimal"}, None)
+    checkpoint.snapshot({"iteration": 2, "last_used_roll_ids": {("80", "KA125", 0): "R1"}})
+    with open(checkpoint.log_path, "a", encoding="utf-8") as f:
+        f.write('{"iteration": 3, "res')  # โปรเซสถูกปิดระหว่างเขียน
+
+    state, decisions = checkpoint.load()
+    assert state["last_used_roll_ids"] == {("80", "KA125", 0): "R1"}
+    assert [d["iteration"] for d in decisions] == [1, 2] and decisions[0]["row"]["trim"] == 1.5
+
+    checkpoint.record(3, {"status": "Optimal"}, None)
+    assert [d["iteration"] for d in checkpoint.load()[1]] == [1, 2, 3]
+    assert checkpoint.due(2) and not checkpoint.due(3)
+
+    checkpoint.clear()
+    assert not os.path.exists(checkpoint.directory)
@@ -0,0 +1,123 @@
+import asyncio
+import copy
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+import core
+from claims import UNPLANNED_TRIM, OrderClaims
+from cleaning import load_orders
+from test_cleaning import order_row, write_order_csv
+
+
+def test_cut_claims_are_final():
+    """
+    Tests that a claim for a cut is not taken over by another run, even with a lower trim,
+    while unplanned claims lose to any cut.
+    """
+    claims = OrderClaims()
+
+    assert claims.claim(1, "a", 3.0)
+    assert not claims.claim(1, "b", 3.0)
+    assert not claims.claim(1, "b", 1.5)
+    assert claims.claim(1, "a", 2.0)  # the owner may improve its own trim
+    assert claims.snapshot() == {1: ("a", 2.0)}
+    assert claims.claim(2, "a") and not claims.claim(2, "c")
+    assert claims.claim(2, "b", 0.5) and claims.owner_of(2) == "b"
+
+
+def test_release_only_by_owner():
+    claims = OrderClaims()
+    claims.claim(1, "a", 1.0)
+    claims.claim(2, "a", UNPLANNED_TRIM)
+
+    assert not claims.release(1, "b")
+    assert claims.release(1, "a")
+    assert 1 not in claims
+    assert claims.release_owner("a") == 1
+    assert len(claims) == 0
+
+
+def test_concurrent_claims_have_one_winner():
+    """
+    Tests that racing threads never both win an order.
+    """
+    claims = OrderClaims()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        won = list(executor.map(lambda owner: claims.claim(7, f"run-{owner}", 1.0), range(32)))
+
+    assert won.count(True) == 1
+
+
+def test_shared_claims_across_processes():
+    with multiprocessing.get_context("spawn").Manager() as manager:
+        claims = OrderClaims.shared(manager, {1: ("a", 2.0), 3: ("a", UNPLANNED_TRIM)})
+        with multiprocessing.get_context("spawn").Pool(2) as pool:
+            won = pool.starmap(claims.claim, [(1, "b", 1.0), (2, "c", 1.0), (3, "b", 1.0)])
+
+        assert won == [False, True, True]
+        assert claims.snapshot() == {1: ("a", 2.0), 2: ("c", 1.0), 3: ("b", 1.0)}
+
+
+def test_main_algorithm_skips_orders_claimed_elsewhere(tmp_path, monkeypatch):
+    """
+    Tests that main_algorithm leaves orders held by other runs alone and claims its own cuts.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders = load_orders(write_order_csv(tmp_path / "order.csv", [
+        order_row(order_number="12180001", width="13"),
+        order_row(order_number="12180002", width="13"),
+    ]))
+    roll_specs = {'80': {
+        'KA125': {'R1': {'id': 'R1', 'length': 50000}, 'R2': {'id': 'R2', 'length': 40000}},
+        'CM100': {'R3': {'id': 'R3', 'length': 90000}},
+    }}
+    claims = OrderClaims()
+    claims.claim(12180001, "other", 0.0)
+
+    results = asyncio.run(core.main_algorithm(
+        80, 10 ** 9, orders_df=orders, roll_specs=roll_specs,
+        front="KA125", c_type="C", c="CM100", back="KA125",
+        claims=claims, claim_owner="mine",
+    ))
+
+    assert [r["order_number"] for r in results] == [12180002]
+    assert claims.owner_of(12180002) == "mine"
+    assert claims.owner_of(12180001) == "other"
+
+
+def test_concurrent_runs_never_cut_the_same_order(tmp_path, monkeypatch):
+    """
+    Tests two runs planning the same orders at once on different roll widths (so with
+    different trims): each order is cut by one run only, and only that run consumes stock for it.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders = load_orders(write_order_csv(tmp_path / "order.csv", [
+        order_row(order_number=str(12180000 + i), width=str(width)) for i, width in enumerate([13, 26, 39])
+    ]))
+    stock = {'KA125': {'R1': {'id': 'R1', 'length': 50000}}, 'CM100': {'R3': {'id': 'R3', 'length': 90000}}}
+    roll_specs = {'80': copy.deepcopy(stock), '79': copy.deepcopy(stock)}
+    claims = OrderClaims()
+    spec = dict(front="KA125", c_type="C", c="CM100", back="KA125")
+
+    async def both():
+        return await asyncio.gather(*(
+            core.main_algorithm(width, 10 ** 9, orders_df=orders, roll_specs=roll_specs,
+                                claims=claims, claim_owner=f"run-{width}", **spec)
+            for width in (80, 79)
+        ))
+
+    results = dict(zip(("80", "79"), asyncio.run(both())))
+
+    cut = {width: [r["order_number"] for r in rows if r["roll_w"] != "Failed/Infeasible"] for width, rows in results.items()}
+    assert sorted(cut["80"] + cut["79"]) == [12180000, 12180001, 12180002]
+    for width, order_numbers in cut.items():
+        assert all(claims.owner_of(order_number) == f"run-{width}" for order_number in order_numbers)
+        used = stock['CM100']['R3']['length'] - roll_specs[width]['CM100']['R3']['length']
+        assert used == pytest.approx(sum(r["demand_per_cut"] for r in results[width] if r["order_number"] in order_numbers))
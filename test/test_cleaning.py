@@ -0,0 +1,185 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import polars as pl
+
+from cleaning import (clean_data, clean_stock, filter_orders, filter_orders_by_factory, filter_stock_by_factory, load_data,
+                      load_orders, write_quarantine)
+
+ORDER_HEADER = [
+    "กำหนดส่ง       ", " เลขที่ใบสั่งขาย", "กว้าง", "ยาว", "จำนวนสั่งส่ง   ", "จำนวนสั่งผลิต",
+    "กระดาษหน้า", "ลอนC", "กระดาษกลาง", "ลอนB", "กระดาษหลัง", "ทับเส้น", "ประเภทกล่อง", "ผลิตได้",
+]
+
+
+def write_order_csv(path, rows):
+    """Writes an ERP-style order export: 'sep=;' first line, TIS-620 encoded."""
+    lines = ["sep=;", ";".join(ORDER_HEADER)]
+    # ERP exports pad every field with spaces, so all columns are read as strings.
+    lines += [";".join(f" {value} " for value in row) for row in rows]
+    with open(path, "w", encoding="TIS-620") as f:
+        f.write("\n".join(lines) + "\n")
+    return str(path)
+
+
+def order_row(due_date="01/08/25", order_number="12180001", width="10.5", length="30", demand="1,000",
+              quantity="1,000", front="KA125", c="CM100", middle="", b="", back="KA125",
+              type_="N", component_type="RSC", die_cut="1"):
+    return [due_date, order_number, width, length, demand, quantity, front, c, middle, b, back, type_, component_type, die_cut]
+
+
+def test_clean_data_uses_compact_schema(tmp_path):
+    """
+    Tests that material codes become dictionary-encoded and numerics use compact dtypes.
+    """
+    path = write_order_csv(tmp_path / "order.csv", [order_row(), order_row(order_number="12180002", front=" KA125 ")])
+
+    df = clean_data(load_data(path), suggestion_mode=True)
+
+    assert df.schema["front"] == pl.Categorical
+    assert df.schema["type"] == pl.Categorical
+    assert df.schema["due_date"] == pl.Date
+    assert df.schema["demand"] == pl.Int32
+    assert df.schema["die_cut"] == pl.UInt16
+    assert df["front"].to_list() == ["KA125", "KA125"]
+    assert df["middle"].null_count() == 2
+
+
+def test_clean_data_filters_materials_by_dictionary_code(tmp_path):
+    """
+    Tests that material filters still use regex containment and null for unset materials.
+    """
+    path = write_order_csv(tmp_path / "order.csv", [
+        order_row(order_number="1"),
+        order_row(order_number="2", front="KA150"),
+        order_row(order_number="3", middle="CM100"),
+    ])
+
+    df = clean_data(load_data(path), front="KA12", c="CM100", middle=None, b=None, back="KA125")
+
+    assert df["order_number"].to_list() == [1]
+
+
+def test_clean_stock_uses_compact_schema():
+    stock_df = pl.DataFrame({
+        "roll_number": [" R1 ", "R2"],
+        "roll_type": ["KA125", "KA125"],
+        "roll_size": ["80", "120"],
+        "length": ["1,000.5", "500"],
+    })
+
+    df = clean_stock(stock_df)
+
+    assert df.schema["roll_type"] == pl.Categorical
+    assert df.schema["roll_size"] == pl.UInt16
+    assert df.schema["length"] == pl.Int32
+    assert df.rows() == [("R1", "KA125", 80, 1000)]
+
+
+def test_filter_by_factory():
+    """
+    Tests that factories 1 and 2 share the '1218' orders and stock is split only when it has a factory.
+    """
+    orders = pl.DataFrame({"order_number": ["12180001", "31000001", "41000001"]})
+    stock = clean_stock(pl.DataFrame({
+        "factory": ["1", "3"],
+        "roll_number": ["R1", "R2"],
+        "roll_type": ["KA125", "KA125"],
+        "roll_size": ["80", "80"],
+        "length": ["1000", "500"],
+    }))
+
+    assert filter_orders_by_factory(orders, "2")["order_number"].to_list() == ["12180001"]
+    assert filter_orders_by_factory(orders, "3")["order_number"].to_list() == ["31000001"]
+    assert filter_orders_by_factory(orders, "รวม").height == 3
+    assert filter_stock_by_factory(stock, "3")["roll_number"].to_list() == ["R2"]
+    assert filter_stock_by_factory(stock.drop("factory"), "3").height == 2
+    assert filter_stock_by_factory(stock, "รวม").height == 2
+
+
+def test_clean_data_quarantines_malformed_rows_and_keeps_good_rows(tmp_path):
+    """
+    Tests that malformed ERP rows are routed to quarantine with a reason instead of failing the load.
+    """
+    path = write_order_csv(tmp_path / "order.csv", [
+        order_row(order_number="1"),
+        order_row(order_number="2", due_date="31/02/xx"),
+        order_row(order_number="ABC"),
+        order_row(order_number="4", width=""),
+        order_row(order_number="5"),
+    ])
+    quarantined = []
+
+    df = clean_data(load_data(path), suggestion_mode=True, on_quarantine=quarantined.append)
+
+    assert df["order_number"].to_list() == [1, 5]
+    rejected = quarantined[0]
+    assert rejected["source_row"].to_list() == [2, 3, 4]
+    assert rejected["reason"].to_list() == [
+        "due_date: invalid value",
+        "order_number: invalid value",
+        "width: missing",
+    ]
+
+    quarantine_path = tmp_path / "cache" / "order_quarantine.csv"
+    write_quarantine(rejected, str(quarantine_path))
+    assert pl.read_csv(quarantine_path)["reason"].to_list() == rejected["reason"].to_list()
+
+
+def test_clean_data_quarantines_values_out_of_compact_range(tmp_path):
+    """
+    Tests that integers that do not fit their compact dtype are quarantined instead of becoming null.
+    """
+    path = write_order_csv(tmp_path / "order.csv", [
+        order_row(order_number="1", die_cut="-1"),
+        order_row(order_number="2", die_cut="70000"),
+        order_row(order_number="3", demand="3,000,000,000"),
+        order_row(order_number="4", die_cut="65535"),
+    ])
+    quarantined = []
+
+    df = clean_data(load_data(path), suggestion_mode=True, on_quarantine=quarantined.append)
+
+    assert df.select("order_number", "die_cut").rows() == [(4, 65535)]
+    assert quarantined[0]["reason"].to_list() == [
+        "die_cut: out of range",
+        "die_cut: out of range",
+        "demand: out of range",
+    ]
+
+
+def test_load_orders_combines_files_from_glob(tmp_path):
+    """
+    Tests that several exports are loaded concurrently into one frame in file order, with rows
+    already loaded from an earlier file quarantined as duplicates and rejected rows reported once
+    with their source file. Repeated rows within one file are kept.
+    """
+    july = write_order_csv(tmp_path / "order_2025-07.csv", [
+        order_row(order_number="1"), order_row(order_number="2"), order_row(order_number="2"),
+    ])
+    august = write_order_csv(tmp_path / "order_2025-08.csv", [
+        order_row(order_number="2"),
+        order_row(order_number="2", demand="2,000"),
+        order_row(order_number="3", due_date="bad"),
+        order_row(order_number="4", front="KA150"),
+    ])
+    quarantined = []
+    messages = []
+
+    df = load_orders(str(tmp_path / "order_2025-*.csv"), on_quarantine=quarantined.append,
+                     progress_callback=messages.append)
+
+    assert df.select("order_number", "demand").rows() == [(1, 1000), (2, 1000), (2, 1000), (2, 2000), (4, 1000)]
+    assert messages == ["📁 Loaded 5 orders from 2 files"]
+    assert df.schema["front"] == pl.Categorical
+    assert sorted(df["front"].unique().to_list()) == ["KA125", "KA150"]
+    assert len(quarantined) == 1
+    rejected = quarantined[0]
+    assert rejected["source_file"].to_list() == [august, august]
+    assert [value.strip() for value in rejected["order_number"].to_list()] == ["3", "2"]
+    assert rejected["reason"].to_list()[1] == f"duplicate of a row in {july}"
+
+    filtered = filter_orders(df, front="KA150", c="CM100", middle=None, b=None, back="KA125")
+    assert filtered["order_number"].to_list() == [4]
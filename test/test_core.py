@@ -1,12 +1,26 @@
+import asyncio
+import functools
 import os
+import subprocess
 import sys
+import threading
+import time
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
 
 import polars as pl
 import pytest
+from pulp.apis import coin_api
 
-from core import _find_and_update_roll, main_algorithm, solve_linear_program
+import core
+from cancellation import CancellationToken
+from checkpoint import RunCheckpoint
+from claims import OrderClaims
+from cleaning import load_orders
+from core import (ProgressEvent, ProgressThrottle, _find_and_update_roll, main_algorithm, resolve_planning_params,
+                  solve_linear_program, stream_main_algorithm)
+from test_cleaning import order_row, write_order_csv
 
 
 def test_find_and_update_roll_sufficient_single_roll():
@@ -145,6 +159,29 @@ async def test_solve_linear_program_simple_case():
     assert result['variables']['cuts'] == 5
     assert result['variables']['trim'] == 5
 
+@pytest.mark.asyncio
+async def test_solve_linear_program_uses_planning_params():
+    """
+    Tests that planning parameter overrides replace the default cut and trim rules.
+    """
+    orders_df = pl.DataFrame({
+        "width": [10],
+        "length": [100],
+        "quantity": [1],
+        "type": ["A"],
+        "component_type": ["compA"],
+    })
+
+    limited = await solve_linear_program(55, 10000, orders_df, params={"max_cuts": 4})
+    relaxed = await solve_linear_program(55, 10000, orders_df, params={"max_cuts": 4, "max_trim": 15})
+
+    assert limited['status'] != 'Optimal'
+    assert relaxed['status'] == 'Optimal'
+    assert relaxed['variables']['cuts'] == 4
+    assert resolve_planning_params({"corrugate_multipliers": {"C": 1.5}})["corrugate_multipliers"]["B"] == 1.35
+    with pytest.raises(ValueError):
+        resolve_planning_params({"max_cut": 4})
+
 @pytest.mark.asyncio
 async def test_solve_linear_program_infeasible():
     """
@@ -157,3 +194,283 @@ async def test_solve_linear_program_infeasible():
     result = await solve_linear_program(roll_width, roll_length, orders_df)
     
     assert "Infeasible" in result['status']
+
+@pytest.mark.asyncio
+async def test_solve_linear_program_overlaps_up_to_concurrency_limit(monkeypatch):
+    """
+    Tests that CBC runs off the event loop and no more than the configured number of solves overlap.
+    """
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_solve(prob, solver=None):
+        with lock:
+            running.append(prob)
+            peak.append(len(running))
+        time.sleep(0.2)
+        with lock:
+            running.remove(prob)
+        return 0
+
+    monkeypatch.setattr(core.LpProblem, "solve", slow_solve)
+    core.set_solver_concurrency(2)
+    orders_df = pl.DataFrame({
+        "width": [10], "length": [100], "quantity": [1], "type": ["A"], "component_type": ["compA"],
+    })
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticker_task = asyncio.ensure_future(ticker())
+    try:
+        await asyncio.gather(*(solve_linear_program(55, 10000, orders_df) for _ in range(4)))
+    finally:
+        ticker_task.cancel()
+        core.set_solver_concurrency(os.cpu_count() or 1)
+
+    assert max(peak) == 2
+    assert ticks > 10  # the loop kept running while CBC was busy
+
+
+def _stream_inputs(tmp_path, widths=(10, 11, 12, 13)):
+    orders = load_orders(write_order_csv(tmp_path / "order.csv", [
+        order_row(order_number=str(12180000 + i), width=str(width), quantity="500") for i, width in enumerate(widths)
+    ] + [order_row(order_number="12189999", width="95")]))
+    roll_specs = {'80': {
+        'KA125': {'R1': {'id': 'R1', 'length': 50000}, 'R2': {'id': 'R2', 'length': 40000}},
+        'CM100': {'R3': {'id': 'R3', 'length': 90000}},
+    }}
+    kwargs = dict(front="KA125", c_type="C", c="CM100", back="KA125")
+    return orders, roll_specs, kwargs
+
+
+@pytest.mark.asyncio
+async def test_stream_main_algorithm_yields_records_as_decided(tmp_path, monkeypatch):
+    """
+    Tests that the stream yields the same rows as main_algorithm, with allocations before
+    each cut and a summary last, without writing files.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders, roll_specs, kwargs = _stream_inputs(tmp_path)
+    records = [record async for record in stream_main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, **kwargs)]
+
+    orders, roll_specs, kwargs = _stream_inputs(tmp_path)
+    results = await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, output_dir="out", **kwargs)
+
+    kinds = [record["event"] for record in records]
+    assert kinds[0] == "iteration" and kinds[-1] == "summary"
+    assert kinds.index("allocation") < kinds.index("cut") < kinds.index("roll_end") < kinds.index("unplanned")
+    assert [record["row"] for record in records if record["event"] in ("cut", "unplanned")] == results
+    assert records[-1]["cuts"] == kinds.count("cut") >= 1
+    assert records[-1]["unplanned"] == kinds.count("unplanned") == len(results) - kinds.count("cut")
+    assert not os.path.exists(tmp_path / "cache")
+    assert len(list((tmp_path / "out").glob("roll_cut_results_80_*.csv"))) == 1
+    assert len(list((tmp_path / "out").glob("all_cutting_plan_summary_*.csv"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancel_kills_running_solver_process(monkeypatch):
+    """
+    Tests that cancelling kills the solver process started for the solve instead of waiting for it.
+    """
+    def slow_solve(prob, solver=None):
+        # ทำตัวเหมือน CBC: โปรเซสภายนอกที่ pulp เริ่มผ่าน coin_api.subprocess แล้วรอจนจบ
+        process = coin_api.subprocess.Popen(
+            [sys.executable, "-c", "import time; time.sleep(30)"]
+        )
+        if process.wait() != 0:
+            raise RuntimeError("solver exited with an error")
+
+    monkeypatch.setattr(core.LpProblem, "solve", slow_solve)
+    orders_df = pl.DataFrame({
+        "width": [10], "length": [100], "quantity": [1], "type": ["A"], "component_type": ["compA"],
+    })
+    token = CancellationToken()
+    asyncio.get_running_loop().call_later(0.5, token.cancel)
+
+    started = time.monotonic()
+    result = await solve_linear_program(55, 10000, orders_df, cancel_token=token)
+
+    assert result["status"] == "Cancelled"
+    assert time.monotonic() - started < 10
+
+
+
+def test_solver_subprocess_is_only_patched_while_solving():
+    assert coin_api.subprocess is subprocess
+    outer, inner = CancellationToken(), CancellationToken()
+    with outer.solving():
+        assert coin_api.subprocess is not subprocess
+        done = threading.Event()
+
+        def nested_solve():
+            with inner.solving():
+                done.set()
+
+        thread = threading.Thread(target=nested_solve)
+        thread.start()
+        thread.join()
+        assert done.is_set() and coin_api.subprocess is not subprocess
+    assert coin_api.subprocess is subprocess
+
+@pytest.mark.asyncio
+async def test_cancelled_stream_returns_partial_plan(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    orders, roll_specs, kwargs = _stream_inputs(tmp_path)
+    token = CancellationToken()
+    records = []
+    async for record in stream_main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs,
+                                              cancel_token=token, **kwargs):
+        records.append(record)
+        if record["event"] == "cut":
+            token.cancel()
+
+    kinds = [record["event"] for record in records]
+    assert kinds.count("cut") == 1 and "unplanned" not in kinds
+    assert records[-1]["cancelled"] is True and records[-1]["cuts"] == 1
+
+
+CUT_WIDTHS = (13, 26, 39, 19, 15)  # ทุกความกว้างตัดจากม้วน 80 ได้ภายในเศษที่กำหนด
+
+
+@pytest.mark.asyncio
+async def test_cancelled_run_resumes_from_checkpoint(tmp_path, monkeypatch):
+    """
+    Tests that a run cancelled after three of its five cuts resumes from its checkpoint: the plan and
+    the consumed stock match an uninterrupted run, and logged iterations are not solved again.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core, "RunCheckpoint", functools.partial(RunCheckpoint, interval=2))
+    solves = []
+    solve = core.solve_linear_program
+
+    async def counting_solve(*args, **kwargs):
+        solves.append(1)
+        return await solve(*args, **kwargs)
+
+    monkeypatch.setattr(core, "solve_linear_program", counting_solve)
+
+    orders, expected_specs, kwargs = _stream_inputs(tmp_path, CUT_WIDTHS)
+    expected = await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=expected_specs, **kwargs)
+
+    token = CancellationToken()
+    orders, roll_specs, kwargs = _stream_inputs(tmp_path, CUT_WIDTHS)
+    async for record in stream_main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs,
+                                              cancel_token=token, checkpoint_dir="ckpt", **kwargs):
+        if record["event"] == "cut" and record["iteration"] == 3:
+            token.cancel()
+    assert len(os.listdir(tmp_path / "ckpt")) == 1
+
+    solves.clear()
+    orders, roll_specs, kwargs = _stream_inputs(tmp_path, CUT_WIDTHS)
+    resumed = await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, checkpoint_dir="ckpt", **kwargs)
+
+    assert resumed == expected
+    assert roll_specs == expected_specs
+    assert len(solves) == 3  # รอบที่ 4, 5 และรอบสุดท้ายที่หาคำตอบไม่ได้
+    assert os.listdir(tmp_path / "ckpt") == []
+
+
+async def _run_until_cut(tmp_path, iteration, **kwargs):
+    """Streams a checkpointed run and cancels it after the cut of `iteration`. Returns the cut rows."""
+    token = CancellationToken()
+    orders, roll_specs, spec = _stream_inputs(tmp_path, CUT_WIDTHS)
+    rows = []
+    async for record in stream_main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, cancel_token=token,
+                                              checkpoint_dir="ckpt", **spec, **kwargs):
+        if record["event"] == "cut":
+            rows.append(record["row"])
+            if record["iteration"] == iteration:
+                token.cancel()
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_resume_interrupted_twice_cuts_each_order_once(tmp_path, monkeypatch):
+    """
+    Tests that iterations replayed from the log are not logged again, so a run interrupted
+    during its resume still gives each cut once on the next resume.
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(core, "RunCheckpoint", functools.partial(RunCheckpoint, interval=2))
+    orders, expected_specs, spec = _stream_inputs(tmp_path, CUT_WIDTHS)
+    expected = await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=expected_specs, **spec)
+
+    await _run_until_cut(tmp_path, 3)
+    rows = await _run_until_cut(tmp_path, 4)
+    assert [row["order_number"] for row in rows] == [row["order_number"] for row in expected[:4]]
+
+    orders, roll_specs, spec = _stream_inputs(tmp_path, CUT_WIDTHS)
+    resumed = await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, checkpoint_dir="ckpt", **spec)
+
+    assert [row["order_number"] for row in resumed] == [row["order_number"] for row in expected]
+    assert resumed == expected and roll_specs == expected_specs
+
+
+@pytest.mark.asyncio
+async def test_rerun_after_cancel_resumes_with_consumed_stock_and_claims(tmp_path, monkeypatch):
+    """
+    Tests the GUI path: a cancelled run is started again with the same in-memory stock
+    (already consumed) and claims registry (now holding more orders). It still finds its
+    checkpoint, restores the stock from it and ends with the same cuts and stock.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders, expected_specs, spec = _stream_inputs(tmp_path, CUT_WIDTHS)
+    expected = await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=expected_specs, **spec)
+
+    orders, roll_specs, spec = _stream_inputs(tmp_path, CUT_WIDTHS)
+    claims = OrderClaims()
+    token = CancellationToken()
+    async for record in stream_main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, claims=claims,
+                                              claim_owner="suggestion-0", cancel_token=token, checkpoint_dir="ckpt", **spec):
+        if record["event"] == "cut" and record["iteration"] == 2:
+            token.cancel()
+    assert roll_specs != expected_specs
+    claims.claim(12189999, "suggestion-1", 2.0)  # อีกรอบการคำนวณจองออเดอร์ที่ตัดไม่ได้ไประหว่างนั้น
+
+    resumed = await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, claims=claims,
+                                   claim_owner="suggestion-0", checkpoint_dir="ckpt", **spec)
+
+    assert resumed == expected[:-1]
+    assert roll_specs == expected_specs
+    assert os.listdir(tmp_path / "ckpt") == []
+
+
+def test_progress_throttle_coalesces_events():
+    """
+    Tests that events within the interval are coalesced to the newest, and stage changes pass at once.
+    """
+    now = [0.0]
+    sent = []
+    throttle = ProgressThrottle(sent.append, interval=0.25, clock=lambda: now[0])
+
+    throttle(ProgressEvent("starting"))
+    for i in range(1, 101):
+        now[0] = i * 0.01
+        throttle(ProgressEvent("planning", i, 100, 100 - i))
+    throttle.flush()
+    throttle(ProgressEvent("done", 100, 100, 0))
+
+    assert [(e.stage, e.iteration) for e in sent] == [
+        ("starting", 0), ("planning", 1), ("planning", 26), ("planning", 51), ("planning", 76), ("planning", 100), ("done", 100)
+    ]
+    assert sent[2].percent == 20 + 75 * 26 // 100 and sent[-1].percent == 100
+
+
+@pytest.mark.asyncio
+async def test_main_algorithm_reports_progress_events(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    orders, roll_specs, kwargs = _stream_inputs(tmp_path)
+    events = []
+
+    await main_algorithm(80, 10 ** 9, orders_df=orders, roll_specs=roll_specs, progress_event_callback=events.append, **kwargs)
+
+    assert events[0].stage == "starting" and events[-1].stage == "done"
+    planning = [e for e in events if e.stage == "planning"]
+    assert planning and planning[0].iteration == 1 and planning[0].total == planning[0].remaining == orders.height
+    assert all(a.elapsed <= b.elapsed for a, b in zip(events, events[1:]))
@@ -0,0 +1,71 @@
+import codecs
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import polars as pl
+import pytest
+
+import exporter
+from results_store import UNPLANNED_ROLL, ResultsStore
+
+HEADERS = ["ความกว้างม้วน", "หมายเลขออเดอร์", "เศษเหลือ", "ปริมาณตัด"]
+
+
+def result(order_number, roll_w=80, c_type='C', b_type='B', **extra):
+    return {
+        'roll_w': roll_w, 'order_number': order_number, 'order_w': 38.5, 'cuts': 2, 'trim': 3.0,
+        'order_qty': 101, 'demand_per_cut': 145.0, 'c_type': c_type, 'b_type': b_type,
+        'front': 'KA125', 'front_roll_info': "-> ใช้ม้วนต่อเนื่อง: R1 (ยาว 500 ม., เหลือ 120 ม.) + R2 (ยาว 300 ม., ใช้หมด)",
+        'c': 'CA105', 'c_roll_info': "-> (ไม่มีข้อมูลสต็อก)", 'type': 'X', **extra,
+    }
+
+
+def test_format_roll_usage_lists_each_roll():
+    frame = pl.DataFrame({"info": [
+        "-> ใช้ม้วนต่อเนื่อง: R1 (ยาว 500 ม., เหลือ 120 ม.) + R2 (ยาว 300 ม., ใช้หมด)",
+        "-> ใช้ม้วน: R 7 (ยาว 5 ม., เหลือ 1 ม.) + junk",
+        "-> (ไม่มีข้อมูลสต็อก)",
+        "-> no colon",
+        None,
+    ]})
+    assert frame.select(exporter.format_roll_usage("info"))["info"].to_list() == [
+        "ใช้ม้วนต่อเนื่อง:\n  ID: R1, ยาวเดิม: 500, ใช้ไป: 380, คงเหลือ: 120\n  ID: R2, ยาวเดิม: 300, ใช้ไป: 300, คงเหลือ: 0",
+        "ใช้ม้วน:\n  ID: R 7, ยาวเดิม: 5, ใช้ไป: 4, คงเหลือ: 1\n  (ข้อมูลไม่สมบูรณ์: junk)",
+        "(ไม่มีข้อมูลสต็อก)",
+        "-> no colon",
+        "",
+    ]
+
+
+def test_build_export_frame_per_ply_values():
+    store = ResultsStore([result(1), result(2, roll_w=UNPLANNED_ROLL, c_type='E', b_type=None)])
+    frame = exporter.build_export_frame(store.frame, HEADERS)
+
+    assert frame.columns == HEADERS + exporter.DETAIL_HEADERS
+    first, second = frame.rows(named=True)
+    assert (first["ความกว้างม้วน"], first["เศษเหลือ"], first["ปริมาณตัด"]) == ("80", "3.00", "50.50")
+    assert first["แผ่นหน้า (ใช้)"] == "100.00" and first["ลอน C (ใช้)"] == "145.00"
+    assert first["แผ่นหน้า (ID ม้วน)"].startswith("ใช้ม้วนต่อเนื่อง:\n  ID: R1")
+    assert first["ลอน C (ID ม้วน)"] == "(ไม่มีข้อมูลสต็อก)"
+    assert first["แผ่นกลาง (วัสดุ)"] == "" and first["ชนิดส่วนประกอบ"] == ""
+    assert second["ความกว้างม้วน"] == UNPLANNED_ROLL and second["แผ่นหน้า (ใช้)"] == "116.00"
+
+
+def test_write_frame_csv_in_chunks_and_parquet(tmp_path):
+    frame = exporter.build_export_frame(ResultsStore([result(i) for i in range(5)]).frame, HEADERS)
+
+    csv_path = str(tmp_path / "out" / "plan.csv")
+    exporter.write_frame(frame, csv_path, chunk_rows=2)
+    with open(csv_path, "rb") as f:
+        assert f.read(3) == codecs.BOM_UTF8
+    assert pl.read_csv(csv_path, infer_schema=False).equals(frame)
+    assert os.listdir(tmp_path / "out") == ["plan.csv"]
+
+    parquet_path = str(tmp_path / "plan.parquet")
+    exporter.write_frame(frame, parquet_path, chunk_rows=2)
+    assert pl.read_parquet(parquet_path).equals(frame)
+
+    with pytest.raises(ValueError):
+        exporter.write_frame(frame, str(tmp_path / "plan.txt"))
@@ -0,0 +1,69 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+from file_watcher import FileWatcher
+
+
+@pytest.fixture(scope="module")
+def qt_app():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+
+
+def _process_events(app, duration=0.3):
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_file_watcher_emits_on_content_change_only(qt_app, tmp_path):
+    """
+    Tests that a rewrite with identical content is skipped and a real change is reported.
+    """
+    file_path = tmp_path / "order.csv"
+    file_path.write_text("a,b\n1,2\n")
+
+    changes = []
+    watcher = FileWatcher(str(file_path), debounce_ms=50)
+    watcher.file_changed.connect(changes.append)
+    watcher.start()
+    assert changes == [str(file_path)]
+
+    # Same content, new mtime: the hash matches so nothing is emitted.
+    file_path.write_text("a,b\n1,2\n")
+    _process_events(qt_app)
+    assert len(changes) == 1
+
+    file_path.write_text("a,b\n1,2\n3,4\n")
+    _process_events(qt_app)
+    assert len(changes) == 2
+    watcher.stop()
+
+
+def test_file_watcher_reports_missing_file_once(qt_app, tmp_path):
+    """
+    Tests that a missing file is reported once and picked up when it appears.
+    """
+    file_path = tmp_path / "stock.csv"
+
+    missing = []
+    changes = []
+    watcher = FileWatcher(str(file_path), debounce_ms=50)
+    watcher.file_missing.connect(missing.append)
+    watcher.file_changed.connect(changes.append)
+    watcher.start()
+    watcher._poll()
+    _process_events(qt_app)
+    assert missing == [str(file_path)]
+
+    file_path.write_text("x\n")
+    _process_events(qt_app)
+    assert changes == [str(file_path)]
+    watcher.stop()
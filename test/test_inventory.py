@@ -0,0 +1,72 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import polars as pl
+
+from inventory import apply_stock_delta, build_roll_specs, diff_stock
+
+
+def _stock(rows):
+    return pl.DataFrame(rows, schema=["roll_number", "roll_type", "roll_size", "length"], orient="row")
+
+
+def test_build_roll_specs_keys_rolls_by_roll_number():
+    """
+    Tests that a first load builds the nested inventory keyed by roll_number.
+    """
+    stock_df = _stock([("R1", "KA125", 80, 1000), ("R2", "KA125", 80, 500), ("R3", "CM100", 90, 700)])
+
+    roll_specs = build_roll_specs(stock_df)
+
+    assert roll_specs == {
+        '80': {'KA125': {'R1': {'id': 'R1', 'length': 1000}, 'R2': {'id': 'R2', 'length': 500}}},
+        '90': {'CM100': {'R3': {'id': 'R3', 'length': 700}}},
+    }
+
+
+def test_diff_stock_applies_added_removed_changed_and_moved_rolls_in_place():
+    """
+    Tests that only changed rolls are touched and untouched rolls keep their state.
+    """
+    previous = _stock([("R1", "KA125", 80, 1000), ("R2", "KA125", 80, 500), ("R3", "CM100", 90, 700)])
+    current = _stock([("R1", "KA125", 80, 1000), ("R2", "KA125", 80, 300), ("R3", "CM100", 85, 700), ("R4", "KA125", 80, 900)])
+    roll_specs = build_roll_specs(previous)
+    untouched_roll = roll_specs['80']['KA125']['R1']
+
+    delta = diff_stock(previous, current)
+
+    assert not delta["snapshot"]
+    assert sorted(delta["added"]["roll_number"].to_list()) == ["R3", "R4"]
+    assert delta["removed"]["roll_number"].to_list() == ["R3"]
+    assert delta["changed"]["roll_number"].to_list() == ["R2"]
+
+    assert apply_stock_delta(roll_specs, delta) == 4
+    assert roll_specs['80']['KA125']['R1'] is untouched_roll
+    assert roll_specs['80']['KA125']['R2']['length'] == 300
+    assert roll_specs['80']['KA125']['R4']['length'] == 900
+    assert roll_specs['85'] == {'CM100': {'R3': {'id': 'R3', 'length': 700}}}
+    assert '90' not in roll_specs
+
+
+def test_diff_stock_without_changes_is_empty():
+    stock_df = _stock([("R1", "KA125", 80, 1000)])
+
+    delta = diff_stock(stock_df, stock_df.clone())
+
+    assert apply_stock_delta({}, delta) == 0
+
+
+def test_diff_stock_counts_missing_and_duplicate_roll_numbers_separately():
+    """
+    Tests that rows without a roll_number and rows repeating a roll_number are reported apart,
+    and the last row of a repeated roll is the one kept.
+    """
+    stock_df = _stock([("R1", "KA125", 80, 1000), ("", "KA125", 80, 200), ("R1", "KA125", 80, 800), (None, "KA125", 80, 5)])
+
+    delta = diff_stock(None, stock_df)
+
+    assert (delta["skipped"], delta["duplicates"]) == (2, 1)
+    assert delta["added"].rows() == [("R1", 80, "KA125", 800)]
+    assert diff_stock(stock_df, stock_df)["duplicates"] == 1
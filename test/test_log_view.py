@@ -0,0 +1,31 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from log_view import LogBuffer, classify_level
+
+
+def test_classify_level():
+    assert classify_level("❌ เกิดข้อผิดพลาดกับ Stock Manager") == "error"
+    assert classify_level("⚠️ ไม่พบไฟล์สต็อก") == "warning"
+    assert classify_level("  Iteration 3: Remaining orders: 4 items") == "debug"
+    assert classify_level("✅ Suggestion 1 finished with 5 results.") == "info"
+
+
+def test_log_buffer_is_bounded_and_filters_by_level():
+    """
+    Tests that only the newest lines are kept, pending lines are handed out once, and filtering keeps order.
+    """
+    buffer = LogBuffer(capacity=3)
+    for i in range(5):
+        buffer.append(f"  Iteration {i}")
+    buffer.append("⚠️ careful")
+
+    assert [message for _, message in buffer.lines] == ["  Iteration 3", "  Iteration 4", "⚠️ careful"]
+    assert len(buffer.take_pending()) == 3 and buffer.take_pending() == []
+    assert LogBuffer.filter(buffer.lines, "warning") == ["⚠️ careful"]
+    assert LogBuffer.filter(buffer.lines, "debug") == ["  Iteration 3", "  Iteration 4", "⚠️ careful"]
+
+    buffer.append("done", level="error")
+    assert buffer.take_pending() == [("error", "done")]
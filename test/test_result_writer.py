@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import polars as pl
+import pytest
+
+from result_writer import ResultWriter, new_run_id, prune_run_files
+
+
+def test_writer_writes_in_background_and_flushes(tmp_path):
+    with ResultWriter("parquet", max_pending=1) as writer:
+        paths = [writer.submit(str(tmp_path / f"part_{i}"), [{'order_number': i, 'trim': 1.5}]) for i in range(3)]
+        writer.flush()
+        assert sorted(writer.written) == sorted(paths)
+        assert pl.read_parquet(paths[2])["order_number"].to_list() == [2]
+
+    assert sorted(os.listdir(tmp_path)) == ["part_0.parquet", "part_1.parquet", "part_2.parquet"]
+    with pytest.raises(RuntimeError):
+        writer.submit(str(tmp_path / "late"), [])
+    assert new_run_id() != new_run_id()
+
+
+def test_write_error_is_raised_on_flush(tmp_path):
+    (tmp_path / "blocked").write_text("a file, not a directory")
+    writer = ResultWriter()
+    writer.submit(str(tmp_path / "blocked" / "plan"), [{'order_number': 1}])
+    with pytest.raises(OSError):
+        writer.flush()
+    writer.submit(str(tmp_path / "plan"), [{'order_number': 1}])
+    writer.close()
+    assert writer.written == [str(tmp_path / "plan.csv")]
+
+
+def test_prune_run_files_keeps_the_latest_runs(tmp_path):
+    runs = ["20250801-101500-11-aaaaaa", "20250801-101501-12-bbbbbb", "20250802-090000-13-cccccc"]
+    for run_id in runs:
+        (tmp_path / f"roll_cut_results_75_{run_id}.csv").write_text("")
+        (tmp_path / f"all_cutting_plan_summary_{run_id}.parquet").write_text("")
+    (tmp_path / "all_cutting_plan_summary.csv").write_text("")
+    (tmp_path / "nightly_plan.csv").write_text("")
+
+    removed = prune_run_files(str(tmp_path), keep=2)
+
+    assert sorted(os.path.basename(path) for path in removed) == [
+        f"all_cutting_plan_summary_{runs[0]}.parquet", f"roll_cut_results_75_{runs[0]}.csv",
+    ]
+    assert len(os.listdir(tmp_path)) == 6
+    assert prune_run_files(str(tmp_path / "missing")) == []
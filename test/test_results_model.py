@@ -0,0 +1,61 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from PyQt5.QtCore import QCoreApplication, Qt
+
+from results_model import DUPLICATE_COLOR, INVALID_COLOR, ResultsTableModel
+
+
+@pytest.fixture(scope="module")
+def qt_app():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+
+
+def row(order_number, trim, roll_w=80):
+    return {'roll_w': roll_w, 'order_number': order_number, 'cuts': 2, 'order_qty': 100, 'trim': trim}
+
+
+def background(model, view_row):
+    return model.data(model.index(view_row, 0), Qt.BackgroundRole)
+
+
+def test_append_updates_best_trim_incrementally(qt_app):
+    """
+    Tests that a better result demotes the earlier best of the same order, and only that row changes.
+    """
+    model = ResultsTableModel(["ความกว้างม้วน", "หมายเลขออเดอร์", "ปริมาณตัด"])
+    changed = []
+    model.dataChanged.connect(lambda top, bottom, roles: changed.append((top.row(), bottom.row())))
+
+    model.append([row(1, 3.0), row(2, 2.0)])
+    model.append([row(1, 1.5, roll_w=90), row(2, 2.0, roll_w=90)])
+
+    assert model.rowCount() == 4
+    assert model.data(model.index(2, 0)) == "90" and model.data(model.index(2, 2)) == "50.00"
+    assert [background(model, r) for r in range(4)] == [DUPLICATE_COLOR, None, None, DUPLICATE_COLOR]
+    assert changed == [(0, 0)]
+
+
+def test_hidden_unprocessed_rows_sort_and_clear(qt_app):
+    model = ResultsTableModel(["ความกว้างม้วน", "หมายเลขออเดอร์"])
+    model.append([row(1, 2.0, roll_w=90), row(3, 0, roll_w="Failed/Infeasible"), row(2, 1.0, roll_w=80)])
+    assert background(model, 1) == INVALID_COLOR
+
+    model.set_show_unprocessed(False)
+    assert model.rowCount() == 2 and model.row_at(1)['order_number'] == 2
+    model.append([row(1, 1.0, roll_w=70), row(4, 0, roll_w="Failed/Infeasible")])
+    assert model.rowCount() == 3 and len(model.store) == 5
+    assert background(model, 0) == DUPLICATE_COLOR
+
+    model.sort_by("roll_w")
+    assert [model.row_at(r)['roll_w'] for r in range(model.rowCount())] == [70, 80, 90]
+    assert [background(model, r) for r in range(3)] == [None, None, DUPLICATE_COLOR]
+    model.set_show_unprocessed(True)
+    assert [model.row_at(r)['order_number'] for r in range(model.rowCount())] == [1, 2, 1, 3, 4]
+
+    model.clear()
+    assert model.rowCount() == 0 and len(model.store) == 0
@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from results_store import UNPLANNED_ROLL, ResultsStore
+
+
+def cut(order_number, roll_w, trim, **extra):
+    return {'roll_w': roll_w, 'order_number': order_number, 'cuts': 2.0, 'trim': trim, **extra}
+
+
+def unplanned(order_number):
+    return {'roll_w': UNPLANNED_ROLL, 'order_number': order_number, 'cuts': 0, 'trim': 0, 'die_cut': 'N'}
+
+
+def test_append_batches_keeps_rows_and_best_index():
+    store = ResultsStore()
+    assert store.append([cut(1, 90, 3.0), unplanned(2)]) == []
+    demoted = store.append([cut(1, 80, 1.0, factory='1'), cut(3, 80, None)])
+
+    assert demoted == [0]
+    assert len(store) == 4
+    assert store.row(1) == {'roll_w': UNPLANNED_ROLL, 'order_number': 2, 'cuts': 0.0, 'trim': 0.0, 'die_cut': 'N'}
+    assert store.row(2) == {'roll_w': 80, 'order_number': 1, 'cuts': 2.0, 'trim': 1.0, 'factory': '1'}
+    assert store.best_positions == {1, 2}  # trim ที่ไม่มีค่าไม่นับเป็นผลดีที่สุด
+    assert store.positions(planned_only=True) == [0, 2, 3]
+    assert store.positions(roll_w=80) == [2, 3]
+
+
+def test_best_plan_and_export_frame():
+    store = ResultsStore([unplanned(1), cut(1, 90, 3.0), cut(1, 80, 2.0), cut(2, 80, 4.0), unplanned(3), unplanned(3)])
+
+    plan = store.best_plan()
+    exported = ResultsStore.export_frame(plan)
+
+    assert [(r['order_number'], r['roll_w']) for r in store.rows(plan)] == [(1, 80), (2, 80), (3, UNPLANNED_ROLL)]
+    assert exported["roll_w"].to_list() == ["80", "80", UNPLANNED_ROLL]
+    assert not any(column.startswith("_") for column in exported.columns)
+
+    store.sort("roll_w")
+    assert [r['roll_w'] for r in store.rows()] == [80, 80, 90, UNPLANNED_ROLL, UNPLANNED_ROLL, UNPLANNED_ROLL]
+    assert store.best_positions == {1, 3, 4}  # แถว unplanned ของออเดอร์ 1 มีเศษ 0 จึงนับเป็นผลดีที่สุด
+
+
+def test_index_over_many_small_batches_matches_full_rebuild():
+    """
+    Tests that the best index built one small batch at a time equals the one built by sort()
+    over the whole store, including ties on trim (the earlier row wins).
+    """
+    store = ResultsStore()
+    for i in range(60):
+        store.append([cut(i % 7, 80, float((i * 5) % 4)), cut((i + 3) % 7, 90, None)])
+    incremental = {store.row(p)['order_number']: p for p in store.best_positions}
+
+    rows = list(store.rows())
+    expected = {}
+    for position, row in enumerate(rows):
+        trim = row.get('trim')
+        if trim is not None and (row['order_number'] not in expected or trim < rows[expected[row['order_number']]]['trim']):
+            expected[row['order_number']] = position
+
+    assert incremental == expected
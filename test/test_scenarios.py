@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+
+from scenarios import run_scenarios, scenario_grid
+from test_scheduler import make_orders, make_roll_specs
+
+
+def test_scenario_grid():
+    assert scenario_grid(max_trim=[4, 5], max_cuts=[6]) == [{"max_trim": 4, "max_cuts": 6}, {"max_trim": 5, "max_cuts": 6}]
+    with pytest.raises(ValueError):
+        scenario_grid(trim=[1])
+
+
+def test_run_scenarios_compares_parameter_sets(tmp_path, monkeypatch):
+    """
+    Tests that each scenario plans the same orders against its own stock and is summarized in order.
+    """
+    monkeypatch.chdir(tmp_path)
+    roll_specs = make_roll_specs()
+    scenarios = [{}, {"max_trim": 0.5, "min_trim": 0}]
+
+    table = run_scenarios(scenarios, make_orders(tmp_path), roll_specs, max_workers=2)
+
+    assert table["scenario"].to_list() == ["default", "max_trim=0.5, min_trim=0"]
+    assert table["max_trim"].to_list() == [5, 0.5]
+    default, strict = table.to_dicts()
+    assert default["planned_orders"] + default["unplanned_orders"] == 12
+    assert default["planned_orders"] > strict["planned_orders"]
+    assert default["rolls_opened"] > 0 and default["seconds"] >= 0
+    assert roll_specs == make_roll_specs()  # the caller's stock is not consumed
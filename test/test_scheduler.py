@@ -0,0 +1,206 @@
+import asyncio
+import copy
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from cancellation import CancellationToken
+from cleaning import load_orders
+import polars as pl
+
+from scheduler import (best_trim_plan, group_independent_suggestions, predict_runtime, run_factories_parallel, run_suggestion_group,
+                       run_suggestions_async, run_suggestions_parallel)
+from test_cleaning import order_row, write_order_csv
+
+
+def make_orders(tmp_path):
+    rows = [order_row(order_number=str(12180000 + i), width=str(10 + i % 4), quantity="500") for i in range(6)]
+    rows += [order_row(order_number=str(12181000 + i), width=str(12 + i % 3), quantity="500",
+                       front="KB150", c="CA105", back="KB150") for i in range(6)]
+    return load_orders(write_order_csv(tmp_path / "order.csv", rows))
+
+
+def make_roll_specs():
+    return {
+        '80': {
+            'KA125': {'R1': {'id': 'R1', 'length': 50000}, 'R2': {'id': 'R2', 'length': 40000}},
+            'CM100': {'R3': {'id': 'R3', 'length': 90000}},
+        },
+        '90': {
+            'KB150': {'R4': {'id': 'R4', 'length': 50000}, 'R5': {'id': 'R5', 'length': 40000}},
+            'CA105': {'R6': {'id': 'R6', 'length': 90000}},
+        },
+    }
+
+
+def suggestion(width, front, c, back):
+    return {'width': width, 'spec': {'front': front, 'c': c, 'middle': '', 'b': '', 'back': back}, 'length': 10 ** 9}
+
+
+def test_group_independent_suggestions_merges_conflicts(tmp_path):
+    """
+    Tests that suggestions sharing orders or a stock bucket are grouped, and others are not.
+    """
+    orders = make_orders(tmp_path)
+    suggestions = [
+        suggestion('80', 'KA125', 'CM100', 'KA125'),
+        suggestion('90', 'KB150', 'CA105', 'KB150'),
+        suggestion('80', 'KA12', 'CM100', 'KA125'),  # same orders as the first one
+    ]
+
+    groups = group_independent_suggestions(suggestions, orders)
+
+    assert groups == [[0, 2], [1]]
+
+
+def test_run_suggestions_parallel_matches_sequential(tmp_path, monkeypatch):
+    """
+    Tests that the process pool yields the same results and remaining stock as a sequential run.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders = make_orders(tmp_path)
+    suggestions = [
+        suggestion('80', 'KA125', 'CM100', 'KA125'),
+        suggestion('90', 'KB150', 'CA105', 'KB150'),
+        suggestion('80', 'KA12', 'CM100', 'KA125'),
+    ]
+
+    sequential_specs = make_roll_specs()
+    sequential = run_suggestion_group(copy.deepcopy(suggestions), orders, sequential_specs)["results"]
+
+    parallel_specs = make_roll_specs()
+    reported = []
+    parallel = run_suggestions_parallel(suggestions, orders, parallel_specs, max_workers=2,
+                                        on_result=lambda idx, _: reported.append(idx))
+
+    assert [idx for idx, _ in parallel] == reported == [0, 1, 2]
+    assert parallel == sequential
+    assert parallel_specs == sequential_specs
+    assert parallel[2][1] == []  # orders already planned by suggestion 0 are skipped
+
+
+def test_cancelled_parallel_runs_shut_down_without_planning(tmp_path, monkeypatch):
+    """
+    Tests that a cancelled token reaches the pool tasks: groups and factories stop before planning
+    and the pools shut down, leaving the stock untouched.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders = make_orders(tmp_path)
+    suggestions = [suggestion('80', 'KA125', 'CM100', 'KA125'), suggestion('90', 'KB150', 'CA105', 'KB150')]
+    token = CancellationToken()
+    token.cancel()
+
+    roll_specs = make_roll_specs()
+    assert run_suggestions_parallel(suggestions, orders, roll_specs, max_workers=2, cancel_token=token) == []
+    assert roll_specs == make_roll_specs()
+
+    stock = pl.DataFrame({
+        "factory": ["1", "2"], "roll_number": ["R1", "R3"], "roll_type": ["KA125", "CM100"],
+        "roll_size": [80, 80], "length": [50000, 90000],
+    })
+    plans = run_factories_parallel(orders, stock, factories=("1", "2"), max_workers=2, cancel_token=token)
+    assert [plan["results"] for plan in plans.values()] == [[], []]
+
+
+def test_predict_runtime_scales_with_history():
+    """
+    Tests that recorded runtimes for the same roll width correct the default estimate.
+    """
+    default = predict_runtime(100, '80')
+    history = [{"order_count": 100, "roll_width": '80', "seconds": default * 4},
+               {"order_count": 100, "roll_width": '90', "seconds": default / 2},
+               {"order_count": 100, "roll_width": '90', "seconds": default * 2}]
+
+    assert predict_runtime(0, '80', history) == 0.0
+    assert predict_runtime(400, '80') > predict_runtime(100, '80')
+    assert abs(predict_runtime(100, '80', history) - default * 4) < 1e-9
+    assert abs(predict_runtime(100, '70', history) - default * 2) < 1e-9  # median over all widths
+
+
+def test_run_suggestions_parallel_dispatches_longest_first(tmp_path, monkeypatch):
+    """
+    Tests that groups run longest-first and suggestions without unclaimed orders are skipped,
+    while results are still reported in suggestion order.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders = make_orders(tmp_path)
+    suggestions = [
+        suggestion('80', 'KA125', 'CM100', 'KA125'),
+        suggestion('90', 'KB150', 'CA105', 'KB150'),
+        suggestion('80', 'KX999', 'CM100', 'KA125'),  # matches no orders
+    ]
+    history = [{"order_count": 6, "roll_width": '90', "seconds": 100.0},
+               {"order_count": 6, "roll_width": '80', "seconds": 0.01}]
+    finished = []
+
+    results = run_suggestions_parallel(
+        suggestions, orders, make_roll_specs(), max_workers=1,
+        on_result=lambda idx, _: finished.append(idx), history=history,
+    )
+
+    assert finished == [0, 1, 2]
+    assert results[2] == (2, [])
+    assert [t["roll_width"] for t in history[2:]] == ['90', '80']
+
+
+def test_run_suggestions_async_matches_sequential(tmp_path, monkeypatch):
+    """
+    Tests that groups sharing one event loop give the same results and stock as a sequential run.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders = make_orders(tmp_path)
+    suggestions = [
+        suggestion('80', 'KA125', 'CM100', 'KA125'),
+        suggestion('90', 'KB150', 'CA105', 'KB150'),
+        suggestion('80', 'KA12', 'CM100', 'KA125'),
+    ]
+    sequential_specs = make_roll_specs()
+    sequential = run_suggestion_group(copy.deepcopy(suggestions), orders, sequential_specs)["results"]
+
+    async_specs = make_roll_specs()
+    concurrent = asyncio.run(run_suggestions_async(suggestions, orders, async_specs))
+
+    assert concurrent == sequential
+    assert async_specs == sequential_specs
+
+
+def test_run_factories_parallel_plans_each_factory_separately(tmp_path, monkeypatch):
+    """
+    Tests that each factory plans its own orders against its own stock, in separate processes.
+    """
+    monkeypatch.chdir(tmp_path)
+    orders = make_orders(tmp_path)
+    stock = pl.DataFrame({
+        "factory": ["1", "1", "1", "2"],
+        "roll_number": ["R1", "R2", "R3", "R4"],
+        "roll_type": ["KA125", "KA125", "CM100", "KA125"],
+        "roll_size": [80, 80, 80, 80],
+        "length": [50000, 40000, 90000, 50000],
+    })
+
+    plans = run_factories_parallel(orders, stock, factories=("1", "2", "3"), max_workers=3)
+
+    assert list(plans) == ["1", "2", "3"]
+    assert plans["1"]["orders"] == plans["2"]["orders"] == 12
+    assert plans["1"]["results"] and {r["order_number"] for r in plans["1"]["results"]} <= set(range(12180000, 12182000))
+    assert plans["2"]["results"] == []  # no CM100 rolls in factory 2
+    assert plans["3"]["orders"] == 0 and plans["3"]["results"] == []
+    assert os.path.isdir(tmp_path / "cache" / "factory_1")
+
+
+def test_best_trim_plan_keeps_lowest_trim_per_order():
+    failed = {'roll_w': "Failed/Infeasible", 'trim': 0}
+    rows = [
+        {**failed, 'order_number': 1},
+        {'roll_w': 90, 'order_number': 1, 'trim': 3.0},
+        {'roll_w': 80, 'order_number': 1, 'trim': 2.0},
+        {'roll_w': 80, 'order_number': 2, 'trim': 4.0},
+        {**failed, 'order_number': 3},
+        {**failed, 'order_number': 3},
+    ]
+
+    plan = best_trim_plan(rows)
+
+    assert [(r['order_number'], r['roll_w']) for r in plan] == [(1, 80), (2, 80), (3, "Failed/Infeasible")]
@@ -0,0 +1,153 @@
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import service
+from test_cleaning import ORDER_HEADER, order_row
+
+
+def plan_request(**overrides):
+    orders = [dict(zip(ORDER_HEADER, order_row(order_number=str(12180000 + i), width=str(10 + i % 4))))
+              for i in range(6)]
+    stock = [
+        {"roll_number": "R1", "roll_type": "KA125", "roll_size": "80", "length": "50000"},
+        {"roll_number": "R2", "roll_type": "KA125", "roll_size": "80", "length": "40000"},
+        {"roll_number": "R3", "roll_type": "CM100", "roll_size": "80", "length": "90000"},
+    ]
+    return {"orders": orders, "stock": stock, **overrides}
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    jobs = service.PlanningJobs(max_workers=1, max_jobs=1)
+    monkeypatch.setattr(service, "jobs", jobs)
+    yield TestClient(service.app)
+    jobs.shutdown()
+
+
+def _wait_for(client, job_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.get(f"/jobs/{job_id}").json()
+        if status["status"] in statuses:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not reach {statuses}")
+
+
+def test_job_runs_and_returns_results(client):
+    response = client.post("/jobs", json=plan_request())
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    status = _wait_for(client, job_id, ("done", "failed"))
+
+    assert status["status"] == "done", status["error"]
+    assert status["orders"] == 6 and status["suggestions"] == 1
+    results = client.get(f"/jobs/{job_id}/result").json()["results"]
+    assert {r["order_number"] for r in results} == set(range(12180000, 12180006))
+    assert len(results) == status["result_count"]
+
+
+def test_events_stream_cut_rows_as_server_sent_events(client):
+    job_id = client.post("/jobs", json=plan_request()).json()["job_id"]
+
+    events = []
+    with client.stream("GET", f"/jobs/{job_id}/events") as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        for line in response.iter_lines():
+            if line.startswith("data: "):
+                events.append(json.loads(line[len("data: "):]))
+
+    kinds = [event["event"] for event in events]
+    assert kinds[0] == "loaded" and kinds[-1] == "end"
+    assert events[-1]["status"] == "done"
+    assert "iteration" in kinds and "suggestion" in kinds
+    cut_rows = [event["row"] for event in events if event["event"] in ("cut", "unplanned")]
+    assert cut_rows == client.get(f"/jobs/{job_id}/result").json()["results"]
+
+    # a client reconnecting with Last-Event-ID only receives what follows
+    with client.stream("GET", f"/jobs/{job_id}/events", headers={"Last-Event-ID": str(len(events) - 2)}) as response:
+        resumed = [line for line in response.iter_lines() if line.startswith("event: ")]
+    assert resumed == ["event: end"]
+
+
+def _stream_ids(client, job_id, headers=None):
+    with client.stream("GET", f"/jobs/{job_id}/events", headers=headers or {}) as response:
+        return [int(line[len("id: "):]) for line in response.iter_lines() if line.startswith("id: ")]
+
+
+def test_events_kept_per_job_are_capped(client, monkeypatch):
+    monkeypatch.setattr(service, "JOB_EVENT_BUFFER", 4)
+    monkeypatch.setattr(service, "JOB_EVENT_HISTORY", 1)
+    first = client.post("/jobs", json=plan_request()).json()["job_id"]
+    _wait_for(client, first, ("done",))
+    while not service.jobs._jobs[first]["events_closed"]:
+        time.sleep(0.05)  # รอเธรดส่งต่อเหตุการณ์ที่เหลือ
+    count = client.get(f"/jobs/{first}").json()["event_count"]
+    assert count > 4
+
+    # only the last 4 events are kept, still numbered from the job's first event
+    ids = _stream_ids(client, first)
+    assert ids == list(range(count - 4, count + 1))
+    assert _stream_ids(client, first, {"Last-Event-ID": "0"}) == ids
+    assert _stream_ids(client, first, {"Last-Event-ID": str(count - 2)}) == [count - 1, count]
+
+    # once a newer job finishes, the older one drops its events but keeps its result
+    second = client.post("/jobs", json=plan_request()).json()["job_id"]
+    _wait_for(client, second, ("done",))
+    assert len(service.jobs._jobs[first]["events"]) == 0
+    assert client.get(f"/jobs/{first}").json()["event_count"] == count
+    assert _stream_ids(client, first) == [count]
+    assert client.get(f"/jobs/{first}/result").status_code == 200
+
+
+def test_full_queue_answers_429_and_cancel_frees_it(client):
+    """
+    Tests backpressure: a full queue is refused with Retry-After until its job is cancelled.
+    """
+    job_id = client.post("/jobs", json=plan_request()).json()["job_id"]
+
+    refused = client.post("/jobs", json=plan_request())
+    assert refused.status_code == 429
+    assert refused.headers["Retry-After"] == str(service.RETRY_AFTER_SECONDS)
+
+    assert client.delete(f"/jobs/{job_id}").json()["status"] in ("cancelling", "cancelled")
+    _wait_for(client, job_id, ("cancelled",))
+    result = client.get(f"/jobs/{job_id}/result")
+    if result.status_code == 200:  # ยกเลิกระหว่างคำนวณ ได้ผลบางส่วน
+        assert result.json()["cancelled"] is True
+    else:
+        assert result.status_code == 409  # ยกเลิกก่อนเริ่ม
+    assert client.post("/jobs", json=plan_request()).status_code == 202
+
+
+def test_cancel_queued_job(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    jobs = service.PlanningJobs(max_workers=1, max_jobs=3)
+    try:
+        running = jobs.submit(plan_request())["job_id"]
+        queued = jobs.submit(plan_request())["job_id"]
+        queued_later = jobs.submit(plan_request())["job_id"]
+
+        assert jobs.cancel(queued_later)["status"] in ("cancelled", "cancelling")
+        assert jobs.cancel(running)["status"] in ("cancelled", "cancelling")
+        assert jobs.active_count() <= 2
+        assert queued in {job["job_id"] for job in jobs.list()}
+    finally:
+        jobs.shutdown()
+    assert jobs.status(queued_later)["status"] == "cancelled"
+
+
+def test_invalid_requests(client):
+    assert client.post("/jobs", json={"orders": []}).status_code == 422
+    assert client.post("/jobs", json=plan_request(planning_params={"max_cut": 4})).status_code == 422
+    assert client.get("/jobs/missing").status_code == 404
@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import polars as pl
+
+from shared_data import SharedFrames, attach, attach_roll_specs
+
+
+def _sum_widths(handle):
+    return attach(handle, "orders")["width"].sum()
+
+
+def test_published_frames_attach_in_worker_processes(tmp_path):
+    """
+    Tests that workers read the published frame by handle, and close() removes it.
+    """
+    orders = pl.DataFrame({"order_number": [1, 2, 3], "width": [10.5, 12.0, 13.5]})
+    with SharedFrames(base_dir=str(tmp_path)) as shared:
+        handle = shared.publish("orders", orders)
+        with multiprocessing.get_context("spawn").Pool(2) as pool:
+            sums = pool.map(_sum_widths, [handle, handle])
+
+        assert sums == [36.0, 36.0]
+        assert attach(handle, "orders").equals(orders)
+    assert not os.path.exists(handle["orders"])
+
+
+def test_published_roll_specs_round_trip(tmp_path):
+    roll_specs = {
+        '80': {'KA125': {'R1': {'id': 'R1', 'length': 50000}, 'R2': {'id': 'R2', 'length': 39999.5}}},
+        '90': {'CM100': {'R3': {'id': 'R3', 'length': 90000}}},
+    }
+    with SharedFrames(base_dir=str(tmp_path)) as shared:
+        handle = shared.publish_roll_specs(roll_specs)
+
+        assert attach_roll_specs(handle) == roll_specs
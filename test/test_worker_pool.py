@@ -0,0 +1,115 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+import core
+from checkpoint import CHECKPOINT_DIR
+from worker_pool import MessageBatch, WorkerPool
+
+
+@pytest.fixture(scope="module")
+def qt_app():
+    app = QCoreApplication.instance() or QCoreApplication([])
+    yield app
+
+
+def _wait_until(app, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    return condition()
+
+
+def test_worker_pool_reuses_thread_and_event_loop(qt_app, monkeypatch):
+    """
+    Tests that queued jobs run one after another on the same thread and event loop.
+    """
+    seen = []
+    checkpoint_dirs = []
+
+    async def fake_main_algorithm(progress_callback=None, **kwargs):
+        progress_callback("⚙️ กำลังเริ่มการคำนวณ")
+        seen.append((threading.get_ident(), id(asyncio.get_running_loop())))
+        checkpoint_dirs.append(kwargs["checkpoint_dir"])
+        return [{"order_number": kwargs["roll_width"]}]
+
+    monkeypatch.setattr(core, "main_algorithm", fake_main_algorithm)
+    pool = WorkerPool(size=1)
+    finished, progress, idle, logged = [], [], [], []
+    pool.job_messages.connect(lambda job_id, messages: logged.append((job_id, messages)))
+    pool.job_finished.connect(lambda job_id, results: finished.append((job_id, results)))
+    pool.job_progress.connect(lambda job_id, value, message: progress.append((job_id, value)))
+    pool.idle.connect(lambda: idle.append(True))
+
+    first = pool.submit(roll_width=80)
+    second = pool.submit(roll_width=90)
+
+    assert _wait_until(qt_app, lambda: idle)
+    assert finished == [(first, [{"order_number": 80}]), (second, [{"order_number": 90}])]
+    assert logged == [(first, ["⚙️ กำลังเริ่มการคำนวณ"]), (second, ["⚙️ กำลังเริ่มการคำนวณ"])]
+    assert (first, 100) in progress and (second, 100) in progress
+    assert len(set(seen)) == 1 and seen[0][0] != threading.get_ident()
+    assert checkpoint_dirs == [CHECKPOINT_DIR, CHECKPOINT_DIR]  # so a rerun of the same suggestion resumes
+    assert pool.shutdown()
+
+
+def test_worker_pool_cancel_all(qt_app, monkeypatch):
+    """
+    Tests that cancel_all drops queued jobs and stops the running one with its partial results.
+    """
+    started = threading.Event()
+    lines = []
+
+    async def slow_main_algorithm(progress_callback=None, cancel_token=None, **kwargs):
+        started.set()
+        while not cancel_token.cancelled:
+            progress_callback("  Iteration 1: Remaining orders: 1 items")
+            lines.append(1)
+            await asyncio.sleep(0.01)
+        return [{"order_number": 1}]
+
+    monkeypatch.setattr(core, "main_algorithm", slow_main_algorithm)
+    pool = WorkerPool(size=1)
+    cancelled, finished, batches = [], [], []
+    pool.job_messages.connect(lambda job_id, messages: batches.append(messages))
+    pool.job_cancelled.connect(lambda job_id, results: cancelled.append((job_id, results)))
+    pool.job_finished.connect(lambda job_id, results: finished.append(job_id))
+
+    running = pool.submit(roll_width=80)
+    pool.submit(roll_width=90)
+    assert started.wait(5)
+    time.sleep(0.5)
+    pool.cancel_all()
+
+    assert _wait_until(qt_app, lambda: not pool.is_busy())
+    assert cancelled == [(running, [{"order_number": 1}])]
+    assert finished == []
+    # one signal per throttle interval, not one per line, and no line is lost
+    assert sum(len(batch) for batch in batches) == len(lines) > len(batches)
+    assert pool.shutdown()
+
+
+def test_message_batch_sends_lines_at_throttle_cadence():
+    now = [0.0]
+    sent = []
+    batch = MessageBatch(sent.append, interval=0.25, clock=lambda: now[0])
+
+    batch.append("a")  # the first line goes out at once
+    batch.append("b")
+    now[0] = 0.1
+    batch.append("c")
+    now[0] = 0.3
+    batch.append("d")
+    batch.append("e")
+    batch.flush()
+    batch.flush()
+
+    assert sent == [["a"], ["b", "c", "d"], ["e"]]
@@ -0,0 +1,207 @@
+import asyncio
+import collections
+import itertools
+import time
+from typing import Callable, List
+
+from PyQt5.QtCore import QObject, Qt, QThread, pyqtSignal, pyqtSlot
+
+import core
+from cancellation import CancellationToken
+from checkpoint import CHECKPOINT_DIR
+
+
+class MessageBatch:
+    """
+    Collects the log lines of a job and hands them on as one list at most once per
+    `interval` seconds (the cadence of core.ProgressThrottle), so a run that logs several
+    lines per iteration sends a few signals per second instead of one per line.
+    flush() hands on the lines still held.
+    """
+
+    def __init__(self, callback: Callable[[List[str]], None], interval: float = core.PROGRESS_INTERVAL,
+                 clock: Callable[[], float] = time.monotonic):
+        self.callback = callback
+        self.interval = interval
+        self.clock = clock
+        self._lines = []
+        self._last_sent = None
+
+    def append(self, message: str) -> None:
+        self._lines.append(message)
+        now = self.clock()
+        if self._last_sent is None or now - self._last_sent >= self.interval:
+            self._send(now)
+
+    def flush(self) -> None:
+        if self._lines:
+            self._send(self.clock())
+
+    def _send(self, now: float) -> None:
+        lines, self._lines = self._lines, []
+        self._last_sent = now
+        self.callback(lines)
+
+
+class PlanningWorker(QObject):
+    """
+    รัน main_algorithm ในเธรดถาวรหนึ่งเธรด โดยใช้ event loop เดียวตลอดอายุของเธรด
+    งานถูกส่งเข้ามาผ่านสัญญาณ จึงทำงานในเธรดของ worker เสมอ
+    ทุกงานบันทึก checkpoint ไว้ใน checkpoint_dir งานที่ถูกหยุดหรือปิดโปรแกรมกลางทาง
+    จะทำต่อจากจุดเดิมเมื่อสั่งคำแนะนำเดิมซ้ำ (ดู core.stream_main_algorithm)
+    """
+    job_messages = pyqtSignal(int, list)  # job_id, บรรทัด log ที่สะสมไว้ (ดู MessageBatch)
+    job_progress = pyqtSignal(int, int, str)
+    job_finished = pyqtSignal(int, list)
+    job_failed = pyqtSignal(int, str)
+    job_cancelled = pyqtSignal(int, list)  # job_id, ผลลัพธ์บางส่วนที่คำนวณได้ก่อนหยุด
+    _job_requested = pyqtSignal(int, object)
+
+    def __init__(self, checkpoint_dir: str = CHECKPOINT_DIR, parent=None):
+        super().__init__(parent)
+        self.checkpoint_dir = checkpoint_dir
+        self._loop = None
+        self._cancel_token = CancellationToken()
+        self._job_requested.connect(self._run_job)
+
+    def request_job(self, job_id: int, kwargs: dict):
+        """ส่งงานให้ worker (เรียกจากเธรดใดก็ได้)"""
+        self._cancel_token = CancellationToken()
+        self._job_requested.emit(job_id, kwargs)
+
+    def cancel(self):
+        """หยุดงานที่กำลังทำทันที (ปิดโปรเซส CBC ที่กำลังคำนวณ) ผลลัพธ์ที่ได้แล้วส่งไปกับ job_cancelled"""
+        self._cancel_token.cancel()
+
+    @pyqtSlot()
+    def close(self):
+        """ปิด event loop ภายในเธรดของ worker ก่อนที่เธรดจะจบ"""
+        if self._loop is not None:
+            self._loop.close()
+            self._loop = None
+
+    @pyqtSlot(int, object)
+    def _run_job(self, job_id: int, kwargs: dict):
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+        cancel_token = self._cancel_token
+        # ส่ง log เป็นชุดตามจังหวะเดียวกับโปรเกรสบาร์ แทนหนึ่งสัญญาณต่อบรรทัด
+        messages = MessageBatch(lambda lines: self.job_messages.emit(job_id, lines))
+
+        def progress_event_callback(event: core.ProgressEvent):
+            # main_algorithm ส่งมาไม่เกินไม่กี่ครั้งต่อวินาที (ProgressThrottle)
+            self.job_progress.emit(job_id, event.percent, event.describe())
+
+        try:
+            results = self._loop.run_until_complete(
+                core.main_algorithm(progress_callback=messages.append, progress_event_callback=progress_event_callback,
+                                    cancel_token=cancel_token, **{"checkpoint_dir": self.checkpoint_dir, **kwargs})
+            )
+        except Exception as e:
+            messages.flush()
+            if cancel_token.cancelled:
+                self.job_cancelled.emit(job_id, [])
+            else:
+                self.job_progress.emit(job_id, 0, "❌ เกิดข้อผิดพลาด!")  # รีเซ็ตโปรเกรสบาร์เมื่อเกิดข้อผิดพลาด
+                self.job_failed.emit(job_id, f"Error: {str(e)}")
+            return
+        messages.flush()
+        if cancel_token.cancelled:
+            self.job_cancelled.emit(job_id, results)
+            return
+        self.job_progress.emit(job_id, 100, "✅ เสร็จสิ้น")
+        self.job_finished.emit(job_id, results)
+
+
+class WorkerPool(QObject):
+    """
+    กลุ่ม PlanningWorker ที่ทำงานตลอดอายุของโปรแกรม พร้อมคิวงาน
+    แทนการสร้าง QThread และ event loop ใหม่สำหรับทุกคำแนะนำ
+    สัญญาณทั้งหมดถูกส่งในเธรดที่สร้าง pool (เธรด UI)
+    """
+    job_messages = pyqtSignal(int, list)
+    job_progress = pyqtSignal(int, int, str)  # job_id, เปอร์เซ็นต์, ข้อความ
+    job_finished = pyqtSignal(int, list)
+    job_failed = pyqtSignal(int, str)
+    job_cancelled = pyqtSignal(int, list)
+    idle = pyqtSignal()  # ไม่มีงานในคิวและไม่มีงานที่กำลังทำ
+
+    def __init__(self, size: int = 1, parent=None, checkpoint_dir: str = CHECKPOINT_DIR):
+        super().__init__(parent)
+        self._job_ids = itertools.count(1)
+        self._queue = collections.deque()
+        self._threads = []
+        self._idle_workers = collections.deque()
+        self._running = {}  # job_id -> worker
+
+        for _ in range(max(1, size)):
+            thread = QThread()
+            worker = PlanningWorker(checkpoint_dir)
+            worker.moveToThread(thread)
+            worker.job_messages.connect(self.job_messages)
+            worker.job_progress.connect(self.job_progress)
+            worker.job_finished.connect(self._on_job_finished)
+            worker.job_failed.connect(self._on_job_failed)
+            worker.job_cancelled.connect(self._on_job_cancelled)
+            thread.finished.connect(worker.close, Qt.DirectConnection)
+            thread.start()
+            self._threads.append((thread, worker))
+            self._idle_workers.append(worker)
+
+    def submit(self, **kwargs) -> int:
+        """เพิ่มงาน main_algorithm (keyword arguments) เข้าคิว และคืนค่า job_id"""
+        job_id = next(self._job_ids)
+        self._queue.append((job_id, kwargs))
+        self._dispatch()
+        return job_id
+
+    def is_busy(self) -> bool:
+        return bool(self._queue or self._running)
+
+    def cancel_all(self):
+        """ยกเลิกงานที่รอในคิว และหยุดงานที่กำลังทำทันที"""
+        self._queue.clear()
+        for worker in self._running.values():
+            worker.cancel()
+
+    def shutdown(self, timeout_ms: int = 5000) -> bool:
+        """หยุดงานทั้งหมดและปิดเธรดของ pool คืนค่า False หากมีเธรดที่ไม่หยุดในเวลาที่กำหนด"""
+        self.cancel_all()
+        for thread, _ in self._threads:
+            thread.quit()
+        stopped = all([thread.wait(timeout_ms) for thread, _ in self._threads])
+        self._idle_workers.clear()
+        return stopped
+
+    def _dispatch(self):
+        while self._queue and self._idle_workers:
+            job_id, kwargs = self._queue.popleft()
+            worker = self._idle_workers.popleft()
+            self._running[job_id] = worker
+            worker.request_job(job_id, kwargs)
+
+    def _release(self, job_id: int):
+        worker = self._running.pop(job_id, None)
+        if worker is not None:
+            self._idle_workers.append(worker)
+        self._dispatch()
+
+    def _emit_idle_if_done(self):
+        if not self.is_busy():
+            self.idle.emit()
+
+    def _on_job_finished(self, job_id: int, results: list):
+        self._release(job_id)
+        self.job_finished.emit(job_id, results)
+        self._emit_idle_if_done()
+
+    def _on_job_failed(self, job_id: int, message: str):
+        self._release(job_id)
+        self.job_failed.emit(job_id, message)
+        self._emit_idle_if_done()
+
+    def _on_job_cancelled(self, job_id: int, results: list):
+        self._release(job_id)
+        self.job_cancelled.emit(job_id, results)
+        self._emit_idle_if_done()